@@ -1,8 +1,10 @@
 # Copyright 1999 - 2026. WebPros International GmbH. All rights reserved.
+from .baseline import *
 from .common_checks import *
 from .common import *
 from .configure import *
 from .convert import *
+from .downtime import *
 from .extensions import *
 from .installation import *
 from .mariadb import *
@@ -10,3 +12,4 @@ from .packages import *
 from .perl import *
 from .php import *
 from .postgres import *
+from .reboot import *
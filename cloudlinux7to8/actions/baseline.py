@@ -0,0 +1,77 @@
+# Copyright 1999 - 2026. WebPros International GmbH. All rights reserved.
+import os
+import subprocess
+
+from pleskdistup.common import action, log, motd
+
+from cloudlinux7to8.common import baseline
+
+
+class CapturePerformanceBaseline(action.CheckAction):
+    # Not a real check, it never fails. Captured on the check phase to measure the hosting
+    # while it is still untouched by the conversion.
+    state_dir: str
+
+    def __init__(self, state_dir: str) -> None:
+        self.name = "capture performance baseline"
+        self.description = "Unable to capture the performance baseline."
+        self.state_dir = state_dir
+
+    def _do_check(self) -> bool:
+        results = baseline.capture(baseline.get_measurements())
+        os.makedirs(self.state_dir, exist_ok=True)
+        baseline.save(self.state_dir, results)
+        log.debug(f"Performance baseline captured: {results}")
+        return True
+
+
+class CompareWithPerformanceBaseline(action.ActiveAction):
+    # Should be executed on finishing after StartStoppedPleskServices, but before the finish message
+    # is shown, so regressions are mentioned there. Does nothing if the baseline was not captured.
+    # Measurements of services which are still not running are skipped instead of being failed.
+    state_dir: str
+    threshold: float
+
+    def __init__(self, state_dir: str, threshold: float) -> None:
+        self.name = "compare performance with the baseline"
+        self.state_dir = state_dir
+        self.threshold = threshold
+
+    def _prepare_action(self) -> action.ActionResult:
+        return action.ActionResult()
+
+    def _post_action(self) -> action.ActionResult:
+        before = baseline.load(self.state_dir)
+        if before is None:
+            log.debug("There is no performance baseline captured before the conversion, skip the comparison")
+            return action.ActionResult()
+
+        measurements = baseline.get_measurements()
+        try:
+            skipped = baseline.get_not_running(measurements)
+        except (subprocess.CalledProcessError, OSError) as ex:
+            log.warn(f"Unable to find out which services are running, all measurements will be done: {ex}")
+            skipped = set()
+        if skipped:
+            log.info(f"Services are not running, skip measurements: {', '.join(sorted(skipped))}")
+
+        after = baseline.capture({name: measurement for name, measurement in measurements.items() if name not in skipped})
+        lines, regressions = baseline.compare(before, after, self.threshold, skipped)
+        report_path = os.path.join(self.state_dir, baseline.REPORT_FILE_NAME)
+        with open(report_path, "w") as f:
+            f.write("\n".join(lines) + "\n")
+        log.info("Performance compared with the baseline:\n" + "\n".join(lines))
+
+        if regressions:
+            motd.add_finish_ssh_login_message(
+                f"The following became slower by more than {self.threshold * 100:.0f}% after the conversion:\n\t"
+                + "\n\t".join(regressions)
+                + f"\nThe full report is in {report_path}\n"
+            )
+        return action.ActionResult()
+
+    def _revert_action(self) -> action.ActionResult:
+        return action.ActionResult()
+
+    def estimate_post_time(self) -> int:
+        return 30 if os.path.exists(os.path.join(self.state_dir, baseline.BASELINE_FILE_NAME)) else 0
@@ -6,55 +6,97 @@ import typing
 
 from pleskdistup.common import action, dns, files, log, motd, rpm, util
 
+from cloudlinux7to8.common import boot, cleanup, hosting, probe, statestore, throttle
+
 
 class FixNamedConfig(action.ActiveAction):
-    def __init__(self):
+    state: statestore.ActionState
+
+    def __init__(self, state_dir: str):
         self.name = "fix named configuration"
         self.named_conf = "/etc/named.conf"
         self.chrooted_configuration_path = "/var/named/chroot"
+        # Includes are parsed once on preparation, the finishing and reverting use the saved list
+        self.state = statestore.ActionState(state_dir, "named")
 
     def _is_required(self) -> bool:
         return os.path.exists(self.named_conf) and os.path.exists(os.path.join(self.chrooted_configuration_path, self.named_conf))
 
-    def _handle_included_file(self, chrooted_file: str):
-        target_file = chrooted_file.replace(self.chrooted_configuration_path, "")
+    def _get_target_path(self, chrooted_file: str) -> str:
+        return chrooted_file.replace(self.chrooted_configuration_path, "")
+
+    def _get_files_sizes(self, directory: str) -> typing.Dict[str, typing.Optional[int]]:
+        sizes: typing.Dict[str, typing.Optional[int]] = {}
+        if not os.path.isdir(directory):
+            return sizes
+
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                try:
+                    sizes[entry.name] = entry.stat().st_size
+                except FileNotFoundError:
+                    # Broken symlink
+                    sizes[entry.name] = None
+        return sizes
+
+    def _handle_included_files(self, chrooted_files: typing.List[str]) -> None:
+        # Files are handled directory by directory, so every directory is created and listed only once
+        chrooted_files_by_directory: typing.Dict[str, typing.List[str]] = {}
+        for chrooted_file in dict.fromkeys(chrooted_files):
+            chrooted_files_by_directory.setdefault(os.path.dirname(chrooted_file), []).append(chrooted_file)
+
+        for chrooted_directory, directory_files in chrooted_files_by_directory.items():
+            target_directory = self._get_target_path(chrooted_directory)
+            os.makedirs(target_directory, exist_ok=True)
+
+            existing_sizes = self._get_files_sizes(target_directory)
+            chrooted_sizes = self._get_files_sizes(chrooted_directory)
+            for chrooted_file in directory_files:
+                name = os.path.basename(chrooted_file)
+                target_file = os.path.join(target_directory, name)
+
+                if name in existing_sizes:
+                    size = existing_sizes[name]
+                elif name in chrooted_sizes:
+                    os.symlink(chrooted_file, target_file)
+                    size = chrooted_sizes[name]
+                else:
+                    with open(target_file, "w") as _:
+                        pass
+                    size = 0
+
+                if size == 0:
+                    with open(target_file, "w") as f:
+                        f.write("# centos2alma workaround commentary")
 
-        target_file_directory = os.path.dirname(target_file)
-        if not os.path.exists(target_file_directory):
-            os.makedirs(target_file_directory)
+    def _prepare_action(self) -> action.ActionResult:
+        includes = dns.get_all_includes_from_bind_config(self.named_conf, chroot_dir=self.chrooted_configuration_path)
+        self._handle_included_files(includes)
+        self.state.set("includes", includes)
 
-        if not os.path.exists(target_file):
-            if os.path.exists(chrooted_file):
-                os.symlink(chrooted_file, target_file)
-            else:
-                with open(target_file, "w") as _:
-                    pass
+        return action.ActionResult()
 
-        if os.path.getsize(target_file) == 0:
-            with open(target_file, "w") as f:
-                f.write("# centos2alma workaround commentary")
+    def _get_includes(self) -> typing.List[str]:
+        if self.state.has("includes"):
+            return self.state.get("includes")
 
-    def _prepare_action(self) -> action.ActionResult:
-        for bind_configs in dns.get_all_includes_from_bind_config(self.named_conf, chroot_dir=self.chrooted_configuration_path):
-            self._handle_included_file(bind_configs)
+        log.debug("There is no saved list of named includes, parse the named configuration again")
+        return dns.get_all_includes_from_bind_config(self.named_conf, chroot_dir=self.chrooted_configuration_path)
 
-        return action.ActionResult()
+    def _remove_included_files(self) -> None:
+        for chrooted_file in self._get_includes():
+            target_file = self._get_target_path(chrooted_file)
+            if os.path.islink(target_file):
+                os.unlink(target_file)
 
-    def _remove_included_files(self, chrooted_file: str):
-        target_file = chrooted_file.replace(self.chrooted_configuration_path, "")
-        if os.path.islink(target_file):
-            os.unlink(target_file)
+        self.state.remove("includes")
 
     def _post_action(self) -> action.ActionResult:
-        for bind_configs in dns.get_all_includes_from_bind_config(self.named_conf, chroot_dir=self.chrooted_configuration_path):
-            self._remove_included_files(bind_configs)
-
+        self._remove_included_files()
         return action.ActionResult()
 
     def _revert_action(self) -> action.ActionResult:
-        for bind_configs in dns.get_all_includes_from_bind_config(self.named_conf, chroot_dir=self.chrooted_configuration_path):
-            self._remove_included_files(bind_configs)
-
+        self._remove_included_files()
         return action.ActionResult()
 
 
@@ -64,17 +106,11 @@ class DisableSuspiciousKernelModules(action.ActiveAction):
 
     def __init__(self) -> None:
         self.name = "disable suspicious kernel modules"
-        self.suspicious_modules = {"pata_acpi", "btrfs", "floppy"}
+        self.suspicious_modules = set(boot.CONVERSION_BLACKLISTED_KERNEL_MODULES)
         self.modules_config_path = "/etc/modprobe.d/pataacpibl.conf"
 
     def _get_enabled_modules(self, lookup_modules: typing.Set[str]) -> typing.Set[str]:
-        modules = set()
-        modules_list = subprocess.check_output(["/usr/sbin/lsmod"], universal_newlines=True).splitlines()
-        for line in modules_list:
-            module_name = line[:line.find(' ')]
-            if module_name in lookup_modules:
-                modules.add(module_name)
-        return modules
+        return probe.get_loaded_kernel_modules() & lookup_modules
 
     def _prepare_action(self) -> action.ActionResult:
         with open(self.modules_config_path, "a") as kern_mods_config:
@@ -148,16 +184,11 @@ class FixSyslogLogrotateConfig(action.ActiveAction):
 
 
 class RecreateAwstatsConfigurationFiles(action.ActiveAction):
-    def __init__(self) -> None:
-        self.name = "recreate AWStats configuration files for domains"
+    limits: typing.Optional[throttle.ThrottleLimits]
 
-    def get_awstats_domains(self) -> typing.Set[str]:
-        domains_awstats_directory = "/usr/local/psa/etc/awstats/"
-        domains = set()
-        for awstats_config_file in os.listdir(domains_awstats_directory):
-            if awstats_config_file.startswith("awstats.") and awstats_config_file.endswith("-http.conf"):
-                domains.add(awstats_config_file.split("awstats.")[-1].rsplit("-http.conf")[0])
-        return domains
+    def __init__(self, limits: typing.Optional[throttle.ThrottleLimits] = None) -> None:
+        self.name = "recreate AWStats configuration files for domains"
+        self.limits = limits
 
     def _prepare_action(self) -> action.ActionResult:
         return action.ActionResult()
@@ -165,13 +196,13 @@ class RecreateAwstatsConfigurationFiles(action.ActiveAction):
     def _post_action(self) -> action.ActionResult:
         rpm.handle_all_rpmnew_files("/etc/awstats")
 
-        for domain in self.get_awstats_domains():
+        for domain in hosting.get_awstats_domains():
             log.info(f"Recreating AWStats configuration for domain: {domain}")
             util.logged_check_call(
-                [
+                throttle.wrap_command([
                     "/usr/sbin/plesk", "sbin", "webstatmng", "--set-configs",
                     "--stat-prog", "awstats", "--domain-name", domain
-                ], stdin=subprocess.DEVNULL
+                ], self.limits), stdin=subprocess.DEVNULL
             )
         return action.ActionResult()
 
@@ -180,4 +211,25 @@ class RecreateAwstatsConfigurationFiles(action.ActiveAction):
 
     def estimate_post_time(self) -> int:
         # Estimate 100 ms per configuration we have to recreate
-        return int(len(self.get_awstats_domains()) / 10) + 5
+        return int(len(hosting.get_awstats_domains()) / 10) + 5
+
+
+class StartBackgroundCleanup(action.ActiveAction):
+    cleanup_queue: cleanup.CleanupQueue
+    limits: typing.Optional[throttle.ThrottleLimits]
+
+    def __init__(self, state_dir: str, limits: typing.Optional[throttle.ThrottleLimits] = None) -> None:
+        self.name = "start background removal of conversion leftovers"
+        self.cleanup_queue = cleanup.CleanupQueue(state_dir)
+        self.limits = limits
+
+    def _prepare_action(self) -> action.ActionResult:
+        return action.ActionResult()
+
+    def _post_action(self) -> action.ActionResult:
+        self.cleanup_queue.start_worker(self.limits)
+        return action.ActionResult()
+
+    def _revert_action(self) -> action.ActionResult:
+        self.cleanup_queue.start_worker(self.limits)
+        return action.ActionResult()
@@ -8,6 +8,8 @@ import typing
 
 from pleskdistup.common import action, dist, files, log, version
 
+from cloudlinux7to8.common import checkcache, probe
+
 
 class AssertDistroIsCloudLinux8(action.CheckAction):
     def __init__(self) -> None:
@@ -28,11 +30,11 @@ class AssertNoMoreThenOneKernelNamedNIC(action.CheckAction):
 """
 
     def _do_check(self) -> bool:
+        interfaces = probe.get_network_interfaces()
         # We can't use this method to get interfaces names, so just skip the check
-        if not os.path.exists("/sys/class/net"):
+        if interfaces is None:
             return True
 
-        interfaces = os.listdir('/sys/class/net')
         suspicious_interfaces = [interface for interface in interfaces if interface.startswith("eth") and interface[3:].isdigit()]
         if len(suspicious_interfaces) > 1:
             self.description = self.description.format(", ".join(suspicious_interfaces))
@@ -49,9 +51,10 @@ class AssertLastInstalledKernelInUse(action.CheckAction):
 \tThe kernel version in use is '{}'. The last installed kernel version is '{}'.
 \tReboot the system to use the last installed kernel.
 """
+        self.cache_inputs = [checkcache.rpmdb_input(), checkcache.kernel_input()]
 
     def _get_kernel_version_in_use(self) -> version.KernelVersion:
-        curr_kernel = subprocess.check_output(["/usr/bin/uname", "-r"], universal_newlines=True).strip()
+        curr_kernel = probe.get_running_kernel_release()
         log.debug("Current kernel version is '{}'".format(curr_kernel))
         return version.KernelVersion(curr_kernel)
 
@@ -87,6 +90,7 @@ class AssertRedHatKernelInstalled(action.CheckAction):
 \t- `grub2-mkconfig -o /boot/grub2/grub.cfg`
 \t- `reboot`
 """
+        self.cache_inputs = [checkcache.rpmdb_input()]
 
     def _do_check(self) -> bool:
         redhat_kernel_packages = subprocess.check_output(
@@ -108,6 +112,7 @@ class AssertLocalRepositoryNotPresent(action.CheckAction):
 \tPlease remove the local repositories to proceed the conversion. Files where locally stored repositories are defined:
 \t- {}
 """
+        self.cache_inputs = [checkcache.directory_input("/etc/yum.repos.d")]
 
     def _is_repo_with_local_storage(self, repo_file) -> bool:
         with open(repo_file) as f:
@@ -139,6 +144,7 @@ class AssertNoRepositoryDuplicates(action.CheckAction):
 
 \tPlease remove duplicates to proceed the conversion.
 """
+        self.cache_inputs = [checkcache.directory_input("/etc/yum.repos.d")]
 
     def _do_check(self) -> bool:
         repositories = []
@@ -162,6 +168,7 @@ class AssertPackagesUpToDate(action.CheckAction):
     def __init__(self):
         self.name = "checking if all packages are up to date"
         self.description = "There are packages which are not up to date. Call `yum update -y && reboot` to update the packages.\n"
+        # Not cached: the result depends on the state of remote repositories
 
     def _do_check(self) -> bool:
         subprocess.check_call(["/usr/bin/yum", "clean", "all"], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
@@ -0,0 +1,114 @@
+# Copyright 1999 - 2026. WebPros International GmbH. All rights reserved.
+import json
+import os
+import time
+import typing
+
+from pleskdistup.common import action, log, motd
+
+from cloudlinux7to8.common import downtime, statestore
+
+DOWNTIME_REPORT_FILE_NAME = "cloudlinux7to8_downtime.json"
+
+
+def _format_duration(seconds: float) -> str:
+    minutes, seconds = divmod(int(seconds), 60)
+    return f"{minutes} min {seconds} sec"
+
+
+class MarkServicesDown(action.ActiveAction):
+    # Should be placed right after DisablePleskRelatedServicesDuringUpgrade. Remembers when the
+    # services were stopped and, when probe targets are given, when each of them stopped answering.
+    state: statestore.ActionState
+    targets: typing.List[downtime.ProbeTarget]
+
+    def __init__(self, state_dir: str, targets: typing.Optional[typing.List[downtime.ProbeTarget]] = None) -> None:
+        self.name = "mark the beginning of services downtime"
+        self.state = statestore.ActionState(state_dir, "downtime")
+        self.targets = targets or []
+
+    def _prepare_action(self) -> action.ActionResult:
+        self.state.set("services_down", time.time())
+        if self.targets:
+            self.state.set("targets_down", downtime.wait_for_state(self.targets, serving=False, timeout=60))
+        return action.ActionResult()
+
+    def _post_action(self) -> action.ActionResult:
+        return action.ActionResult()
+
+    def _revert_action(self) -> action.ActionResult:
+        self.state.clear()
+        return action.ActionResult()
+
+    def estimate_prepare_time(self) -> int:
+        return 5 if self.targets else 0
+
+
+class MarkServicesUp(action.ActiveAction):
+    # Should be executed on finishing right after StartStoppedPleskServices and before
+    # AddFinishSshLoginMessage. Waits for probe targets to answer again, writes the measured
+    # downtime into the state directory and shows it in the finish message.
+    state: statestore.ActionState
+    targets: typing.List[downtime.ProbeTarget]
+    report_path: str
+    timeout: int
+
+    def __init__(
+        self,
+        state_dir: str,
+        targets: typing.Optional[typing.List[downtime.ProbeTarget]] = None,
+        timeout: int = 300,
+    ) -> None:
+        self.name = "measure services downtime"
+        self.state = statestore.ActionState(state_dir, "downtime")
+        self.targets = targets or []
+        self.report_path = os.path.join(state_dir, DOWNTIME_REPORT_FILE_NAME)
+        self.timeout = timeout
+
+    def _prepare_action(self) -> action.ActionResult:
+        return action.ActionResult()
+
+    def _post_action(self) -> action.ActionResult:
+        services_up = time.time()
+        services_down = self.state.get("services_down")
+        if services_down is None:
+            log.warn("The time services were stopped is unknown, so the downtime could not be measured")
+            return action.ActionResult()
+
+        report: typing.Dict[str, typing.Any] = {
+            "services": {
+                "down": services_down,
+                "up": services_up,
+                "downtime": services_up - services_down,
+            },
+        }
+
+        targets_down = self.state.get("targets_down", {})
+        targets_up = downtime.wait_for_state(self.targets, serving=True, timeout=self.timeout) if self.targets else {}
+        for target, up in targets_up.items():
+            down = targets_down.get(target) or services_down
+            report[target] = {
+                "down": down,
+                "up": up,
+                "downtime": up - down if up is not None else None,
+            }
+
+        with open(self.report_path, "w") as f:
+            json.dump(report, f, indent=4)
+
+        lines = [f"\tPlesk services: {_format_duration(report['services']['downtime'])}"]
+        for target in targets_up:
+            if report[target]["downtime"] is None:
+                lines.append(f"\t{target}: still not answering after {_format_duration(self.timeout)} since Plesk services start")
+            else:
+                lines.append(f"\t{target}: {_format_duration(report[target]['downtime'])}")
+        message = "The measured downtime of services during the conversion:\n" + "\n".join(lines) + "\n"
+        log.info(message)
+        motd.add_finish_ssh_login_message(message)
+        return action.ActionResult()
+
+    def _revert_action(self) -> action.ActionResult:
+        return action.ActionResult()
+
+    def estimate_post_time(self) -> int:
+        return 10 if self.targets else 0
@@ -5,6 +5,8 @@ import typing
 from pleskdistup import actions as common_actions
 from pleskdistup.common import action, files, leapp_configs, packages, systemd, util
 
+from cloudlinux7to8.common import ownership
+
 
 class FixupImunify(action.ActiveAction):
     def __init__(self):
@@ -102,9 +104,8 @@ class AdoptSOGo(action.ActiveAction):
 
     def fix_permissions(self) -> None:
         target_dirs = ["/run/sogo", "/var/lib/sogo/", "/var/log/sogo/", "/var/spool/sogo/", "/etc/sogo/"]
-        for target_dir in target_dirs:
-            files.change_directory_ownership(target_dir, "sogo", "sogo", recursive=True)
-        files.change_file_ownership(self.sogo_config, "sogo", "sogo")
+        # The configuration file is in /etc/sogo, so it is handled as well
+        ownership.change_tree_ownership(target_dirs, "sogo", "sogo")
 
     def _post_action(self) -> action.ActionResult:
         # This temporarily replaces systemctl with a no-op stub, allowing
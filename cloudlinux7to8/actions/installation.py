@@ -5,6 +5,8 @@ import typing
 
 from pleskdistup.common import action, rpm, util
 
+from cloudlinux7to8.common import cleanup
+
 LEAPP_CLOUDLINUX_RPM_URL = "https://repo.cloudlinux.com/elevate/elevate-release-latest-el7.noarch.rpm"
 
 
@@ -12,12 +14,20 @@ class LeappInstallation(action.ActiveAction):
     pkgs_to_install: typing.List[str]
     elevate_release_rpm_url: str
     remove_logs_on_finish: bool
+    cleanup_queue: typing.Optional[cleanup.CleanupQueue]
 
-    def __init__(self, elevate_release_rpm_url: str, pkgs_to_install: typing.List[str], remove_logs_on_finish: bool = False):
+    def __init__(
+        self,
+        elevate_release_rpm_url: str,
+        pkgs_to_install: typing.List[str],
+        remove_logs_on_finish: bool = False,
+        cleanup_queue: typing.Optional[cleanup.CleanupQueue] = None,
+    ):
         self.name = "installing leapp"
         self.pkgs_to_install = pkgs_to_install
         self.elevate_release_rpm_url = elevate_release_rpm_url
         self.remove_logs_on_finish = remove_logs_on_finish
+        self.cleanup_queue = cleanup_queue
 
     def _prepare_action(self) -> action.ActionResult:
         if not rpm.is_package_installed("elevate-release"):
@@ -50,11 +60,21 @@ class LeappInstallation(action.ActiveAction):
 
         leapp_related_directories = [
             "/etc/leapp",
-            "/var/lib/leapp",
             "/usr/lib/python2.7/site-packages/leapp",
         ]
+        # Leapp data and logs could take gigabytes, so we remove them in background when possible
+        large_leapp_related_directories = [
+            "/var/lib/leapp",
+        ]
         if include_logs:
-            leapp_related_directories.append("/var/log/leapp")
+            large_leapp_related_directories.append("/var/log/leapp")
+
+        if self.cleanup_queue is None:
+            leapp_related_directories += large_leapp_related_directories
+        else:
+            for directory in large_leapp_related_directories:
+                self.cleanup_queue.schedule_removal(directory)
+
         for directory in leapp_related_directories:
             if os.path.exists(directory):
                 shutil.rmtree(directory)
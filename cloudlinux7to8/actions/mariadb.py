@@ -6,6 +6,8 @@ import os
 
 from pleskdistup.common import action, leapp_configs, files, log, mariadb, rpm, util
 
+from cloudlinux7to8.common import checkcache, dnfsession, statestore, transaction
+
 
 MARIADB_VERSION_ON_ALMA = mariadb.MariaDBVersion("10.3.39")
 KNOWN_MARIADB_REPO_FILES = [
@@ -50,6 +52,7 @@ The MariaDB repository with id '{}' from the file '{}' is not accessible.
 \tof the MariaDB repository by the provider. To resolve this, update MariaDB to any version from the official
 \trepository 'rpm.mariadb.org', or use the official archive repository for your current MariaDB version at 'archive.mariadb.org'.
 """
+        # Not cached: the result depends on the state of the remote repository
 
     def _do_check(self) -> bool:
         if not mariadb.is_mariadb_installed() or not mariadb.get_installed_mariadb_version() > MARIADB_VERSION_ON_ALMA:
@@ -74,13 +77,25 @@ The MariaDB repository with id '{}' from the file '{}' is not accessible.
         return True
 
 
-def _remove_mariadb_packages() -> None:
-    rpm.remove_packages(rpm.filter_installed_packages(MARIADB_PACKAGES))
+def _remove_mariadb_packages(
+    removal: typing.Optional[transaction.PackagesRemovalTransaction] = None,
+    owner: str = "mariadb",
+) -> None:
+    transaction.remove_packages(rpm.filter_installed_packages(MARIADB_PACKAGES), removal, owner)
 
 
 class UpdateModernMariadb(action.ActiveAction):
-    def __init__(self) -> None:
+    removal: typing.Optional[transaction.PackagesRemovalTransaction]
+    dnf_session: dnfsession.DnfSession
+
+    def __init__(
+        self,
+        removal: typing.Optional[transaction.PackagesRemovalTransaction] = None,
+        dnf_session: typing.Optional[dnfsession.DnfSession] = None,
+    ) -> None:
         self.name = "update modern mariadb"
+        self.removal = removal
+        self.dnf_session = dnf_session if dnf_session is not None else dnfsession.DnfSession()
 
     def _is_required(self) -> bool:
         return mariadb.is_mariadb_installed() and mariadb.get_installed_mariadb_version() > MARIADB_VERSION_ON_ALMA and not _is_governor_mariadb_installed()
@@ -96,7 +111,7 @@ class UpdateModernMariadb(action.ActiveAction):
         log.debug("Set repository mapping in the leapp configuration file")
         leapp_configs.set_package_repository("mariadb", "alma-mariadb")
 
-        _remove_mariadb_packages()
+        _remove_mariadb_packages(self.removal, self.name)
         return action.ActionResult()
 
     def _post_action(self) -> action.ActionResult:
@@ -110,9 +125,7 @@ class UpdateModernMariadb(action.ActiveAction):
         repo = [repo for repo in rpm.extract_repodata(repofiles[0])][0]
 
         packages = ["MariaDB-client", "MariaDB-server"]
-        rpm.install_packages(packages, repository=repo.id, simulate=True)
-        _remove_mariadb_packages()
-        rpm.install_packages(packages, repository=repo.id)
+        self.dnf_session.run(packages, remove=self.dnf_session.filter_installed(MARIADB_PACKAGES), repository=repo.id)
         return action.ActionResult()
 
     def _revert_action(self) -> action.ActionResult:
@@ -126,14 +139,23 @@ class UpdateModernMariadb(action.ActiveAction):
 
 
 class UpdateMariadbDatabase(action.ActiveAction):
-    def __init__(self) -> None:
+    removal: typing.Optional[transaction.PackagesRemovalTransaction]
+    dnf_session: dnfsession.DnfSession
+
+    def __init__(
+        self,
+        removal: typing.Optional[transaction.PackagesRemovalTransaction] = None,
+        dnf_session: typing.Optional[dnfsession.DnfSession] = None,
+    ) -> None:
         self.name = "updating mariadb databases"
+        self.removal = removal
+        self.dnf_session = dnf_session if dnf_session is not None else dnfsession.DnfSession()
 
     def _is_required(self) -> bool:
         return mariadb.is_mariadb_installed() and not mariadb.get_installed_mariadb_version() > MARIADB_VERSION_ON_ALMA and not _is_governor_mariadb_installed()
 
     def _prepare_action(self) -> action.ActionResult:
-        _remove_mariadb_packages()
+        _remove_mariadb_packages(self.removal, self.name)
         return action.ActionResult()
 
     def _post_action(self) -> action.ActionResult:
@@ -144,10 +166,9 @@ class UpdateMariadbDatabase(action.ActiveAction):
             files.backup_file(repofile)
             os.unlink(repofile)
 
+        # Distro packages replace MariaDB ones in one transaction
         packages = ["mariadb", "mariadb-server"]
-        rpm.install_packages(packages, simulate=True)
-        _remove_mariadb_packages()
-        rpm.install_packages(packages)
+        self.dnf_session.run(packages, remove=self.dnf_session.filter_installed(MARIADB_PACKAGES))
 
         # We should be sure mariadb is started, otherwise restore wouldn't work
         util.logged_check_call(["/usr/bin/systemctl", "start", "mariadb"])
@@ -181,6 +202,7 @@ class AssertMinGovernorMariadbVersion(action.CheckAction):
 \t- `/usr/share/lve/dbgovernor/mysqlgovernor.py --mysql-version=mariadb{self.minimal_version.major}{self.minimal_version.minor}`
 \t- `/usr/share/lve/dbgovernor/mysqlgovernor.py --install`
 """
+        self.cache_inputs = [checkcache.rpmdb_input(), checkcache.directory_input("/etc/yum.repos.d")]
 
     def _do_check(self) -> bool:
         if not mariadb.is_mariadb_installed() or not _is_governor_mariadb_installed():
@@ -200,6 +222,7 @@ class AssertGovernorMysqlNotInstalled(action.CheckAction):
 \t- `/usr/share/lve/dbgovernor/mysqlgovernor.py --mysql-version=mariadb{self.minimal_version.major}{self.minimal_version.minor}`
 \t- `/usr/share/lve/dbgovernor/mysqlgovernor.py --install`
 """
+        self.cache_inputs = [checkcache.rpmdb_input(), checkcache.directory_input("/etc/yum.repos.d")]
 
     def _do_check(self) -> bool:
         return not mariadb.is_mysql_installed() or not _is_governor_mariadb_installed()
@@ -233,70 +256,68 @@ class ReinstallMariadbConflictPackages(action.ActiveAction):
     This is why we have separated this action from the ReinstallConflictPackages.
 
     Attributes:
-        removed_packages_file (str): Path to the file where removed packages are logged.
+        state (statestore.ActionState): State where removed packages are saved.
 
     Methods:
         __init__(temp_directory: str) -> None:
-            Initializes the action with a temporary directory for logging removed packages.
+            Initializes the action with a state directory for saving removed packages.
 
         _prepare_action() -> action.ActionResult:
             Preparation conversion by removing conflicting packages if MariaDB Governor is not installed.
-            Logs the removed packages to a file.
+            Saves the removed packages to the state.
 
         _post_action() -> action.ActionResult:
             Reinstalls the previously removed packages after the conversion is completed.
-            Removes the log file after reinstallation.
+            Clears the saved state after reinstallation.
 
         _revert_action() -> action.ActionResult:
             Reinstalls the previously removed packages if the action needs to be reverted.
-            Removes the log file after reinstallation.
+            Clears the saved state after reinstallation.
     """
 
-    removed_packages_file: str
+    state: statestore.ActionState
+    legacy_removed_packages_file: str
+    removal: typing.Optional[transaction.PackagesRemovalTransaction]
 
-    def __init__(self, temp_directory: str) -> None:
+    def __init__(self, temp_directory: str, removal: typing.Optional[transaction.PackagesRemovalTransaction] = None) -> None:
         self.name = "reinstall mariadb conflict packages"
-        self.removed_packages_file = temp_directory + "/cloudlinux7to8_removed_mariadb_packages.txt"
+        self.removal = removal
+        self.state = statestore.ActionState(temp_directory, "mariadb_conflict_packages")
+        self.legacy_removed_packages_file = temp_directory + "/cloudlinux7to8_removed_mariadb_packages.txt"
         self.conflict_pkgs_map = {
             "galera": "galera",
         }
 
     def _prepare_action(self) -> action.ActionResult:
         packages_to_remove = rpm.filter_installed_packages(["galera"])
-        rpm.remove_packages(packages_to_remove)
+        transaction.remove_packages(packages_to_remove, self.removal, self.name)
 
         # Avoid reinstallation if mariadb installed by governor
-        # if there are no such packages installed, don't create the file as well
+        # if there are no such packages installed, don't save them as well
         if _is_governor_mariadb_installed() or len(packages_to_remove) == 0:
             return action.ActionResult()
 
-        with open(self.removed_packages_file, "a") as f:
-            f.write("\n".join(packages_to_remove) + "\n")
-
+        self.state.extend_list("removed_packages", packages_to_remove)
         return action.ActionResult()
 
-    def _post_action(self) -> action.ActionResult:
-        if not os.path.exists(self.removed_packages_file):
-            return action.ActionResult()
+    def _get_removed_packages(self) -> typing.List[str]:
+        self.state.import_legacy_list_file("removed_packages", self.legacy_removed_packages_file)
+        return self.state.get_list("removed_packages")
 
-        if os.path.getsize(self.removed_packages_file) > 0:
-            with open(self.removed_packages_file, "r") as f:
-                packages_to_install = [self.conflict_pkgs_map[pkg] for pkg in set(f.read().splitlines())]
-                rpm.install_packages(packages_to_install)
+    def _post_action(self) -> action.ActionResult:
+        removed_packages = self._get_removed_packages()
+        if removed_packages:
+            rpm.install_packages([self.conflict_pkgs_map[pkg] for pkg in removed_packages])
 
-        os.unlink(self.removed_packages_file)
+        self.state.clear()
         return action.ActionResult()
 
     def _revert_action(self) -> action.ActionResult:
-        if not os.path.exists(self.removed_packages_file):
-            return action.ActionResult()
-
-        if os.path.getsize(self.removed_packages_file) > 0:
-            with open(self.removed_packages_file, "r") as f:
-                packages_to_install = list(set(f.read().splitlines()))
-                rpm.install_packages(packages_to_install)
+        removed_packages = self._get_removed_packages()
+        if removed_packages:
+            rpm.install_packages(removed_packages)
 
-        os.unlink(self.removed_packages_file)
+        self.state.clear()
         return action.ActionResult()
 
     def estimate_prepare_time(self) -> int:
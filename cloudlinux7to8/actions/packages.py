@@ -6,14 +6,18 @@ import re
 
 from pleskdistup.common import action, files, leapp_configs, log, motd, packages, plesk, rpm, systemd, util
 
+from cloudlinux7to8.common import checkcache, repofiles, statestore, transaction
+
 BASE_REPO_PATHS = ["/etc/yum.repos.d/base.repo", "/etc/yum.repos.d/cloudlinux-base.repo"]
 
 
 class RemovingPleskConflictPackages(action.ActiveAction):
     conflict_pkgs: typing.List[str]
+    removal: typing.Optional[transaction.PackagesRemovalTransaction]
 
-    def __init__(self) -> None:
+    def __init__(self, removal: typing.Optional[transaction.PackagesRemovalTransaction] = None) -> None:
         self.name = "remove plesk conflict packages"
+        self.removal = removal
         self.conflict_pkgs = [
             "openssl11-libs",
             "python36-PyYAML",
@@ -22,7 +26,7 @@ class RemovingPleskConflictPackages(action.ActiveAction):
         ]
 
     def _prepare_action(self) -> action.ActionResult:
-        packages.remove_packages(rpm.filter_installed_packages(self.conflict_pkgs))
+        transaction.remove_packages(rpm.filter_installed_packages(self.conflict_pkgs), self.removal, self.name)
         return action.ActionResult()
 
     def _post_action(self) -> action.ActionResult:
@@ -41,15 +45,17 @@ class RemovingPleskConflictPackages(action.ActiveAction):
 
 class RemovePleskOutdatedPackages(action.ActiveAction):
     outdated_pkgs: typing.List[str]
+    removal: typing.Optional[transaction.PackagesRemovalTransaction]
 
-    def __init__(self) -> None:
+    def __init__(self, removal: typing.Optional[transaction.PackagesRemovalTransaction] = None) -> None:
         self.name = "remove plesk outdated packages"
+        self.removal = removal
         self.outdated_pkgs = [
             "psa-fileserver",
         ]
 
     def _prepare_action(self) -> action.ActionResult:
-        packages.remove_packages(rpm.filter_installed_packages(self.outdated_pkgs))
+        transaction.remove_packages(rpm.filter_installed_packages(self.outdated_pkgs), self.removal, self.name)
         return action.ActionResult()
 
     def _post_action(self) -> action.ActionResult:
@@ -65,15 +71,18 @@ class RemovePleskOutdatedPackages(action.ActiveAction):
 
 
 class ReinstallPhpmyadminPleskComponents(action.ActiveAction):
-    def __init__(self) -> None:
+    removal: typing.Optional[transaction.PackagesRemovalTransaction]
+
+    def __init__(self, removal: typing.Optional[transaction.PackagesRemovalTransaction] = None) -> None:
         self.name = "re-installing plesk components"
+        self.removal = removal
 
     def _prepare_action(self) -> action.ActionResult:
         components_pkgs = [
             "psa-phpmyadmin",
         ]
 
-        packages.remove_packages(rpm.filter_installed_packages(components_pkgs))
+        transaction.remove_packages(rpm.filter_installed_packages(components_pkgs), self.removal, self.name)
         return action.ActionResult()
 
     def _post_action(self) -> action.ActionResult:
@@ -105,14 +114,17 @@ class ReinstallPhpmyadminPleskComponents(action.ActiveAction):
 
 
 class ReinstallRoundcubePleskComponents(action.ActiveAction):
-    def __init__(self):
+    removal: typing.Optional[transaction.PackagesRemovalTransaction]
+
+    def __init__(self, removal: typing.Optional[transaction.PackagesRemovalTransaction] = None):
         self.name = "re-installing roundcube plesk components"
+        self.removal = removal
 
     def is_required(self) -> bool:
         return plesk.is_component_installed("roundcube")
 
     def _prepare_action(self) -> action.ActionResult:
-        packages.remove_packages(rpm.filter_installed_packages(["plesk-roundcube"]))
+        transaction.remove_packages(rpm.filter_installed_packages(["plesk-roundcube"]), self.removal, self.name)
         return action.ActionResult()
 
     def _post_action(self) -> action.ActionResult:
@@ -135,12 +147,16 @@ class ReinstallRoundcubePleskComponents(action.ActiveAction):
 
 
 class ReinstallConflictPackages(action.ActiveAction):
-    removed_packages_file: str
+    state: statestore.ActionState
+    legacy_removed_packages_file: str
     conflict_pkgs_map: typing.Dict[str, str]
+    removal: typing.Optional[transaction.PackagesRemovalTransaction]
 
-    def __init__(self, temp_directory: str):
+    def __init__(self, temp_directory: str, removal: typing.Optional[transaction.PackagesRemovalTransaction] = None):
         self.name = "re-installing common conflict packages"
-        self.removed_packages_file = temp_directory + "/cloudlinux7to8_removed_packages.txt"
+        self.removal = removal
+        self.state = statestore.ActionState(temp_directory, "conflict_packages")
+        self.legacy_removed_packages_file = temp_directory + "/cloudlinux7to8_removed_packages.txt"
         self.conflict_pkgs_map = {
             "python36-argcomplete": "python3-argcomplete",
             "python36-cffi": "python3-cffi",
@@ -181,37 +197,39 @@ class ReinstallConflictPackages(action.ActiveAction):
     def _prepare_action(self) -> action.ActionResult:
         packages_to_remove = rpm.filter_installed_packages(list(self.conflict_pkgs_map.keys()))
 
-        rpm.remove_packages(packages_to_remove)
-
-        with open(self.removed_packages_file, "a") as f:
-            f.write("\n".join(packages_to_remove) + "\n")
+        transaction.remove_packages(packages_to_remove, self.removal, self.name)
+        self.state.extend_list("removed_packages", packages_to_remove)
 
         return action.ActionResult()
 
+    def _get_removed_packages(self) -> typing.Optional[typing.List[str]]:
+        self.state.import_legacy_list_file("removed_packages", self.legacy_removed_packages_file)
+        if not self.state.has("removed_packages"):
+            return None
+        return self.state.get_list("removed_packages")
+
     def _post_action(self) -> action.ActionResult:
-        if not os.path.exists(self.removed_packages_file):
-            log.warn("File with removed packages list does not exist. While the action itself was not skipped. Skip reinstalling packages.")
+        removed_packages = self._get_removed_packages()
+        if removed_packages is None:
+            log.warn("Removed packages list was not saved. While the action itself was not skipped. Skip reinstalling packages.")
             return action.ActionResult()
 
-        if os.path.getsize(self.removed_packages_file) > 0:
-            with open(self.removed_packages_file, "r") as f:
-                packages_to_install = [self.conflict_pkgs_map[pkg] for pkg in set(f.read().splitlines())]
-                rpm.install_packages(packages_to_install)
+        if removed_packages:
+            rpm.install_packages([self.conflict_pkgs_map[pkg] for pkg in removed_packages])
 
-        os.unlink(self.removed_packages_file)
+        self.state.clear()
         return action.ActionResult()
 
     def _revert_action(self) -> action.ActionResult:
-        if not os.path.exists(self.removed_packages_file):
-            log.warn("File with removed packages list does not exist. While the action itself was not skipped. Skip reinstalling packages.")
+        removed_packages = self._get_removed_packages()
+        if removed_packages is None:
+            log.warn("Removed packages list was not saved. While the action itself was not skipped. Skip reinstalling packages.")
             return action.ActionResult()
 
-        if os.path.getsize(self.removed_packages_file) > 0:
-            with open(self.removed_packages_file, "r") as f:
-                packages_to_install = list(set(f.read().splitlines()))
-                rpm.install_packages(packages_to_install)
+        if removed_packages:
+            rpm.install_packages(removed_packages)
 
-        os.unlink(self.removed_packages_file)
+        self.state.clear()
         return action.ActionResult()
 
     def estimate_prepare_time(self) -> int:
@@ -219,10 +237,7 @@ class ReinstallConflictPackages(action.ActiveAction):
 
     @property
     def _removed_packages_num(self) -> int:
-        if os.path.exists(self.removed_packages_file):
-            with open(self.removed_packages_file, "r") as f:
-                return len(f.read().splitlines())
-        return 0
+        return len(self._get_removed_packages() or [])
 
     def estimate_post_time(self) -> int:
         return 60 + 10 * self._removed_packages_num
@@ -238,8 +253,12 @@ files with the .rpmsave extension. Below is a list of the changed files:
 
 
 class AdoptRepositories(action.ActiveAction):
-    def __init__(self) -> None:
+    # Changes of repository files registered by other actions are written along with ours
+    repository_files: repofiles.RepositoryFilesPipeline
+
+    def __init__(self, repository_files: typing.Optional[repofiles.RepositoryFilesPipeline] = None) -> None:
         self.name = "adopting repositories"
+        self.repository_files = repository_files if repository_files is not None else repofiles.RepositoryFilesPipeline()
 
     def _prepare_action(self) -> action.ActionResult:
         return action.ActionResult()
@@ -262,21 +281,21 @@ class AdoptRepositories(action.ActiveAction):
 
     def _adopt_plesk_repositories(self) -> None:
         for file in files.find_files_case_insensitive("/etc/yum.repos.d", ["plesk*.repo"]):
-            rpm.remove_repositories(file, [
+            self.repository_files.remove_repositories(file, [
                 lambda repo: repo.id in ["PLESK_17_PHP52", "PLESK_17_PHP53",
                                          "PLESK_17_PHP54", "PLESK_17_PHP55"],
             ])
-            leapp_configs.adopt_repositories(file)
+            self.repository_files.adopt_repositories(file)
 
     def _adopt_base_repository(self) -> None:
         for path in BASE_REPO_PATHS:
-            if os.path.exists(path):
-                leapp_configs.adopt_repositories(path)
+            self.repository_files.adopt_repositories(path)
 
     def _post_action(self) -> action.ActionResult:
         self._use_rpmnew_repositories()
         self._adopt_plesk_repositories()
         self._adopt_base_repository()
+        self.repository_files.commit()
         util.logged_check_call(["/usr/bin/dnf", "clean", "all"])
         util.logged_check_call(["/usr/bin/dnf", "-y", "update", "--disablerepo=cloudlinux-elevate"])
         return action.ActionResult()
@@ -292,9 +311,12 @@ class RemovePleskBaseRepository(action.ActiveAction):
     # In some cases we have plesk specific base repository, which will not be
     # fixed by the leapp converter. So we have to remove it manually.
     base_repo_paths: typing.List[str] = BASE_REPO_PATHS
+    repository_files: typing.Optional[repofiles.RepositoryFilesPipeline]
 
-    def __init__(self) -> None:
+    def __init__(self, repository_files: typing.Optional[repofiles.RepositoryFilesPipeline] = None) -> None:
         self.name = "removing base repository"
+        # When the pipeline is given, the removal is done on its commit
+        self.repository_files = repository_files
 
     def _is_required(self) -> bool:
         return any(os.path.exists(path) for path in self.base_repo_paths)
@@ -302,18 +324,19 @@ class RemovePleskBaseRepository(action.ActiveAction):
     def _prepare_action(self) -> action.ActionResult:
         return action.ActionResult()
 
-    def _is_plesk_base(self, repo_file: str) -> bool:
-        for repo in rpm.extract_repodata(repo_file):
+    def _is_plesk_base(self, repositories: typing.List[repofiles.Repository]) -> bool:
+        for repo in repositories:
             if repo.url and "psabr.aws.plesk.tech/share/mirror/cloudlinux/7" in repo.url:
-                log.info(f"Plesk base repo found in {repo_file!r} by repository {repo.id!r}")
+                log.info(f"Plesk base repo found by repository {repo.id!r}")
                 return True
         return False
 
     def _post_action(self) -> action.ActionResult:
+        repository_files = self.repository_files if self.repository_files is not None else repofiles.RepositoryFilesPipeline()
         for path in self.base_repo_paths:
-            if os.path.exists(path) and self._is_plesk_base(path):
-                files.backup_file(path)
-                os.unlink(path)
+            repository_files.remove_file_if(path, self._is_plesk_base)
+        if self.repository_files is None:
+            repository_files.commit()
         return action.ActionResult()
 
     def _revert_action(self) -> action.ActionResult:
@@ -326,6 +349,7 @@ class AssertPleskRepositoriesNotNoneLink(action.CheckAction):
         self.description = """There are plesk repositories with link set to 'none'. To proceed with the conversion, remove following repositories:
 \t- {}
 """
+        self.cache_inputs = [checkcache.directory_input("/etc/yum.repos.d")]
 
     def _do_check(self) -> bool:
         none_link_repos = []
@@ -411,6 +435,7 @@ class AssertNoOutdatedLetsEncryptExtRepository(action.CheckAction):
 \t2. rpm -qe plesk-letsencrypt-pre plesk-py27-pip plesk-py27-setuptools plesk-py27-virtualenv plesk-wheel-cffi plesk-wheel-cryptography plesk-wheel-psutil
 \t3. rm {repo_paths}
 """
+        self.cache_inputs = [checkcache.directory_input("/etc/yum.repos.d")]
 
     def _do_check(self) -> bool:
         for path in self.OUTDATED_LETSENCRYPT_REPO_PATHS:
@@ -470,6 +495,7 @@ class CheckSourcePointsToArchiveURL(action.CheckAction):
         self.description = f"""Old archive doesn't serve up-to-date Plesk.
 \tEdit {self.AUTOINSTALLERRC_PATH} and change SOURCE - i.e. https://autoinstall.plesk.com
 """.format(self)
+        self.cache_inputs = [checkcache.file_input(self.AUTOINSTALLERRC_PATH)]
 
     def _do_check(self) -> bool:
         if not os.path.exists(self.AUTOINSTALLERRC_PATH):
@@ -511,20 +537,47 @@ class HandleInternetxRepository(action.ActiveAction):
 
 class DisableBaseRepoUpdatesRepository(action.ActiveAction):
     base_repo_paths: list = BASE_REPO_PATHS
+    repository_files: typing.Optional[repofiles.RepositoryFilesPipeline]
 
-    def __init__(self) -> None:
+    def __init__(self, repository_files: typing.Optional[repofiles.RepositoryFilesPipeline] = None) -> None:
         self.name = "disabling updates repository"
+        # When the pipeline is given, the removal is done on its commit
+        self.repository_files = repository_files
 
     def _prepare_action(self) -> action.ActionResult:
         return action.ActionResult()
 
     def _post_action(self) -> action.ActionResult:
+        repository_files = self.repository_files if self.repository_files is not None else repofiles.RepositoryFilesPipeline()
         for path in self.base_repo_paths:
-            if os.path.exists(path):
-                rpm.remove_repositories(path, [
-                    lambda repo: repo.url is not None and "mirror.pp.plesk.tech/cloudlinux/7/updates" in repo.url,
-                ])
+            repository_files.remove_repositories(path, [
+                lambda repo: repo.url is not None and "mirror.pp.plesk.tech/cloudlinux/7/updates" in repo.url,
+            ])
+        if self.repository_files is None:
+            repository_files.commit()
+        return action.ActionResult()
+
+    def _revert_action(self) -> action.ActionResult:
+        return action.ActionResult()
+
+
+class CommitPackagesRemoval(action.ActiveAction):
+    # Should go after every action adding packages to the removal transaction
+    removal: transaction.PackagesRemovalTransaction
+
+    def __init__(self, removal: transaction.PackagesRemovalTransaction) -> None:
+        self.name = "removing collected packages"
+        self.removal = removal
+
+    def _prepare_action(self) -> action.ActionResult:
+        self.removal.commit()
+        return action.ActionResult()
+
+    def _post_action(self) -> action.ActionResult:
         return action.ActionResult()
 
     def _revert_action(self) -> action.ActionResult:
         return action.ActionResult()
+
+    def estimate_prepare_time(self) -> int:
+        return 30
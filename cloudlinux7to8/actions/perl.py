@@ -1,8 +1,12 @@
 # Copyright 1999 - 2026. WebPros International GmbH. All rights reserved.
 import os
 import shutil
+import subprocess
+import typing
 
-from pleskdistup.common import action, files, log, motd, rpm
+from pleskdistup.common import action, files, log, motd, rpm, util
+
+from cloudlinux7to8.common import cleanup, perlresolver, statestore, treebackup
 
 CPAN_MODULES_DIRECTORY = "/usr/local/lib64/perl5"
 CPAN_MODULES_RPM_MAPPING = {
@@ -42,8 +46,97 @@ CPAN_MODULES_RPM_MAPPING = {
 }
 
 
+class CpanModulesInventory:
+    # Modules installed by CPAN as paths relative to the modules directory, mapped to names of
+    # RPM packages providing them or None for unknown ones. The directory is scanned only once
+    # and the inventory is shared between the check and the action. It's saved in the state
+    # directory, because the directory is moved away before the conversion.
+    directory: str
+    state: statestore.ActionState
+    resolver: typing.Optional[perlresolver.PerlModulesResolver]
+    _modules: typing.Optional[typing.Dict[str, typing.Optional[str]]]
+
+    def __init__(
+        self,
+        state_dir: str,
+        directory: str = CPAN_MODULES_DIRECTORY,
+        resolver: typing.Optional[perlresolver.PerlModulesResolver] = None,
+    ) -> None:
+        self.directory = directory
+        self.state = statestore.ActionState(state_dir, "perl_modules")
+        self.resolver = resolver
+        self._modules = None
+
+    def _resolve(self, module: str) -> typing.Optional[str]:
+        package = CPAN_MODULES_RPM_MAPPING.get(module)
+        if package is None and self.resolver is not None:
+            package = self.resolver.resolve(module)
+        return package
+
+    def _scan(self) -> typing.Dict[str, typing.Optional[str]]:
+        modules: typing.Dict[str, typing.Optional[str]] = {}
+        if not os.path.isdir(self.directory):
+            return modules
+
+        stack = [self.directory]
+        while stack:
+            with os.scandir(stack.pop()) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.name.lower().endswith(".pm"):
+                        module = os.path.relpath(entry.path, self.directory)
+                        modules[module] = CPAN_MODULES_RPM_MAPPING.get(module)
+
+        # The resolver needs file lists of the target repositories, so it's used only when the
+        # hand-maintained mapping is not enough
+        if self.resolver is not None:
+            for module, package in modules.items():
+                if package is None:
+                    modules[module] = self.resolver.resolve(module)
+        return modules
+
+    @property
+    def modules(self) -> typing.Dict[str, typing.Optional[str]]:
+        if self._modules is None:
+            self._modules = self._scan()
+        return self._modules
+
+    @property
+    def unknown_modules(self) -> typing.List[str]:
+        return sorted(module for module, package in self.modules.items() if package is None)
+
+    @property
+    def packages(self) -> typing.List[str]:
+        return sorted({package for module, package in self.modules.items() if package is not None and module in CPAN_MODULES_RPM_MAPPING})
+
+    @property
+    def resolved_packages(self) -> typing.List[str]:
+        # Packages found by the resolver are less reliable than the hand-maintained mapping
+        return sorted({package for module, package in self.modules.items() if package is not None and module not in CPAN_MODULES_RPM_MAPPING})
+
+    def resolve_unknown(self) -> None:
+        for module in self.unknown_modules:
+            self.modules[module] = self._resolve(module)
+
+    def save(self) -> None:
+        self.state.set("inventory", self.modules)
+
+    def load(self) -> bool:
+        if not self.state.has("inventory"):
+            return False
+        self._modules = self.state.get("inventory")
+        return True
+
+    def remove(self) -> None:
+        self.state.remove("inventory")
+
+
 class AssertThereIsNoUnknownPerlCpanModules(action.CheckAction):
-    def __init__(self):
+    inventory: CpanModulesInventory
+
+    def __init__(self, inventory: CpanModulesInventory):
+        self.inventory = inventory
         self.name = "checking if there are no unknown perl cpan modules"
         self.description = """There are Perl modules installed by CPAN without known RPM package analogues are found.
 \tPlease remove following modules manually from "{directory}" and reinstall them after the conversion:
@@ -57,28 +150,24 @@ class AssertThereIsNoUnknownPerlCpanModules(action.CheckAction):
 """
 
     def _do_check(self):
-        if not os.path.exists(CPAN_MODULES_DIRECTORY):
-            return True
-
-        unknown_modules = []
-        for module in files.find_files_case_insensitive(CPAN_MODULES_DIRECTORY, ["*.pm"], recursive=True):
-            module = os.path.relpath(module, CPAN_MODULES_DIRECTORY)
-            if module not in CPAN_MODULES_RPM_MAPPING.keys():
-                unknown_modules.append(module)
-
+        unknown_modules = self.inventory.unknown_modules
         if not unknown_modules:
             return True
 
-        self.description = self.description.format(directory=CPAN_MODULES_DIRECTORY, modules_list="\n\t- ".join(unknown_modules))
+        self.description = self.description.format(directory=self.inventory.directory, modules_list="\n\t- ".join(unknown_modules))
         return False
 
 
 class ReinstallPerlCpanModules(action.ActiveAction):
-    removed_modules_file: str
+    inventory: CpanModulesInventory
+    state: statestore.ActionState
+    cleanup_queue: cleanup.CleanupQueue
 
-    def __init__(self, store_dir: str) -> None:
+    def __init__(self, store_dir: str, inventory: CpanModulesInventory) -> None:
         self.name = "reinstalling perl cpan modules"
-        self.removed_modules_file = os.path.join(store_dir, "cloudlinux7to8_removed_perl_modules.txt")
+        self.inventory = inventory
+        self.state = statestore.ActionState(store_dir, "perl_modules")
+        self.cleanup_queue = cleanup.CleanupQueue(store_dir)
 
     def _is_required(self) -> bool:
         return not files.is_directory_empty(CPAN_MODULES_DIRECTORY)
@@ -88,39 +177,68 @@ class ReinstallPerlCpanModules(action.ActiveAction):
         return CPAN_MODULES_DIRECTORY + ".backup"
 
     def _prepare_action(self) -> action.ActionResult:
-        with open(self.removed_modules_file, "w") as f:
-            for module in files.find_files_case_insensitive(CPAN_MODULES_DIRECTORY, ["*.pm"], recursive=True):
-                if module in CPAN_MODULES_RPM_MAPPING.keys():
-                    f.write(CPAN_MODULES_RPM_MAPPING[module] + "\n")
+        self.inventory.save()
 
         # Yeah it's preatty rude to remove all isntalled modules,
         # but cpan don't have an option to remove one module for some reason.
         # Since we can't be sure cpan-minimal is installed, we have to
         # remove all in barbaric way.
-        shutil.move(CPAN_MODULES_DIRECTORY, self.cpan_modules_directory_backup)
+        self.state.set("backup", treebackup.backup_tree(CPAN_MODULES_DIRECTORY, self.cpan_modules_directory_backup))
         return action.ActionResult()
 
     def _post_action(self) -> action.ActionResult:
-        if not os.path.exists(self.removed_modules_file):
-            no_file_warning = f"The file containing the list of removed Perl modules does not exist. However, the action itself was not skipped. You can find the previously installed modules at the following path: {CPAN_MODULES_DIRECTORY}.backup.\n"
+        if not self.inventory.load():
+            no_file_warning = f"The list of removed Perl modules was not saved. However, the action itself was not skipped. You can find the previously installed modules at the following path: {CPAN_MODULES_DIRECTORY}.backup.\n"
             log.warn(no_file_warning)
             motd.add_finish_ssh_login_message(no_file_warning)
             return action.ActionResult()
 
-        with open(self.removed_modules_file, "r") as f:
-            packages_to_install = f.read().splitlines()
+        if self.inventory.unknown_modules and self.inventory.resolver is not None:
+            self._refresh_resolver()
+            self.inventory.resolve_unknown()
+
+        packages_to_install = self.inventory.packages
+        if packages_to_install:
             rpm.install_packages(packages_to_install)
 
-        os.unlink(self.removed_modules_file)
-        shutil.rmtree(self.cpan_modules_directory_backup)
+        failed_packages = []
+        for package in self.inventory.resolved_packages:
+            if package in packages_to_install:
+                continue
+            try:
+                rpm.install_packages([package])
+            except subprocess.CalledProcessError as ex:
+                log.warn(f"Unable to install package {package!r} providing removed perl modules: {ex}")
+                failed_packages.append(package)
+
+        not_reinstalled = [module for module, package in self.inventory.modules.items() if package is None or package in failed_packages]
+        if not_reinstalled:
+            message = "The following Perl modules installed by CPAN were removed during the conversion and were not reinstalled:\n\t- " + "\n\t- ".join(sorted(not_reinstalled)) + "\n"
+            log.warn(message)
+            motd.add_finish_ssh_login_message(message)
+
+        self.inventory.remove()
+        self.cleanup_queue.schedule_removal(self.cpan_modules_directory_backup)
+        self.state.remove("backup")
         return action.ActionResult()
 
+    def _refresh_resolver(self) -> None:
+        # Make sure file lists of the new repositories are in the cache
+        try:
+            util.logged_check_call(["/usr/bin/dnf", "-q", "makecache"])
+        except subprocess.CalledProcessError as ex:
+            log.warn(f"Unable to refresh repositories metadata, cached one will be used to find packages for perl modules: {ex}")
+        if self.inventory.resolver is not None:
+            self.inventory.resolver.reset()
+
     def _revert_action(self) -> action.ActionResult:
-        if os.path.exists(self.cpan_modules_directory_backup):
+        if self.state.has("backup"):
+            treebackup.restore_tree(self.state.get("backup"))
+            self.state.remove("backup")
+        elif os.path.exists(self.cpan_modules_directory_backup):
             shutil.move(self.cpan_modules_directory_backup, CPAN_MODULES_DIRECTORY)
 
-        if os.path.exists(self.removed_modules_file):
-            os.unlink(self.removed_modules_file)
+        self.inventory.remove()
 
         return action.ActionResult()
 
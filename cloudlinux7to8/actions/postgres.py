@@ -6,6 +6,8 @@ import typing
 
 from pleskdistup.common import action, files, leapp_configs, log, postgres, systemd, util
 
+from cloudlinux7to8.common import checkcache, pgcatalog, probe, services, statestore
+
 _ALMA8_POSTGRES_VERSION = 10
 _POSTGRES_REPO_FILE = "/etc/yum.repos.d/pgdg-redhat-all.repo"
 
@@ -17,12 +19,50 @@ def _is_modern_postgres_installed() -> bool:
     )
 
 
+def _query_database_locales(database: str) -> typing.Optional[typing.Set[str]]:
+    query = f"SELECT datcollate, datctype FROM pg_database WHERE datname='{database}';"
+    cmd = [
+        '/usr/sbin/runuser', '-u', 'postgres', '--',
+        '/usr/bin/psql', '-X', '-w', '-d', 'template1', '-qtA', '-v', 'ON_ERROR_STOP=1', '-c', query,
+    ]
+    try:
+        output = subprocess.check_output(cmd, stdin=subprocess.DEVNULL, stderr=subprocess.PIPE, universal_newlines=True)
+    except (subprocess.CalledProcessError, FileNotFoundError) as ex:
+        log.debug(f"Unable to query Postgres database locale: {ex}")
+        return None
+
+    return {value.strip() for line in output.splitlines() for value in line.split('|') if value.strip()}
+
+
+def _read_database_locales_from_catalog(data_path: str, database: str) -> typing.Optional[typing.Set[str]]:
+    try:
+        locales = pgcatalog.read_database_locales(data_path, database)
+    except (OSError, ValueError) as ex:
+        log.debug(f"Unable to read Postgres database locale from the catalog: {ex}")
+        return None
+    return locales if locales else None
+
+
+def _query_database_locales_with_trust(service_name: str, database: str) -> typing.Optional[typing.Set[str]]:
+    # The last resort: temporary allow the postgres user to connect without a password
+    config_path = os.path.join(postgres.get_data_path(), 'pg_hba.conf')
+    try:
+        files.backup_file(config_path)
+        files.push_front_strings(config_path, ["local template1 postgres trust #Added by Plesk\n"])
+        util.logged_check_call(['systemctl', 'reload-or-restart', service_name])
+        return _query_database_locales(database)
+    finally:
+        files.restore_file_from_backup(config_path)
+        util.logged_check_call(['systemctl', 'reload-or-try-restart', service_name])
+
+
 class AssertOutdatedPostgresNotInstalled(action.CheckAction):
     def __init__(self) -> None:
         self.name = "checking Postgres version 10 or later is installed"
         self.description = '''PostgreSQL version is less then 10. This means the database should be upgraded.
 \tIt might lead to data loss. Please make backup of your database and call the script with --upgrade-postgres.
 \tOr update PostgreSQL to version 10 and upgrade your databases.'''
+        self.cache_inputs = [checkcache.rpmdb_input(), checkcache.file_input(os.path.join(postgres.get_data_path(), "PG_VERSION"))]
 
     def _do_check(self) -> bool:
         return not postgres.is_postgres_installed() or not postgres.is_database_initialized() or not postgres.is_database_major_version_lower(_ALMA8_POSTGRES_VERSION)
@@ -35,43 +75,45 @@ class AssertPostgresLocaleMatchesSystemOne(action.CheckAction):
 \tYou may need to change system locale (see /etc/locale.conf and the locale command) or
 \tdatcollate and datctype properties of Postgres databases to match each other."""
         self.service_name = 'postgresql'
+        # Not cached: the fix could be a change of datcollate and datctype in the pg_database catalog,
+        # and the catalog file is updated only on a checkpoint, so it can't be used as an input
+
+    def _get_database_locales(self) -> typing.Optional[typing.Set[str]]:
+        # Read-only ways first: connection authorized by the peer method does not require any changes
+        # in pg_hba.conf, and the catalog could be read even when the server is not running
+        pg_locales = _query_database_locales("postgres")
+        if pg_locales is None:
+            log.debug("Unable to query Postgres database locale as the postgres user, read it from the catalog")
+            pg_locales = _read_database_locales_from_catalog(postgres.get_data_path(), "postgres")
+        if pg_locales is None:
+            log.debug("Unable to read Postgres database locale from the catalog, query it with pg_hba.conf changed")
+            pg_locales = _query_database_locales_with_trust(self.service_name, "postgres")
+        return pg_locales
 
     def _do_check(self):
         if not systemd.is_service_exists(self.service_name):
             log.debug(f"Postgres service {self.service_name} does not exist. Skip system locale for postgresql pre-check.")
             return False
 
-        config_path = os.path.join(postgres.get_data_path(), 'pg_hba.conf')
-
-        try:
-            files.backup_file(config_path)
-            files.push_front_strings(config_path, ["local template1 postgres trust #Added by Plesk\n"])
-            util.logged_check_call(['systemctl', 'reload-or-restart', self.service_name])
-
-            query = "SELECT datcollate, datctype FROM pg_database WHERE datname='postgres';"
-            cmd = ['/usr/bin/psql', '-U', 'postgres', '-d', 'template1', '-qt', '-v', 'ON_ERROR_STOP=1', '-P', 'border=0']
-            pg_locales = set(subprocess.check_output(cmd, input=query, universal_newlines=True).split())
-            if len(pg_locales) != 1:
-                log.debug(f"Got unexpected Postgres locales set: {pg_locales!r}")
-                return False
+        pg_locales = self._get_database_locales()
+        if pg_locales is None or len(pg_locales) != 1:
+            log.debug(f"Got unexpected Postgres locales set: {pg_locales!r}")
+            return False
 
-            sys_locales = set(
-                locale_str.split('=')[1].strip().strip('"') for locale_str
-                in files.find_file_substrings('/etc/locale.conf', 'LANG=')
-            )
-            env_locale = locale.getlocale()
-            if env_locale and env_locale[0]:
-                sys_locales.add('.'.join(map(str, env_locale)))
+        sys_locales = set(
+            locale_str.split('=')[1].strip().strip('"') for locale_str
+            in files.find_file_substrings('/etc/locale.conf', 'LANG=')
+        )
+        env_locale = locale.getlocale()
+        if env_locale and env_locale[0]:
+            sys_locales.add('.'.join(map(str, env_locale)))
 
-            if len(sys_locales) != 1:
-                log.debug(f"Got unexpected system locales set: {sys_locales!r}")
-                return False
+        if len(sys_locales) != 1:
+            log.debug(f"Got unexpected system locales set: {sys_locales!r}")
+            return False
 
-            log.debug(f"Postgres locale is {pg_locales!r}, system locale is {sys_locales!r}")
-            return pg_locales == sys_locales
-        finally:
-            files.restore_file_from_backup(config_path)
-            util.logged_check_call(['systemctl', 'reload-or-try-restart', self.service_name])
+        log.debug(f"Postgres locale is {pg_locales!r}, system locale is {sys_locales!r}")
+        return pg_locales == sys_locales
 
 
 class PostgresDatabasesUpdate(action.ActiveAction):
@@ -85,8 +127,7 @@ class PostgresDatabasesUpdate(action.ActiveAction):
         return postgres.is_postgres_installed() and postgres.is_database_initialized() and postgres.is_database_major_version_lower(_ALMA8_POSTGRES_VERSION)
 
     def _prepare_action(self) -> action.ActionResult:
-        util.logged_check_call(['systemctl', 'stop', self.service_name])
-        util.logged_check_call(['systemctl', 'disable', self.service_name])
+        services.ServicesBatch().stop([self.service_name]).disable([self.service_name]).execute()
         return action.ActionResult()
 
     def _upgrade_database(self) -> None:
@@ -106,8 +147,7 @@ class PostgresDatabasesUpdate(action.ActiveAction):
         util.logged_check_call(['dnf', 'remove', '-y', 'postgresql-upgrade'])
 
     def _enable_postgresql(self) -> None:
-        util.logged_check_call(['systemctl', 'enable', self.service_name])
-        util.logged_check_call(['systemctl', 'start', self.service_name])
+        services.ServicesBatch().enable([self.service_name]).start([self.service_name]).execute()
 
     def _post_action(self) -> action.ActionResult:
         self._upgrade_database()
@@ -129,6 +169,7 @@ class AssertModernPostgresRepositoryFilePresent(action.CheckAction):
 \tWithout it the conversion cannot reinstall PostgreSQL on CloudLinux 8 and the packages would be removed silently.
 \tPlease either place the PostgreSQL repository file at {_POSTGRES_REPO_FILE}, or remove PostgreSQL before the conversion.
 """
+        self.cache_inputs = [checkcache.rpmdb_input(), checkcache.file_input(_POSTGRES_REPO_FILE)]
 
     def _do_check(self) -> bool:
         if not _is_modern_postgres_installed():
@@ -140,8 +181,11 @@ class PostgresReinstallModernPackage(action.ActiveAction):
     # Leapp is going to remove PostgreSQL package from the system during conversion process.
     # So during this action we shouldn't use any PostgreSQL related commands. Luckily data will not be removed
     # and we can use them to recognize versions of PostgreSQL we should install.
-    def __init__(self) -> None:
+    state: statestore.ActionState
+
+    def __init__(self, state_dir: str) -> None:
         self.name = "reinstall modern PostgreSQL"
+        self.state = statestore.ActionState(state_dir, "modern_postgres")
 
     def _get_versions(self) -> typing.List[int]:
         return [int(dataset) for dataset in os.listdir(postgres.get_pgsql_root_path()) if dataset.isnumeric()]
@@ -149,12 +193,9 @@ class PostgresReinstallModernPackage(action.ActiveAction):
     def _is_required(self) -> bool:
         return _is_modern_postgres_installed()
 
-    def _is_service_active(self, service: str) -> bool:
-        res = subprocess.run(['/usr/bin/systemctl', 'is-active', service])
-        return res.returncode == 0
-
     @staticmethod
-    def _get_version_enabled_path(major_version: int) -> str:
+    def _get_legacy_version_enabled_path(major_version: int) -> str:
+        # Markers used by previous versions of the tool
         return os.path.join(postgres.get_pgsql_root_path(), f'{major_version}.enabled')
 
     @staticmethod
@@ -164,16 +205,38 @@ class PostgresReinstallModernPackage(action.ActiveAction):
     def _prepare_action(self) -> action.ActionResult:
         leapp_configs.add_repositories_mapping([_POSTGRES_REPO_FILE], skip_disabled=True)
 
-        for major_version in self._get_versions():
-            service_name = self._get_service_name(major_version)
-            if self._is_service_active(service_name):
-                with open(self._get_version_enabled_path(major_version), 'w'):
-                    pass
-                util.logged_check_call(['/usr/bin/systemctl', 'stop', service_name])
-                util.logged_check_call(['/usr/bin/systemctl', 'disable', service_name])
+        versions = self._get_versions()
+        services_states = probe.get_services_states(self._get_service_name(major_version) for major_version in versions)
+        active_versions = [major_version for major_version in versions if services_states[self._get_service_name(major_version)] == "active"]
+        self.state.extend_list("enabled_versions", active_versions)
+
+        active_services = [self._get_service_name(major_version) for major_version in active_versions]
+        if active_services:
+            services.ServicesBatch().stop(active_services).disable(active_services).execute()
 
         return action.ActionResult()
 
+    def _start_previously_enabled_versions(self) -> None:
+        enabled_versions = self.state.get_list("enabled_versions")
+        legacy_markers = []
+        for major_version in self._get_versions():
+            marker_path = self._get_legacy_version_enabled_path(major_version)
+            if os.path.exists(marker_path):
+                legacy_markers.append(marker_path)
+                if major_version not in enabled_versions:
+                    enabled_versions.append(major_version)
+
+        if not enabled_versions:
+            return
+
+        # Services of different versions are independent, so they are started simultaneously
+        enabled_services = [self._get_service_name(major_version) for major_version in enabled_versions]
+        services.ServicesBatch().enable(enabled_services).start(enabled_services).execute()
+
+        self.state.clear()
+        for marker_path in legacy_markers:
+            os.remove(marker_path)
+
     def _post_action(self) -> action.ActionResult:
         for major_version in self._get_versions():
             if major_version > _ALMA8_POSTGRES_VERSION:
@@ -185,22 +248,11 @@ class PostgresReinstallModernPackage(action.ActiveAction):
                 util.logged_check_call(['/usr/bin/dnf', '-y', 'update'])
                 util.logged_check_call(['/usr/bin/dnf', 'install', '-y', 'postgresql', 'postgresql-server'])
 
-            if os.path.exists(self._get_version_enabled_path(major_version)):
-                service_name = self._get_service_name(major_version)
-                util.logged_check_call(['/usr/bin/systemctl', 'enable', service_name])
-                util.logged_check_call(['/usr/bin/systemctl', 'start', service_name])
-                os.remove(self._get_version_enabled_path(major_version))
-
+        self._start_previously_enabled_versions()
         return action.ActionResult()
 
     def _revert_action(self) -> action.ActionResult:
-        for major_version in self._get_versions():
-            if os.path.exists(self._get_version_enabled_path(major_version)):
-                service_name = self._get_service_name(major_version)
-                util.logged_check_call(['/usr/bin/systemctl', 'enable', service_name])
-                util.logged_check_call(['/usr/bin/systemctl', 'start', service_name])
-                os.remove(self._get_version_enabled_path(major_version))
-
+        self._start_previously_enabled_versions()
         return action.ActionResult()
 
     def estimate_post_time(self) -> int:
@@ -0,0 +1,275 @@
+# Copyright 1999 - 2026. WebPros International GmbH. All rights reserved.
+import fnmatch
+import subprocess
+import typing
+
+from pleskdistup.common import action, log, util
+
+from cloudlinux7to8.common import boot, probe, services, statestore
+
+# Kernel installed by leapp to boot into the temporary upgrade environment
+LEAPP_UPGRADE_KERNEL_SUBSTRING = "upgrade"
+
+STOPPED_SERVICES_NAMESPACE = "stopped_services"
+
+# Services we can't restart safely on a running system, so a reboot is the only way to reload them
+REBOOT_REQUIRED_UNITS = {"init.scope", "dbus.service", "dbus-broker.service", "systemd-journald.service"}
+
+# Services which are safe to restart to pick up replaced libraries: restart of them does not
+# break the connection to the server or lose data of running transactions
+SAFE_TO_RESTART_SERVICES_PATTERNS = [
+    "atd.service",
+    "crond.service",
+    "dovecot.service",
+    "fail2ban.service",
+    "httpd.service",
+    "irqbalance.service",
+    "nginx.service",
+    "php-fpm.service",
+    "plesk-php*-fpm.service",
+    "postfix.service",
+    "psa.service",
+    "rsyslog.service",
+    "spamassassin.service",
+    "sw-collectd.service",
+    "sw-cp-server.service",
+    "sw-engine.service",
+    "tuned.service",
+]
+
+
+def _matches_any(unit: str, patterns: typing.List[str]) -> bool:
+    return any(fnmatch.fnmatchcase(unit, pattern) for pattern in patterns)
+
+
+def get_stopped_plesk_services(state: statestore.ActionState) -> typing.List[str]:
+    # Raises KeyError when services stopped on preparation were not recorded, e.g. by an older version
+    if not state.has("stopped"):
+        raise KeyError("services stopped during the conversion are unknown")
+    own_unit = probe.get_process_unit("self")
+    stopped = [service for service in state.get_list("stopped") if service != own_unit]
+    return [service for service, active_state in probe.get_services_states(stopped).items() if active_state in ("inactive", "failed")]
+
+
+class RememberActiveServices(action.ActiveAction):
+    # Should be placed right before DisablePleskRelatedServicesDuringUpgrade, while
+    # RememberStoppedServices goes after all actions stopping Plesk related services.
+    # Only the services found stopped between them are started back without the reboot.
+    state: statestore.ActionState
+
+    def __init__(self, state_dir: str) -> None:
+        self.name = "remember active services"
+        self.state = statestore.ActionState(state_dir, STOPPED_SERVICES_NAMESPACE)
+
+    def _prepare_action(self) -> action.ActionResult:
+        self.state.set("active", sorted(probe.get_active_services()))
+        return action.ActionResult()
+
+    def _post_action(self) -> action.ActionResult:
+        return action.ActionResult()
+
+    def _revert_action(self) -> action.ActionResult:
+        self.state.clear()
+        return action.ActionResult()
+
+
+class RememberStoppedServices(action.ActiveAction):
+    state: statestore.ActionState
+
+    def __init__(self, state_dir: str) -> None:
+        self.name = "remember services stopped for the conversion"
+        self.state = statestore.ActionState(state_dir, STOPPED_SERVICES_NAMESPACE)
+
+    def _prepare_action(self) -> action.ActionResult:
+        stopped = set(self.state.get_list("active")) - probe.get_active_services()
+        log.debug(f"Services stopped for the conversion: {', '.join(sorted(stopped))}")
+        self.state.set("stopped", sorted(stopped))
+        return action.ActionResult()
+
+    def _post_action(self) -> action.ActionResult:
+        return action.ActionResult()
+
+    def _revert_action(self) -> action.ActionResult:
+        return action.ActionResult()
+
+
+def load_default_kernel_for_kexec(expected_kernel_substring: typing.Optional[str] = None) -> bool:
+    try:
+        entry = boot.get_default_boot_entry()
+    except (subprocess.CalledProcessError, OSError, ValueError) as ex:
+        log.info(f"Unable to get the default boot entry, the regular reboot will be used: {ex}")
+        return False
+
+    reasons = boot.get_kexec_unsafe_reasons(entry, expected_kernel_substring)
+    if reasons:
+        log.info("Kexec is not safe to use, the regular reboot will be used. Reasons: " + "; ".join(reasons))
+        return False
+
+    try:
+        util.logged_check_call(boot.build_kexec_load_command(entry))
+        boot.enable_kexec_on_reboot()
+    except subprocess.CalledProcessError as ex:
+        log.warn(f"Unable to prepare kexec reboot, the regular reboot will be used: {ex}")
+        boot.disable_kexec_on_reboot()
+        return False
+
+    log.info(f"The next reboot will be done with kexec into {entry.kernel!r} with command line {boot.build_kexec_command_line(entry)!r}")
+    return True
+
+
+class PrepareKexecReboot(action.ActiveAction):
+    # The action should be placed right before the conversion reboot. It loads the kernel
+    # of the default boot entry with kexec and makes systemd use kexec instead of the
+    # firmware reboot. When kexec is not safe to use we just keep the regular reboot.
+    # The final reboot is handled by RebootIfRequired.
+    def __init__(self) -> None:
+        self.name = "prepare fast reboot with kexec"
+
+    def _prepare_action(self) -> action.ActionResult:
+        # Leapp makes its upgrade boot entry default, so we expect to boot into it
+        load_default_kernel_for_kexec(LEAPP_UPGRADE_KERNEL_SUBSTRING)
+        return action.ActionResult()
+
+    def _post_action(self) -> action.ActionResult:
+        return action.ActionResult()
+
+    def _revert_action(self) -> action.ActionResult:
+        boot.disable_kexec_on_reboot()
+        return action.ActionResult()
+
+    def estimate_prepare_time(self) -> int:
+        return 5
+
+
+class StartStoppedPleskServices(action.ActiveAction):
+    # Should be executed on finishing before actions which need services to be running,
+    # like downtime measurement. Services stopped on preparation used to stay down until
+    # the final reboot, RebootIfRequired still handles the ones we fail to start here.
+    state: statestore.ActionState
+
+    def __init__(self, state_dir: str) -> None:
+        self.name = "start plesk services stopped during the conversion"
+        self.state = statestore.ActionState(state_dir, STOPPED_SERVICES_NAMESPACE)
+
+    def _prepare_action(self) -> action.ActionResult:
+        return action.ActionResult()
+
+    def _post_action(self) -> action.ActionResult:
+        try:
+            stopped_services = get_stopped_plesk_services(self.state)
+        except (subprocess.CalledProcessError, OSError, KeyError) as ex:
+            log.warn(f"Unable to find out which services are stopped, they will be handled by the final reboot: {ex}")
+            return action.ActionResult()
+
+        if not stopped_services:
+            return action.ActionResult()
+
+        log.info(f"Starting services stopped during the conversion: {', '.join(stopped_services)}")
+        try:
+            services.ServicesBatch().start(stopped_services).execute()
+        except services.ServiceOperationsFailed as ex:
+            log.warn(f"Unable to start some services, they will be handled by the final reboot: {ex}")
+        return action.ActionResult()
+
+    def _revert_action(self) -> action.ActionResult:
+        return action.ActionResult()
+
+    def estimate_post_time(self) -> int:
+        return 30
+
+
+class RebootIfRequired(action.ActiveAction):
+    # Should be executed after all other finishing actions. Requests the final reboot only
+    # when the running system can't pick up the changes made during the conversion,
+    # otherwise starts Plesk related services stopped on preparation and restarts
+    # services still using replaced libraries if it is safe to do so.
+    state: statestore.ActionState
+    use_kexec: bool
+
+    def __init__(self, state_dir: str, use_kexec: bool = False) -> None:
+        self.name = "reboot if the system requires it"
+        self.state = statestore.ActionState(state_dir, STOPPED_SERVICES_NAMESPACE)
+        self.use_kexec = use_kexec
+
+    def _get_kernel_reboot_reason(self) -> typing.Optional[str]:
+        try:
+            default_release = boot.get_kernel_release(boot.get_default_boot_entry())
+        except (subprocess.CalledProcessError, OSError, ValueError) as ex:
+            return f"unable to get the default boot entry: {ex}"
+
+        running_release = probe.get_running_kernel_release()
+        if running_release != default_release:
+            return f"running kernel {running_release!r} differs from the default one {default_release!r}"
+        return None
+
+    def _get_modules_reboot_reason(self) -> typing.Optional[str]:
+        # Modules blacklisted by the administrator before the conversion are none of our business
+        loaded_blacklisted = probe.get_loaded_kernel_modules() & boot.CONVERSION_BLACKLISTED_KERNEL_MODULES
+        if loaded_blacklisted:
+            return "kernel modules blacklisted for the conversion are still loaded: " + ", ".join(sorted(loaded_blacklisted))
+        return None
+
+    def _get_outdated_units(self) -> typing.Dict[str, typing.Set[str]]:
+        own_unit = probe.get_process_unit("self")
+        units: typing.Dict[str, typing.Set[str]] = {}
+        for pid, libraries in probe.get_processes_with_deleted_libraries().items():
+            unit = probe.get_process_unit(pid)
+            if unit is None or unit == own_unit:
+                continue
+            units.setdefault(unit, set()).update(libraries)
+        return units
+
+    def _post_action(self) -> action.ActionResult:
+        reasons = [reason for reason in (self._get_kernel_reboot_reason(), self._get_modules_reboot_reason()) if reason]
+
+        services_to_restart = []
+        for unit, libraries in sorted(self._get_outdated_units().items()):
+            log.debug(f"Unit {unit!r} uses removed libraries: {', '.join(sorted(libraries))}")
+            if unit in REBOOT_REQUIRED_UNITS:
+                reasons.append(f"{unit!r} uses removed libraries")
+            elif unit.endswith(".service") and not unit.startswith("user@"):
+                if _matches_any(unit, SAFE_TO_RESTART_SERVICES_PATTERNS):
+                    services_to_restart.append(unit)
+                else:
+                    reasons.append(f"{unit!r} uses removed libraries and is not safe to restart")
+            else:
+                log.info(f"Unit {unit!r} uses removed libraries, it will pick up new ones on the next start")
+
+        if reasons:
+            log.info("The final reboot is required: " + "; ".join(reasons))
+            if self.use_kexec:
+                load_default_kernel_for_kexec()
+            return action.ActionResult(reboot_requested=action.RebootType.AFTER_LAST_STAGE)
+
+        try:
+            stopped_services = get_stopped_plesk_services(self.state)
+        except (subprocess.CalledProcessError, OSError, KeyError) as ex:
+            log.warn(f"Unable to find out which services are stopped, the final reboot will be done: {ex}")
+            return action.ActionResult(reboot_requested=action.RebootType.AFTER_LAST_STAGE)
+
+        log.info("The final reboot is not required")
+        batch = services.ServicesBatch()
+        # Services stopped on preparation used to be started by the final reboot
+        services_to_start = [service for service in stopped_services if service not in services_to_restart]
+        if services_to_start:
+            log.info(f"Starting services stopped during the conversion: {', '.join(services_to_start)}")
+            batch.start(services_to_start)
+        if services_to_restart:
+            log.info(f"Restarting services which use removed libraries: {', '.join(services_to_restart)}")
+            batch.restart(services_to_restart)
+        try:
+            batch.execute()
+        except services.ServiceOperationsFailed as ex:
+            log.warn(f"Unable to start some services, the final reboot will be done instead: {ex}")
+            return action.ActionResult(reboot_requested=action.RebootType.AFTER_LAST_STAGE)
+
+        return action.ActionResult()
+
+    def _prepare_action(self) -> action.ActionResult:
+        return action.ActionResult()
+
+    def _revert_action(self) -> action.ActionResult:
+        return action.ActionResult()
+
+    def estimate_post_time(self) -> int:
+        return 30
@@ -0,0 +1 @@
+# Copyright 1999 - 2026. WebPros International GmbH. All rights reserved.
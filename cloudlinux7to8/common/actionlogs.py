@@ -0,0 +1,192 @@
+# Copyright 1999 - 2026. WebPros International GmbH. All rights reserved.
+# Output of each action is located in the conversion log by byte offsets, which are kept in
+# an index next to the log. The log of a single action is read by the offsets when it's shown,
+# and only logs attached to the feedback are saved separately, so the log is never duplicated.
+import argparse
+import gzip
+import json
+import os
+import re
+import shutil
+import sys
+import typing
+import zlib
+
+from pleskdistup.common import log
+
+from cloudlinux7to8.common import events
+
+LOG_PATH = "/var/log/plesk/cloudlinux7to8.log"
+INDEX_SUFFIX = ".actions.json"
+ARCHIVE_DIRECTORY_SUFFIX = ".actions"
+COPY_CHUNK_SIZE = 1024 * 1024
+# The beginning of the action log is checksummed to find out the log was replaced by another one
+CHECKSUM_SIZE = 4096
+
+
+def _slugify(value: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "-", value.lower()).strip("-")[:64]
+
+
+class ActionLogs:
+    log_path: str
+    index_path: str
+    archive_directory: str
+
+    def __init__(self, log_path: str = LOG_PATH) -> None:
+        self.log_path = log_path
+        self.index_path = log_path + INDEX_SUFFIX
+        self.archive_directory = log_path + ARCHIVE_DIRECTORY_SUFFIX
+        self._started: typing.Optional[typing.Dict[str, typing.Any]] = None
+
+    def load_index(self) -> typing.List[typing.Dict[str, typing.Any]]:
+        if not os.path.exists(self.index_path):
+            return []
+        with open(self.index_path) as f:
+            return json.load(f)
+
+    def _save_index(self, index: typing.List[typing.Dict[str, typing.Any]]) -> None:
+        tmp_path = self.index_path + ".next"
+        with open(tmp_path, "w") as f:
+            json.dump(index, f, indent=2)
+        os.replace(tmp_path, self.index_path)
+
+    def _get_position(self) -> typing.Optional[typing.Tuple[int, int]]:
+        try:
+            stat = os.stat(self.log_path)
+        except OSError:
+            return None
+        return stat.st_ino, stat.st_size
+
+    def handle_event(self, event: events.Event) -> None:
+        if event["type"] == "action_start":
+            self._started = {"position": self._get_position(), "time": event["time"]}
+        elif event["type"] == "action_end" and self._started is not None:
+            started, self._started = self._started, None
+            self._complete(event, started)
+
+    def _complete(self, event: events.Event, started: typing.Dict[str, typing.Any]) -> None:
+        start_position, end_position = started["position"], self._get_position()
+        if start_position is None or end_position is None or start_position[0] != end_position[0] or end_position[1] < start_position[1]:
+            log.debug(f"The log file was replaced during the action {event['action']!r}, its log is not indexed")
+            return
+
+        index = self.load_index()
+        entry = {
+            "phase": event["phase"],
+            "stage": event["stage"],
+            "action": event["action"],
+            "step": event["step"],
+            "success": event["success"],
+            "started": started["time"],
+            "finished": event["time"],
+            "start_offset": start_position[1],
+            "end_offset": end_position[1],
+            "inode": end_position[0],
+            "checksum": self._get_checksum(start_position[1], end_position[1]),
+        }
+        index.append(entry)
+        self._save_index(index)
+
+    def _get_checksum(self, start: int, end: int) -> int:
+        with open(self.log_path, "rb") as f:
+            f.seek(start)
+            return zlib.crc32(f.read(min(CHECKSUM_SIZE, end - start)))
+
+    def read(self, entry: typing.Dict[str, typing.Any]) -> typing.Optional[typing.Iterator[bytes]]:
+        # Returns None if the log was replaced since the action, so the offsets point to something else
+        try:
+            source = open(self.log_path, "rb")
+        except OSError:
+            return None
+        stat = os.fstat(source.fileno())
+        start, end = entry["start_offset"], entry["end_offset"]
+        if stat.st_ino != entry.get("inode") or stat.st_size < end:
+            source.close()
+            return None
+        source.seek(start)
+        if zlib.crc32(source.read(min(CHECKSUM_SIZE, end - start))) != entry.get("checksum"):
+            source.close()
+            return None
+        return self._read_range(source, start, end)
+
+    def _read_range(self, source: typing.BinaryIO, start: int, end: int) -> typing.Iterator[bytes]:
+        with source:
+            source.seek(start)
+            remaining = end - start
+            while remaining > 0:
+                chunk = source.read(min(COPY_CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                yield chunk
+                remaining -= len(chunk)
+
+    def find(self, name: str) -> typing.List[typing.Dict[str, typing.Any]]:
+        index = self.load_index()
+        matches = [entry for entry in index if entry["action"] == name]
+        if not matches:
+            matches = [entry for entry in index if name.lower() in entry["action"].lower()]
+        return matches
+
+    def extract_relevant(self, last: int = 3) -> typing.List[str]:
+        # Logs of failed and the last actions are saved to be attached to the feedback,
+        # the rest is available in the conversion log anyway
+        if os.path.isdir(self.archive_directory):
+            shutil.rmtree(self.archive_directory)
+
+        index = self.load_index()
+        relevant = [entry for entry in index if not entry["success"]]
+        relevant += [entry for entry in index[len(index) - last:] if entry not in relevant]
+        archives = []
+        for entry in relevant:
+            chunks = self.read(entry) if entry["end_offset"] > entry["start_offset"] else None
+            if chunks is None:
+                continue
+            os.makedirs(self.archive_directory, exist_ok=True)
+            archive_name = f"{index.index(entry):03}-{_slugify(str(entry['phase']))}-{entry['step']}-{_slugify(entry['action'])}.log.gz"
+            archive_path = os.path.join(self.archive_directory, archive_name)
+            with gzip.open(archive_path, "wb") as destination:
+                for chunk in chunks:
+                    destination.write(chunk)
+            archives.append(archive_path)
+        return archives
+
+_action_logs: typing.Dict[str, ActionLogs] = {}
+
+
+def install(log_path: str = LOG_PATH) -> ActionLogs:
+    if log_path not in _action_logs:
+        action_logs = ActionLogs(log_path)
+        events.publisher.subscribe(action_logs.handle_event)
+        _action_logs[log_path] = action_logs
+    return _action_logs[log_path]
+
+
+def show_action_log(args: typing.Sequence[str], log_path: str = LOG_PATH) -> int:
+    # A standalone command, so it works after the conversion as well
+    parser = argparse.ArgumentParser(prog="cloudlinux7to8 --action-log", description="Show the log of a conversion action")
+    parser.add_argument("action", help="Name of the action or a part of the name")
+    options = parser.parse_args(args)
+
+    action_logs = ActionLogs(log_path)
+    entries = action_logs.find(options.action)
+    if not entries:
+        print(f"There is no log of the action {options.action!r}. Known actions are:")
+        for action_name in sorted({entry["action"] for entry in action_logs.load_index()}):
+            print(f"\t{action_name}")
+        return 1
+
+    for entry in entries:
+        status = "succeeded" if entry["success"] else "failed"
+        print(f"==> {entry['phase']}: {entry['step']} {entry['action']!r} {status} <==", flush=True)
+        if entry["end_offset"] == entry["start_offset"]:
+            print("The action produced no log")
+            continue
+        chunks = action_logs.read(entry)
+        if chunks is None:
+            print(f"The log is not available, {action_logs.log_path!r} was replaced after the action")
+            continue
+        for chunk in chunks:
+            sys.stdout.buffer.write(chunk)
+        sys.stdout.buffer.flush()
+    return 0
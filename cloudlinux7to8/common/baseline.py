@@ -0,0 +1,182 @@
+# Copyright 1999 - 2026. WebPros International GmbH. All rights reserved.
+# Performance baseline of the hosting: response time of a sample of hosted domains through the
+# local web server, a few standard database queries and the latency of the Plesk panel PHP-FPM
+# pool. The baseline is captured before the conversion and compared with the same measurements
+# made after it.
+import functools
+import http.client
+import json
+import os
+import ssl
+import statistics
+import subprocess
+import time
+import typing
+
+from pleskdistup.common import log, postgres
+
+from cloudlinux7to8.common import hosting, probe
+
+BASELINE_FILE_NAME = "cloudlinux7to8_baseline.json"
+REPORT_FILE_NAME = "cloudlinux7to8_baseline_report.txt"
+
+DOMAINS_SAMPLE_SIZE = 10
+REPEATS = 3
+REQUEST_TIMEOUT = 30
+# Differences below the value are considered as measurement noise
+MIN_SIGNIFICANT_DIFFERENCE = 0.05
+# Used for domains with unknown hosting address and for the panel
+LOCAL_ADDRESS = "127.0.0.1"
+
+MARIADB_QUERIES = {
+    "select": "SELECT 1",
+    "domains": "SELECT COUNT(*) FROM psa.domains",
+    "status": "SHOW GLOBAL STATUS",
+}
+POSTGRES_QUERIES = {
+    "select": "SELECT 1",
+    "databases": "SELECT datname FROM pg_database",
+}
+# Services serving measurements by the measurement name prefix. Names of a database service
+# differ between distributions and the web server could work without nginx, so a group is
+# considered running if any of its services is active.
+MEASUREMENT_SERVICES = {
+    "http": ["httpd.service", "nginx.service"],
+    "php-fpm": ["sw-engine.service"],
+    "mariadb": ["mariadb.service", "mysql.service", "mysqld.service"],
+    "postgresql": ["postgresql.service"],
+}
+
+Measurement = typing.Callable[[], None]
+
+
+def _http_request(host: str, address: str = LOCAL_ADDRESS, path: str = "/", port: int = 80, tls: bool = False) -> None:
+    # Web servers listen on hosting addresses of domains, which are not always reachable through the loopback
+    if ":" in address:
+        address = f"[{address}]"
+    if tls:
+        # The certificate of the panel is often self-signed, we measure the latency only
+        connection: http.client.HTTPConnection = http.client.HTTPSConnection(
+            address, port, timeout=REQUEST_TIMEOUT, context=ssl._create_unverified_context(),
+        )
+    else:
+        connection = http.client.HTTPConnection(address, port, timeout=REQUEST_TIMEOUT)
+    try:
+        connection.request("GET", path, headers={"Host": host, "User-Agent": "cloudlinux7to8-baseline"})
+        connection.getresponse().read()
+    finally:
+        connection.close()
+
+
+def _mariadb_query(query: str) -> None:
+    subprocess.run(
+        [hosting.MYSQL_PATH, "-uadmin", "-Ne", query],
+        env=dict(os.environ, MYSQL_PWD=hosting.get_psa_password()),
+        stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, check=True, timeout=REQUEST_TIMEOUT,
+    )
+
+
+def _postgres_query(query: str) -> None:
+    subprocess.run(
+        ["/usr/sbin/runuser", "-u", "postgres", "--", "/usr/bin/psql", "-X", "-w", "-d", "template1", "-qtA", "-c", query],
+        stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, check=True, timeout=REQUEST_TIMEOUT,
+    )
+
+
+def get_measurements(sample_size: int = DOMAINS_SAMPLE_SIZE) -> typing.Dict[str, Measurement]:
+    measurements: typing.Dict[str, Measurement] = {}
+    domains = hosting.get_domains_sample(hosting.get_awstats_domains(), sample_size)
+    addresses = hosting.get_domains_addresses() if domains else {}
+    for domain in domains:
+        measurements[f"http {domain}"] = functools.partial(_http_request, domain, addresses.get(domain, LOCAL_ADDRESS))
+
+    # The login page of the panel is served by the sw-engine PHP-FPM pool
+    measurements["php-fpm plesk login page"] = functools.partial(_http_request, "localhost", path="/login_up.php", port=8443, tls=True)
+
+    if hosting.is_psa_database_available():
+        for name, query in MARIADB_QUERIES.items():
+            measurements[f"mariadb {name}"] = functools.partial(_mariadb_query, query)
+
+    if postgres.is_postgres_installed() and postgres.is_database_initialized():
+        for name, query in POSTGRES_QUERIES.items():
+            measurements[f"postgresql {name}"] = functools.partial(_postgres_query, query)
+    return measurements
+
+
+def get_not_running(names: typing.Iterable[str]) -> typing.Set[str]:
+    # Returns names of measurements served by services that are not running at the moment
+    names = list(names)
+    groups = {name: MEASUREMENT_SERVICES.get(name.split(" ", 1)[0], []) for name in names}
+    states = probe.get_services_states(sorted({service for services in groups.values() for service in services}))
+    return {
+        name for name, services in groups.items()
+        if services and not any(states.get(service) == "active" for service in services)
+    }
+
+
+def _measure(measurement: Measurement, repeats: int) -> typing.Optional[float]:
+    durations = []
+    for _ in range(repeats):
+        started_at = time.monotonic()
+        try:
+            measurement()
+        except (OSError, subprocess.SubprocessError, http.client.HTTPException) as ex:
+            log.debug(f"Measurement failed: {ex}")
+            return None
+        durations.append(time.monotonic() - started_at)
+    return statistics.median(durations)
+
+
+def capture(measurements: typing.Dict[str, Measurement], repeats: int = REPEATS) -> typing.Dict[str, typing.Optional[float]]:
+    return {name: _measure(measurement, repeats) for name, measurement in measurements.items()}
+
+
+def save(state_dir: str, results: typing.Dict[str, typing.Optional[float]]) -> None:
+    path = os.path.join(state_dir, BASELINE_FILE_NAME)
+    tmp_path = path + ".next"
+    with open(tmp_path, "w") as f:
+        json.dump({"time": time.time(), "results": results}, f, indent=4)
+    os.replace(tmp_path, path)
+
+
+def load(state_dir: str) -> typing.Optional[typing.Dict[str, typing.Optional[float]]]:
+    path = os.path.join(state_dir, BASELINE_FILE_NAME)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)["results"]
+
+
+def _format_result(value: typing.Optional[float]) -> str:
+    return f"{value * 1000:.0f} ms" if value is not None else "failed"
+
+
+def compare(
+    before: typing.Dict[str, typing.Optional[float]],
+    after: typing.Dict[str, typing.Optional[float]],
+    threshold: float,
+    skipped: typing.Collection[str] = (),
+) -> typing.Tuple[typing.List[str], typing.List[str]]:
+    # Returns lines of the report and names of measurements became slower than the threshold.
+    # Skipped measurements are shown in the report, but never considered as regressions.
+    width = max(len(name) for name in before) if before else 0
+    lines = [f"{'':{width}}  {'before':>10}  {'after':>10}  {'change':>8}"]
+    regressions = []
+    for name, old in sorted(before.items()):
+        new = after.get(name)
+        change = ""
+        flag = ""
+        result = _format_result(new)
+        if name in skipped:
+            result = "skipped"
+            flag = "  service is not running"
+        elif old is not None and new is not None:
+            change = f"{(new - old) / old * 100:+.0f}%" if old > 0 else ""
+            if new > old * (1 + threshold) and new - old > MIN_SIGNIFICANT_DIFFERENCE:
+                regressions.append(name)
+                flag = "  SLOWER"
+        elif old is not None:
+            regressions.append(name)
+            flag = "  FAILED"
+        lines.append(f"{name:{width}}  {_format_result(old):>10}  {result:>10}  {change:>8}{flag}")
+    return lines, regressions
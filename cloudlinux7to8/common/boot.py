@@ -0,0 +1,145 @@
+# Copyright 1999 - 2026. WebPros International GmbH. All rights reserved.
+import os
+import shlex
+import subprocess
+import typing
+
+GRUBBY_PATH = "/usr/sbin/grubby"
+KEXEC_PATH = "/usr/sbin/kexec"
+SYSTEMCTL_PATH = "/usr/bin/systemctl"
+
+KEXEC_LOADED_PATH = "/sys/kernel/kexec_loaded"
+LOCKDOWN_PATH = "/sys/kernel/security/lockdown"
+SECURE_BOOT_EFIVAR_PATH = "/sys/firmware/efi/efivars/SecureBoot-8be4df61-93ca-11d2-aa0d-00e098032b8c"
+XEN_PATH = "/proc/xen"
+
+# Kernel modules known to break the conversion, they are blacklisted by DisableSuspiciousKernelModules
+CONVERSION_BLACKLISTED_KERNEL_MODULES = {"pata_acpi", "btrfs", "floppy"}
+
+# The drop-in lives in /run, so it affects only the nearest reboot and disappears with it
+REBOOT_KEXEC_DROPIN_PATH = "/run/systemd/system/systemd-reboot.service.d/cloudlinux7to8-kexec.conf"
+REBOOT_KEXEC_DROPIN_CONTENT = f"""[Service]
+ExecStart=
+ExecStart={SYSTEMCTL_PATH} --force kexec
+"""
+
+
+class BootEntry(typing.NamedTuple):
+    kernel: str
+    initrd: typing.Optional[str]
+    args: typing.List[str]
+    root: typing.Optional[str]
+
+
+def _strip_unresolved_variables(values: typing.List[str]) -> typing.List[str]:
+    # BLS entries on CloudLinux 8 could refer grub environment variables like $tuned_params,
+    # kexec is unable to resolve them, and they are empty by default anyway
+    return [value for value in values if not value.startswith("$")]
+
+
+def parse_grubby_info(output: str) -> BootEntry:
+    properties: typing.Dict[str, str] = {}
+    for line in output.splitlines():
+        if "=" not in line:
+            continue
+        key, value = line.split("=", 1)
+        # grubby prints information about one entry, but let's be sure we take only the first one
+        if key in properties:
+            break
+        if value.startswith('"') and value.endswith('"'):
+            value = value[1:-1]
+        properties[key] = value
+
+    if "kernel" not in properties:
+        raise ValueError(f"There is no kernel in the boot entry information: {output!r}")
+
+    initrds = _strip_unresolved_variables(properties.get("initrd", "").split())
+    return BootEntry(
+        kernel=properties["kernel"],
+        initrd=initrds[0] if initrds else None,
+        args=_strip_unresolved_variables(shlex.split(properties.get("args", ""))),
+        root=properties.get("root") or None,
+    )
+
+
+def get_default_boot_entry() -> BootEntry:
+    return parse_grubby_info(subprocess.check_output([GRUBBY_PATH, "--info=DEFAULT"], universal_newlines=True))
+
+
+def get_kernel_release(entry: BootEntry) -> str:
+    name = os.path.basename(entry.kernel)
+    return name[len("vmlinuz-"):] if name.startswith("vmlinuz-") else name
+
+
+def build_kexec_command_line(entry: BootEntry) -> str:
+    args = list(entry.args)
+    if entry.root and not any(arg.startswith("root=") for arg in args):
+        args.insert(0, "root=" + entry.root)
+    return " ".join(args)
+
+
+def build_kexec_load_command(entry: BootEntry) -> typing.List[str]:
+    cmd = [KEXEC_PATH, "--load", entry.kernel]
+    if entry.initrd:
+        cmd.append("--initrd=" + entry.initrd)
+    cmd.append("--command-line=" + build_kexec_command_line(entry))
+    return cmd
+
+
+def _is_secure_boot_enabled() -> bool:
+    if not os.path.exists(SECURE_BOOT_EFIVAR_PATH):
+        return False
+    with open(SECURE_BOOT_EFIVAR_PATH, "rb") as f:
+        # The first 4 bytes are attributes of the variable, the value is the last byte
+        data = f.read()
+    return len(data) > 4 and data[-1] == 1
+
+
+def _is_kernel_locked_down() -> bool:
+    if not os.path.exists(LOCKDOWN_PATH):
+        return False
+    with open(LOCKDOWN_PATH) as f:
+        return "[none]" not in f.read()
+
+
+def get_kexec_unsafe_reasons(entry: BootEntry, expected_kernel_substring: typing.Optional[str] = None) -> typing.List[str]:
+    reasons = []
+    if not os.path.exists(KEXEC_PATH):
+        reasons.append(f"kexec utility {KEXEC_PATH!r} is not installed")
+    if not os.path.exists(KEXEC_LOADED_PATH):
+        reasons.append("the running kernel does not support kexec")
+    if os.path.exists(XEN_PATH):
+        reasons.append("kexec is not reliable under Xen")
+    if _is_secure_boot_enabled() or _is_kernel_locked_down():
+        reasons.append("loading of unsigned kernels is prohibited by secure boot or kernel lockdown")
+    if not os.path.exists(entry.kernel):
+        reasons.append(f"kernel {entry.kernel!r} of the default boot entry does not exist")
+    if entry.initrd and not os.path.exists(entry.initrd):
+        reasons.append(f"initrd {entry.initrd!r} of the default boot entry does not exist")
+    if not entry.root and not any(arg.startswith("root=") for arg in entry.args):
+        reasons.append("root device of the default boot entry is unknown")
+    if expected_kernel_substring and expected_kernel_substring not in os.path.basename(entry.kernel):
+        reasons.append(f"default boot entry kernel {entry.kernel!r} is not the expected one")
+    return reasons
+
+
+def is_kexec_loaded() -> bool:
+    if not os.path.exists(KEXEC_LOADED_PATH):
+        return False
+    with open(KEXEC_LOADED_PATH) as f:
+        return f.read().strip() == "1"
+
+
+def enable_kexec_on_reboot() -> None:
+    os.makedirs(os.path.dirname(REBOOT_KEXEC_DROPIN_PATH), exist_ok=True)
+    with open(REBOOT_KEXEC_DROPIN_PATH, "w") as f:
+        f.write(REBOOT_KEXEC_DROPIN_CONTENT)
+    subprocess.check_call([SYSTEMCTL_PATH, "daemon-reload"])
+
+
+def disable_kexec_on_reboot() -> None:
+    if os.path.exists(REBOOT_KEXEC_DROPIN_PATH):
+        os.unlink(REBOOT_KEXEC_DROPIN_PATH)
+        subprocess.check_call([SYSTEMCTL_PATH, "daemon-reload"])
+    if is_kexec_loaded():
+        subprocess.check_call([KEXEC_PATH, "--unload"])
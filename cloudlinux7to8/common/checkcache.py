@@ -0,0 +1,146 @@
+# Copyright 1999 - 2026. WebPros International GmbH. All rights reserved.
+import hashlib
+import json
+import os
+import time
+import typing
+
+from pleskdistup.common import action, log
+
+from cloudlinux7to8.common import probe
+
+# Every input returns a string describing the current state of something a check depends on.
+# A check is re-evaluated only when the combined description of its inputs changes.
+CheckInput = typing.Callable[[], str]
+
+RPMDB_PATHS = ["/var/lib/rpm/Packages", "/var/lib/rpm/rpmdb.sqlite"]
+CACHE_MAX_AGE = 24 * 60 * 60
+
+
+def _describe_path(path: str) -> str:
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return f"{path}:absent"
+    return f"{path}:{stat.st_ino}:{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def file_input(path: str) -> CheckInput:
+    return lambda: "file " + _describe_path(path)
+
+
+def directory_input(path: str) -> CheckInput:
+    def describe() -> str:
+        if not os.path.isdir(path):
+            return f"directory {path}:absent"
+        entries = sorted(os.listdir(path))
+        return f"directory {path}:" + ";".join(_describe_path(os.path.join(path, entry)) for entry in entries)
+    return describe
+
+
+def rpmdb_input() -> CheckInput:
+    return lambda: "rpmdb " + ";".join(_describe_path(path) for path in RPMDB_PATHS)
+
+
+def service_input(service: str) -> CheckInput:
+    def describe() -> str:
+        return f"service {service}:{probe.get_services_states([service])[service]}"
+    return describe
+
+
+def kernel_input() -> CheckInput:
+    return lambda: "kernel " + probe.get_running_kernel_release()
+
+
+class CheckResultsCache:
+    path: str
+    max_age: int
+    recheck_all: bool
+
+    def __init__(self, path: str, recheck_all: bool = False, max_age: int = CACHE_MAX_AGE) -> None:
+        self.path = path
+        self.recheck_all = recheck_all
+        self.max_age = max_age
+        self._results: typing.Optional[typing.Dict[str, typing.Dict[str, typing.Any]]] = None
+
+    def _load(self) -> typing.Dict[str, typing.Dict[str, typing.Any]]:
+        if self._results is None:
+            self._results = {}
+            if os.path.exists(self.path):
+                try:
+                    with open(self.path) as f:
+                        self._results = json.load(f)
+                except (OSError, ValueError) as ex:
+                    log.warn(f"Unable to read check results cache {self.path!r}: {ex}. The cache will be recreated.")
+        return self._results
+
+    def get(self, key: str, fingerprint: str) -> typing.Optional[typing.Tuple[bool, str]]:
+        if self.recheck_all:
+            return None
+
+        entry = self._load().get(key)
+        if entry is None or entry["fingerprint"] != fingerprint or time.time() - entry["timestamp"] > self.max_age:
+            return None
+        return entry["result"], entry["description"]
+
+    def set(self, key: str, fingerprint: str, result: bool, description: str) -> None:
+        results = self._load()
+        results[key] = {
+            "fingerprint": fingerprint,
+            "result": result,
+            "description": description,
+            "timestamp": time.time(),
+        }
+
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = self.path + ".next"
+        with open(tmp_path, "w") as f:
+            json.dump(results, f)
+        os.replace(tmp_path, self.path)
+
+
+class CachedCheck(action.CheckAction):
+    check: action.CheckAction
+    cache: CheckResultsCache
+    inputs: typing.List[CheckInput]
+
+    def __init__(self, check: action.CheckAction, cache: CheckResultsCache, inputs: typing.List[CheckInput]) -> None:
+        self.name = check.name
+        self.description = check.description
+        self.check = check
+        self.cache = cache
+        self.inputs = inputs
+
+    @property
+    def _cache_key(self) -> str:
+        return f"{self.check.__class__.__name__}:{self.check.name}"
+
+    def _fingerprint(self) -> str:
+        digest = hashlib.sha256()
+        for check_input in self.inputs:
+            digest.update(check_input().encode("utf-8", errors="surrogateescape"))
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def _do_check(self) -> bool:
+        fingerprint = self._fingerprint()
+        cached = self.cache.get(self._cache_key, fingerprint)
+        if cached is not None:
+            log.debug(f"Inputs of the check {self.name!r} were not changed since the last run, reuse the result")
+            result, self.description = cached
+            return result
+
+        result = self.check.do_check()
+        self.description = self.check.description
+        self.cache.set(self._cache_key, fingerprint, result, self.description)
+        return result
+
+
+def cached(check: action.CheckAction, cache: CheckResultsCache, inputs: typing.Optional[typing.List[CheckInput]] = None) -> action.CheckAction:
+    # Checks could declare their inputs by themselves with the cache_inputs attribute.
+    # Checks without declared inputs are evaluated on every run.
+    if inputs is None:
+        inputs = getattr(check, "cache_inputs", None)
+    if not inputs:
+        return check
+    return CachedCheck(check, cache, inputs)
@@ -0,0 +1,112 @@
+# Copyright 1999 - 2026. WebPros International GmbH. All rights reserved.
+import os
+import shutil
+import time
+import typing
+
+from pleskdistup.common import log, util
+
+from cloudlinux7to8.common import throttle
+
+SYSTEMCTL_PATH = "/usr/bin/systemctl"
+CLEANUP_SERVICE_NAME = "cloudlinux7to8-cleanup.service"
+CLEANUP_SERVICE_PATH = os.path.join("/etc/systemd/system", CLEANUP_SERVICE_NAME)
+
+# The worker takes the whole queue into processing and removes it only when every entry
+# is removed. "rm -rf" just continues on partially removed trees, so an interrupted worker
+# resumes from where it stopped on the next start, including the start after a reboot.
+CLEANUP_WORKER_SCRIPT = """#!/bin/sh
+QUEUE="{queue_path}"
+
+while [ -e "$QUEUE" ] || [ -e "$QUEUE.processing" ]; do
+    [ -e "$QUEUE.processing" ] || mv -f "$QUEUE" "$QUEUE.processing"
+    while IFS= read -r path; do
+        [ -n "$path" ] && rm -rf -- "$path"
+    done < "$QUEUE.processing"
+    rm -f "$QUEUE.processing"
+done
+
+{systemctl} disable {service}
+rm -f "{service_path}" "$0"
+{systemctl} daemon-reload
+"""
+
+CLEANUP_SERVICE_CONTENT = """[Unit]
+Description=Remove leftovers of the CloudLinux 7 to CloudLinux 8 conversion
+After=multi-user.target
+
+[Service]
+Type=oneshot
+Nice=19
+IOSchedulingClass=idle
+{limits}ExecStart=/bin/sh {script_path}
+
+[Install]
+WantedBy=multi-user.target
+"""
+
+
+class CleanupQueue:
+    # Persistent queue of directories to remove in background by a low priority worker.
+    # Directories are renamed out of the way first, so the original path is free right away.
+    queue_path: str
+    script_path: str
+
+    def __init__(self, state_dir: str) -> None:
+        self.queue_path = os.path.join(state_dir, "cloudlinux7to8_cleanup.queue")
+        self.script_path = os.path.join(state_dir, "cloudlinux7to8_cleanup.sh")
+
+    def _get_removal_path(self, path: str) -> str:
+        parent, name = os.path.split(os.path.normpath(path))
+        return os.path.join(parent, f".{name}.cloudlinux7to8-removed.{int(time.time())}")
+
+    def schedule_removal(self, path: str) -> None:
+        if not os.path.exists(path):
+            return
+
+        removal_path = self._get_removal_path(path)
+        try:
+            os.rename(path, removal_path)
+        except OSError as ex:
+            # For example the directory is a mount point, so it can't be renamed
+            log.warn(f"Unable to move {path!r} out of the way for background removal, remove it right away: {ex}")
+            shutil.rmtree(path)
+            return
+
+        os.makedirs(os.path.dirname(self.queue_path), exist_ok=True)
+        with open(self.queue_path, "a") as f:
+            f.write(removal_path + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        log.debug(f"Directory {path!r} is moved to {removal_path!r} and scheduled for background removal")
+
+    def get_pending(self) -> typing.List[str]:
+        pending: typing.List[str] = []
+        for path in (self.queue_path + ".processing", self.queue_path):
+            if os.path.exists(path):
+                with open(path) as f:
+                    pending.extend(line for line in f.read().splitlines() if line)
+        return pending
+
+    def start_worker(self, limits: typing.Optional[throttle.ThrottleLimits] = None) -> None:
+        if not self.get_pending():
+            return
+
+        with open(self.script_path, "w") as f:
+            f.write(CLEANUP_WORKER_SCRIPT.format(
+                queue_path=self.queue_path,
+                systemctl=SYSTEMCTL_PATH,
+                service=CLEANUP_SERVICE_NAME,
+                service_path=CLEANUP_SERVICE_PATH,
+            ))
+        limits_content = ""
+        if limits is not None:
+            limits_content = "".join(line + "\n" for line in [f"Slice={throttle.SLICE_NAME}"] + throttle.get_unit_properties(limits))
+        with open(CLEANUP_SERVICE_PATH, "w") as f:
+            f.write(CLEANUP_SERVICE_CONTENT.format(script_path=self.script_path, limits=limits_content))
+
+        util.logged_check_call([SYSTEMCTL_PATH, "daemon-reload"])
+        # Enabled so the worker continues after reboot if it was interrupted
+        util.logged_check_call([SYSTEMCTL_PATH, "enable", CLEANUP_SERVICE_NAME])
+        util.logged_check_call([SYSTEMCTL_PATH, "start", "--no-block", CLEANUP_SERVICE_NAME])
+        log.info(f"Background removal of conversion leftovers is started with {CLEANUP_SERVICE_NAME}")
@@ -0,0 +1,170 @@
+# Copyright 1999 - 2026. WebPros International GmbH. All rights reserved.
+# dnf session which loads repositories metadata once and serves several queries and
+# transactions. The dnf python API is used when it's available, otherwise the session
+# falls back to calling package manager utilities for every operation.
+import typing
+
+from pleskdistup.common import log, rpm
+
+
+class DnfTransactionError(Exception):
+    pass
+
+
+class DnfSession:
+    _base: typing.Any
+    _sack_loaded: bool
+    _api_available: typing.Optional[bool]
+
+    def __init__(self) -> None:
+        self._base = None
+        self._sack_loaded = False
+        self._api_available = None
+
+    @property
+    def api_available(self) -> bool:
+        if self._api_available is None:
+            try:
+                import dnf  # noqa: F401
+                self._api_available = True
+            except ImportError:
+                log.debug("dnf python API is not available, package manager utilities will be used")
+                self._api_available = False
+        return self._api_available
+
+    @property
+    def base(self) -> typing.Any:
+        import dnf
+
+        if self._base is None:
+            self._base = dnf.Base()
+            self._base.conf.read()
+            self._base.conf.assumeyes = True
+            self._base.read_all_repos()
+        if not self._sack_loaded:
+            log.debug("Loading repositories metadata for dnf session")
+            self._base.fill_sack(load_system_repo=True, load_available_repos=True)
+            self._sack_loaded = True
+        return self._base
+
+    def close(self) -> None:
+        if self._base is not None:
+            self._base.close()
+            self._base = None
+            self._sack_loaded = False
+
+    def __enter__(self) -> "DnfSession":
+        return self
+
+    def __exit__(self, *args: typing.Any) -> None:
+        self.close()
+
+    def is_installed(self, package: str) -> bool:
+        if not self.api_available:
+            return rpm.is_package_installed(package)
+        return bool(self.base.sack.query().installed().filter(name=package))
+
+    def filter_installed(self, packages: typing.Iterable[str]) -> typing.List[str]:
+        return [package for package in packages if self.is_installed(package)]
+
+    def _resolve(
+        self,
+        install: typing.List[str],
+        remove: typing.List[str],
+        repository: typing.Optional[str],
+    ) -> typing.Any:
+        import dnf
+        import hawkey
+
+        base = self.base
+        base.reset(goal=True)
+        try:
+            for package in remove:
+                base.remove(package)
+            for package in install:
+                base.install(package, reponame=repository, forms=[hawkey.FORM_NAME])
+            base.resolve(allow_erasing=True)
+        except dnf.exceptions.Error as ex:
+            raise DnfTransactionError(f"Unable to resolve transaction installing {install} and removing {remove}: {ex}")
+
+        return base
+
+    def _get_dependent_removals(self, base: typing.Any, remove: typing.List[str]) -> typing.List[str]:
+        # Removal of packages we were not asked to remove means something depends on removed packages
+        import dnf
+
+        return sorted(
+            item.pkg.name for item in base.transaction
+            if item.action == dnf.transaction.PKG_REMOVE and item.pkg.name not in remove
+        )
+
+    def _check_signatures(self, base: typing.Any, packages: typing.List[typing.Any]) -> None:
+        for package in packages:
+            code, message = base.package_signature_check(package)
+            if code == 0:
+                continue
+            if code == 1:
+                # The key is known from the repository configuration, but is not imported yet
+                base.package_import_key(package, askcb=lambda *args: True)
+                code, message = base.package_signature_check(package)
+            if code != 0:
+                raise DnfTransactionError(f"Signature check for {package} failed: {message}")
+
+    def simulate(
+        self,
+        install: typing.List[str],
+        remove: typing.Optional[typing.List[str]] = None,
+        repository: typing.Optional[str] = None,
+    ) -> None:
+        remove = remove or []
+        if not self.api_available:
+            rpm.install_packages(install, repository=repository, simulate=True)
+            return
+        self._resolve(install, remove, repository)
+        self.base.reset(goal=True)
+
+    def _run_separately(self, install: typing.List[str], remove: typing.List[str], repository: typing.Optional[str]) -> None:
+        # The same as it was done before the session: packages are removed by rpm without
+        # dependencies check, so packages depending on them are kept, and installed afterwards
+        self.simulate(install, repository=repository)
+        if remove:
+            rpm.remove_packages(remove)
+        rpm.install_packages(install, repository=repository)
+        self._sack_loaded = False
+
+    def run(
+        self,
+        install: typing.List[str],
+        remove: typing.Optional[typing.List[str]] = None,
+        repository: typing.Optional[str] = None,
+    ) -> None:
+        # Installation and removal are done in one transaction, so there is no moment
+        # when neither of packages is installed
+        remove = remove or []
+        reinstalled = set(install) & set(remove)
+        if not self.api_available or reinstalled:
+            if reinstalled:
+                # dnf can't remove and install the same package in one transaction
+                log.debug(f"Packages {', '.join(sorted(reinstalled))} are reinstalled, so removal and installation are done separately")
+            self._run_separately(install, remove, repository)
+            return
+
+        base = self._resolve(install, remove, repository)
+        dependent_removals = self._get_dependent_removals(base, remove)
+        if dependent_removals:
+            # Other packages, like users of MariaDB-shared, depend on removed ones. The transaction
+            # would remove them as well, so the removal is done without dependencies check instead.
+            log.info(f"Packages {', '.join(dependent_removals)} depend on removed packages, so removal and installation are done separately")
+            base.reset(goal=True)
+            self._run_separately(install, remove, repository)
+            return
+
+        packages_to_download = list(base.transaction.install_set)
+        log.info(f"Running dnf transaction installing {', '.join(install)} and removing {', '.join(remove) or 'nothing'}")
+        base.download_packages(packages_to_download)
+        self._check_signatures(base, packages_to_download)
+        base.do_transaction()
+
+        # The system repository was changed, so the installed packages should be read again
+        base.reset(goal=True, sack=True)
+        self._sack_loaded = False
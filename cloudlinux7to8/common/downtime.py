@@ -0,0 +1,102 @@
+# Copyright 1999 - 2026. WebPros International GmbH. All rights reserved.
+# Probes of services hosted on the server, used to measure the real outage during the conversion.
+# Targets are given as "http:<vhost>[:port]", "smtp[:port]" or "imap[:port]" and are always
+# checked on the local host.
+import socket
+import time
+import typing
+
+DEFAULT_PORTS = {
+    "http": 80,
+    "smtp": 25,
+    "imap": 143,
+}
+PROBE_HOST = "127.0.0.1"
+PROBE_TIMEOUT = 5
+
+
+class ProbeTarget(typing.NamedTuple):
+    protocol: str
+    port: int
+    vhost: typing.Optional[str] = None
+
+    def __str__(self) -> str:
+        if self.vhost:
+            return f"{self.protocol}:{self.vhost}:{self.port}"
+        return f"{self.protocol}:{self.port}"
+
+
+def parse_target(target: str) -> ProbeTarget:
+    parts = target.strip().split(":")
+    protocol = parts[0].lower()
+    if protocol not in DEFAULT_PORTS:
+        raise ValueError(f"unknown protocol {protocol!r} of the probe target {target!r}, expected one of {', '.join(DEFAULT_PORTS)}")
+
+    vhost = None
+    if protocol == "http":
+        if len(parts) < 2 or not parts[1]:
+            raise ValueError(f"the probe target {target!r} should specify a virtual host, like http:example.com")
+        vhost = parts[1]
+        parts = parts[1:]
+
+    if len(parts) > 2:
+        raise ValueError(f"unexpected format of the probe target {target!r}")
+    try:
+        port = int(parts[1]) if len(parts) == 2 else DEFAULT_PORTS[protocol]
+    except ValueError:
+        raise ValueError(f"invalid port in the probe target {target!r}")
+    return ProbeTarget(protocol, port, vhost)
+
+
+def parse_targets(targets: str) -> typing.List[ProbeTarget]:
+    return [parse_target(target) for target in targets.split(",") if target.strip()]
+
+
+def _probe_http(connection: socket.socket, target: ProbeTarget) -> bool:
+    connection.sendall(f"HEAD / HTTP/1.0\r\nHost: {target.vhost}\r\nConnection: close\r\n\r\n".encode("ascii"))
+    # Any response means the web server is serving requests, the status depends on the site
+    return connection.recv(16).startswith(b"HTTP/")
+
+
+def _probe_smtp(connection: socket.socket, target: ProbeTarget) -> bool:
+    return connection.recv(512).startswith(b"220")
+
+
+def _probe_imap(connection: socket.socket, target: ProbeTarget) -> bool:
+    return connection.recv(512).startswith(b"* OK")
+
+
+PROBES = {
+    "http": _probe_http,
+    "smtp": _probe_smtp,
+    "imap": _probe_imap,
+}
+
+
+def is_serving(target: ProbeTarget, timeout: float = PROBE_TIMEOUT) -> bool:
+    try:
+        with socket.create_connection((PROBE_HOST, target.port), timeout=timeout) as connection:
+            return PROBES[target.protocol](connection, target)
+    except OSError:
+        return False
+
+
+def wait_for_state(
+    targets: typing.Iterable[ProbeTarget],
+    serving: bool,
+    timeout: float,
+    interval: float = 1.0,
+) -> typing.Dict[str, typing.Optional[float]]:
+    # Returns the time each target reached the expected state, None if it didn't happen in time
+    pending = list(targets)
+    results: typing.Dict[str, typing.Optional[float]] = {str(target): None for target in pending}
+    deadline = time.monotonic() + timeout
+    while pending:
+        for target in list(pending):
+            if is_serving(target) == serving:
+                results[str(target)] = time.time()
+                pending.remove(target)
+        if not pending or time.monotonic() > deadline:
+            break
+        time.sleep(interval)
+    return results
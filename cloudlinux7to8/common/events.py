@@ -0,0 +1,431 @@
+# Copyright 1999 - 2026. WebPros International GmbH. All rights reserved.
+# Structured events about the conversion progress. Events are appended to a JSON lines file
+# and sent to clients connected to a local unix socket, so the progress could be followed
+# without parsing logs. Other parts of the tool could subscribe to events as well.
+import atexit
+import collections
+import json
+import os
+import re
+import socket
+import subprocess
+import threading
+import time
+import typing
+
+from pleskdistup.common import action, log
+
+EVENTS_FILE_PATH = "/var/log/plesk/cloudlinux7to8.events.jsonl"
+EVENTS_SOCKET_PATH = "/run/cloudlinux7to8/events.sock"
+# The previous part of the file is kept with ".1" suffix, so the disk usage is bounded by twice the size
+EVENTS_FILE_MAX_SIZE = 10 * 1024 * 1024
+
+REDACTED = "***"
+# Options which take a password as the next argument, e.g. "plesk bin customer -passwd secret"
+PASSWORD_OPTIONS = {"-passwd", "--passwd", "-password", "--password"}
+SECRET_ASSIGNMENT_RE = re.compile(r"^(-{0,2}[\w-]*(?:passw(?:or)?d|pwd|secret|token)[\w-]*=)(.+)$", re.IGNORECASE)
+
+Event = typing.Dict[str, typing.Any]
+Subscriber = typing.Callable[[Event], None]
+
+
+def _is_mysql_client(command: str) -> bool:
+    name = os.path.basename(command)
+    return name.startswith("mysql") or name.startswith("mariadb")
+
+
+def redact_args(args: typing.List[str]) -> typing.List[str]:
+    # Arguments are written to logs, events and subprocess traces, so credentials
+    # like "mysql -uadmin -p<password>" must not leak there
+    redacted = []
+    mysql_client = bool(args) and _is_mysql_client(args[0])
+    hide_next = False
+    for arg in args:
+        if hide_next:
+            redacted.append(REDACTED)
+            hide_next = False
+            continue
+        assignment = SECRET_ASSIGNMENT_RE.match(arg)
+        if assignment:
+            redacted.append(assignment.group(1) + REDACTED)
+        elif arg in PASSWORD_OPTIONS:
+            redacted.append(arg)
+            hide_next = True
+        elif mysql_client and arg.startswith("-p") and len(arg) > 2:
+            redacted.append("-p" + REDACTED)
+        else:
+            redacted.append(arg)
+    return redacted
+
+
+def _redact_command(args: typing.Any) -> typing.List[str]:
+    if isinstance(args, (list, tuple)):
+        return redact_args([str(arg) for arg in args])
+    # Shell command lines are split roughly, it's enough to find credentials in them
+    return [" ".join(redact_args(str(args).split(" ")))]
+
+
+class EventPublisher:
+    file_path: str
+    socket_path: str
+    max_file_size: int
+    _lock: threading.Lock
+    _file: typing.Optional[typing.TextIO]
+    _file_size: int
+    _server: typing.Optional[socket.socket]
+    _clients: typing.List[socket.socket]
+    _subscribers: typing.List[Subscriber]
+
+    def __init__(
+        self,
+        file_path: str = EVENTS_FILE_PATH,
+        socket_path: str = EVENTS_SOCKET_PATH,
+        max_file_size: int = EVENTS_FILE_MAX_SIZE,
+    ) -> None:
+        self.file_path = file_path
+        self.socket_path = socket_path
+        self.max_file_size = max_file_size
+        self._lock = threading.Lock()
+        self._file = None
+        self._file_size = 0
+        self._server = None
+        self._server_failed = False
+        self._clients = []
+        self._subscribers = []
+
+    def subscribe(self, subscriber: Subscriber) -> None:
+        if subscriber not in self._subscribers:
+            self._subscribers.append(subscriber)
+
+    def _open_file(self) -> typing.Optional[typing.TextIO]:
+        if self._file is None:
+            try:
+                os.makedirs(os.path.dirname(self.file_path), exist_ok=True)
+                fd = os.open(self.file_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+                # The file could be left by a previous version with more permissive mode
+                os.fchmod(fd, 0o600)
+                self._file_size = os.fstat(fd).st_size
+                self._file = os.fdopen(fd, "a", buffering=1)
+            except OSError as ex:
+                log.debug(f"Unable to open events file {self.file_path!r}: {ex}")
+        return self._file
+
+    def _write_to_file(self, line: str) -> None:
+        if self._file is not None and self._file_size >= self.max_file_size:
+            self._file.close()
+            self._file = None
+            os.replace(self.file_path, self.file_path + ".1")
+
+        events_file = self._open_file()
+        if events_file is not None:
+            events_file.write(line)
+            self._file_size += len(line.encode("utf-8"))
+
+    def _start_server(self) -> None:
+        if self._server is not None or self._server_failed:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.socket_path), exist_ok=True)
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+            server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            server.bind(self.socket_path)
+            os.chmod(self.socket_path, 0o600)
+            server.listen(16)
+        except OSError as ex:
+            log.debug(f"Unable to listen events socket {self.socket_path!r}: {ex}")
+            self._server_failed = True
+            return
+
+        self._server = server
+        threading.Thread(target=self._accept_clients, name="events-socket", daemon=True).start()
+        atexit.register(self.close)
+
+    def _accept_clients(self) -> None:
+        while self._server is not None:
+            try:
+                client, _ = self._server.accept()
+            except OSError:
+                return
+            # The conversion must never wait for a monitor, for example a stopped one
+            client.setblocking(False)
+            with self._lock:
+                self._clients.append(client)
+
+    def _send_to_clients(self, data: bytes) -> None:
+        for client in list(self._clients):
+            try:
+                sent = client.send(data)
+            except OSError:
+                # The client has gone or its buffer is full, it's not something to worry about
+                sent = 0
+            if sent < len(data):
+                # A slow client would get an incomplete event, so it's disconnected
+                self._clients.remove(client)
+                client.close()
+
+    def emit(self, event_type: str, **fields: typing.Any) -> None:
+        event: Event = {"time": time.time(), "pid": os.getpid(), "type": event_type}
+        event.update(fields)
+        try:
+            line = json.dumps(event, default=str) + "\n"
+            with self._lock:
+                self._start_server()
+                self._write_to_file(line)
+                self._send_to_clients(line.encode("utf-8"))
+        except Exception as ex:
+            # Events are informational, they should never break the conversion
+            log.debug(f"Unable to publish event {event_type!r}: {ex}")
+
+        for subscriber in self._subscribers:
+            try:
+                subscriber(event)
+            except Exception as ex:
+                log.debug(f"Events subscriber {subscriber!r} failed on {event_type!r}: {ex}")
+
+    def close(self) -> None:
+        with self._lock:
+            server, self._server = self._server, None
+            if server is not None:
+                server.close()
+                if os.path.exists(self.socket_path):
+                    os.unlink(self.socket_path)
+            for client in self._clients:
+                client.close()
+            self._clients = []
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+publisher = EventPublisher()
+
+
+def emit(event_type: str, **fields: typing.Any) -> None:
+    publisher.emit(event_type, **fields)
+
+
+class _Context:
+    # What the conversion is doing right now, subprocess events are attributed to it
+    phase: typing.Optional[str] = None
+    stage: typing.Optional[str] = None
+    action: typing.Optional[str] = None
+
+
+context = _Context()
+
+
+def _set_stage(stage: typing.Optional[str]) -> None:
+    if context.stage == stage:
+        return
+    if context.stage is not None:
+        emit("stage_end", phase=context.phase, stage=context.stage)
+    context.stage = stage
+    if stage is not None:
+        emit("stage_start", phase=context.phase, stage=stage)
+
+
+def _wrap_step(active_action: action.ActiveAction, stage: str, step: str, estimate: typing.Callable[[], int]) -> None:
+    method_name = f"_{step}_action"
+    original = getattr(active_action, method_name)
+
+    def wrapped() -> action.ActionResult:
+        _set_stage(stage)
+        context.action = active_action.name
+        try:
+            estimated = estimate()
+        except Exception:
+            estimated = None
+        emit("action_start", phase=context.phase, stage=stage, action=active_action.name, step=step, estimate=estimated)
+        started_at = time.monotonic()
+        success = False
+        try:
+            result = original()
+            success = True
+            return result
+        finally:
+            emit("action_end", phase=context.phase, stage=stage, action=active_action.name, step=step,
+                 success=success, duration=time.monotonic() - started_at)
+            context.action = None
+
+    setattr(active_action, method_name, wrapped)
+
+
+def instrument_actions(
+    actions_map: typing.Dict[str, typing.List[action.ActiveAction]],
+    phase: typing.Any,
+) -> typing.Dict[str, typing.List[action.ActiveAction]]:
+    context.phase = str(phase)
+    for stage, actions in actions_map.items():
+        for active_action in actions:
+            _wrap_step(active_action, stage, "prepare", active_action.estimate_prepare_time)
+            _wrap_step(active_action, stage, "post", active_action.estimate_post_time)
+            _wrap_step(active_action, stage, "revert", active_action.estimate_revert_time)
+    atexit.register(_set_stage, None)
+    return actions_map
+
+
+def instrument_checks(checks: typing.List[action.CheckAction]) -> typing.List[action.CheckAction]:
+    for check in checks:
+        original = check._do_check
+
+        def wrapped(check: action.CheckAction = check, original: typing.Callable[[], bool] = original) -> bool:
+            started_at = time.monotonic()
+            result = original()
+            emit("check", check=check.name, success=result, duration=time.monotonic() - started_at)
+            return result
+
+        check._do_check = wrapped
+    return checks
+
+
+class _CountingStream:
+    # Counts the output read from a pipe of a child process
+    def __init__(self, stream: typing.Any, process: "_TracedPopen") -> None:
+        self._stream = stream
+        self._process = process
+
+    def _count(self, data: typing.Any) -> typing.Any:
+        if not self._process._traced_communicating:
+            self._process._traced_output_size += len(data)
+        return data
+
+    def read(self, *args: typing.Any) -> typing.Any:
+        return self._count(self._stream.read(*args))
+
+    def readline(self, *args: typing.Any) -> typing.Any:
+        return self._count(self._stream.readline(*args))
+
+    def readlines(self, *args: typing.Any) -> typing.List[typing.Any]:
+        return [self._count(line) for line in self._stream.readlines(*args)]
+
+    def __iter__(self) -> "_CountingStream":
+        return self
+
+    def __next__(self) -> typing.Any:
+        return self._count(next(self._stream))
+
+    def __enter__(self) -> "_CountingStream":
+        return self
+
+    def __exit__(self, *args: typing.Any) -> None:
+        self._stream.close()
+
+    def __getattr__(self, name: str) -> typing.Any:
+        return getattr(self._stream, name)
+
+
+class _TracedPopen(subprocess.Popen):
+    # Every utility call is done with subprocess.Popen one way or another, so it's enough
+    # to trace only it to get events for all of them
+    def __init__(self, args: typing.Any, *other_args: typing.Any, **kwargs: typing.Any) -> None:
+        self._traced_args = _redact_command(args)
+        self._traced_phase = context.phase
+        self._traced_stage = context.stage
+        self._traced_action = context.action
+        self._traced_started = time.time()
+        self._traced_started_at = time.monotonic()
+        self._traced_finished = False
+        self._traced_communicating = False
+        self._traced_output_size = 0
+        super().__init__(args, *other_args, **kwargs)
+        if self.stdout is not None:
+            self.stdout = typing.cast(typing.IO[typing.Any], _CountingStream(self.stdout, self))
+        if self.stderr is not None:
+            self.stderr = typing.cast(typing.IO[typing.Any], _CountingStream(self.stderr, self))
+        emit("subprocess_start", phase=self._traced_phase, stage=self._traced_stage, action=self._traced_action,
+             args=self._traced_args, child_pid=self.pid)
+
+    def _emit_end(self) -> None:
+        if self.returncode is None or self._traced_finished or self._traced_communicating:
+            return
+        self._traced_finished = True
+        emit("subprocess_end", phase=self._traced_phase, stage=self._traced_stage, action=self._traced_action,
+             args=self._traced_args, child_pid=self.pid, returncode=self.returncode,
+             started=self._traced_started, duration=time.monotonic() - self._traced_started_at,
+             output_size=self._traced_output_size)
+
+    def communicate(self, *args: typing.Any, **kwargs: typing.Any) -> typing.Tuple[typing.Any, typing.Any]:
+        # communicate reads pipes directly by file descriptors, so the output is counted from the result
+        self._traced_communicating = True
+        try:
+            stdout, stderr = super().communicate(*args, **kwargs)
+        finally:
+            self._traced_communicating = False
+        self._traced_output_size += sum(len(output) for output in (stdout, stderr) if output)
+        self._emit_end()
+        return stdout, stderr
+
+    def wait(self, *args: typing.Any, **kwargs: typing.Any) -> int:
+        result = super().wait(*args, **kwargs)
+        self._emit_end()
+        return result
+
+    def poll(self) -> typing.Optional[int]:
+        result = super().poll()
+        self._emit_end()
+        return result
+
+
+def trace_subprocesses() -> None:
+    if subprocess.Popen is not _TracedPopen:
+        subprocess.Popen = _TracedPopen  # type: ignore
+
+
+def _format_event(event: Event) -> typing.Optional[str]:
+    timestamp = time.strftime("%H:%M:%S", time.localtime(event["time"]))
+    event_type = event["type"]
+    if event_type == "stage_start":
+        return f"{timestamp} [{event['phase']}] stage {event['stage']!r} started"
+    if event_type == "action_start":
+        estimate = f", estimated {event['estimate']} seconds" if event.get("estimate") else ""
+        return f"{timestamp} [{event['phase']}] {event['step']} {event['action']!r}{estimate}"
+    if event_type == "action_end":
+        status = "done" if event["success"] else "FAILED"
+        return f"{timestamp} [{event['phase']}] {event['step']} {event['action']!r} {status} in {event['duration']:.1f} seconds"
+    if event_type == "check":
+        status = "passed" if event["success"] else "FAILED"
+        return f"{timestamp} check {event['check']!r} {status}"
+    if event_type == "subprocess_start":
+        return f"{timestamp}     $ {' '.join(event['args'])}"
+    return None
+
+
+def _print_event(line: str) -> None:
+    try:
+        formatted = _format_event(json.loads(line))
+    except (ValueError, KeyError, TypeError):
+        # The line could be incomplete if the writer was interrupted
+        return
+    if formatted:
+        print(formatted, flush=True)
+
+
+def connect(socket_path: str = EVENTS_SOCKET_PATH) -> typing.Optional[socket.socket]:
+    # There is no conversion publishing events when the socket is absent or left by a crashed run
+    if not os.path.exists(socket_path):
+        return None
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        client.connect(socket_path)
+    except OSError:
+        client.close()
+        return None
+    return client
+
+
+def monitor(client: socket.socket, file_path: str = EVENTS_FILE_PATH, history: int = 10) -> int:
+    # Show what happened right before the connection to give some context
+    if os.path.exists(file_path):
+        with open(file_path) as f:
+            for line in collections.deque(f, maxlen=history):
+                _print_event(line)
+
+    stream = client.makefile("r", encoding="utf-8")
+    try:
+        for line in stream:
+            _print_event(line)
+    except KeyboardInterrupt:
+        pass
+    print("The conversion process has closed the events stream")
+    return 0
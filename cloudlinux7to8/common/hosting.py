@@ -0,0 +1,70 @@
+# Copyright 1999 - 2026. WebPros International GmbH. All rights reserved.
+# Data about domains hosted on the server
+import os
+import subprocess
+import typing
+
+from pleskdistup.common import log
+
+AWSTATS_DOMAINS_CONFIG_DIRECTORY = "/usr/local/psa/etc/awstats/"
+PSA_SHADOW_PATH = "/etc/psa/.psa.shadow"
+MYSQL_PATH = "/usr/bin/mysql"
+
+DOMAINS_ADDRESSES_QUERY = """
+SELECT d.name, ip.ip_address FROM domains d
+    JOIN DomainServices ds ON ds.dom_id = d.id AND ds.type = 'web'
+    JOIN IpAddressesCollections ic ON ic.ipCollectionId = ds.ipCollectionId
+    JOIN IP_Addresses ip ON ip.id = ic.ipAddressId
+"""
+
+
+def get_awstats_domains() -> typing.Set[str]:
+    # Every domain with web hosting has AWStats configuration, even if another statistics program is used
+    domains: typing.Set[str] = set()
+    if not os.path.isdir(AWSTATS_DOMAINS_CONFIG_DIRECTORY):
+        return domains
+    for awstats_config_file in os.listdir(AWSTATS_DOMAINS_CONFIG_DIRECTORY):
+        if awstats_config_file.startswith("awstats.") and awstats_config_file.endswith("-http.conf"):
+            domains.add(awstats_config_file.split("awstats.")[-1].rsplit("-http.conf")[0])
+    return domains
+
+
+def get_domains_sample(domains: typing.Iterable[str], size: int) -> typing.List[str]:
+    # Evenly spaced in the sorted list, so the same domains are taken while the list is the same
+    ordered = sorted(domains)
+    if len(ordered) <= size:
+        return ordered
+    step = len(ordered) / size
+    return [ordered[int(index * step)] for index in range(size)]
+
+
+def is_psa_database_available() -> bool:
+    return os.path.exists(PSA_SHADOW_PATH) and os.path.exists(MYSQL_PATH)
+
+
+def get_psa_password() -> str:
+    with open(PSA_SHADOW_PATH) as shadowfile:
+        return shadowfile.readline().rstrip()
+
+
+def get_domains_addresses() -> typing.Dict[str, str]:
+    # Web hosting addresses of domains, an IPv4 one is preferred when a domain has both
+    if not is_psa_database_available():
+        return {}
+    try:
+        output = subprocess.check_output(
+            [MYSQL_PATH, "-uadmin", "psa", "-Ne", DOMAINS_ADDRESSES_QUERY],
+            env=dict(os.environ, MYSQL_PWD=get_psa_password()), stderr=subprocess.PIPE, universal_newlines=True,
+        )
+    except (OSError, subprocess.CalledProcessError) as ex:
+        log.debug(f"Unable to get addresses of domains from Plesk database: {ex}")
+        return {}
+
+    addresses: typing.Dict[str, str] = {}
+    for line in output.splitlines():
+        if "\t" not in line:
+            continue
+        domain, address = line.split("\t", 1)
+        if domain not in addresses or ":" in addresses[domain]:
+            addresses[domain] = address
+    return addresses
@@ -0,0 +1,84 @@
+# Copyright 1999 - 2026. WebPros International GmbH. All rights reserved.
+import concurrent.futures
+import grp
+import os
+import pwd
+import time
+import typing
+
+from pleskdistup.common import log
+
+DEFAULT_WORKERS = 8
+
+
+class OwnershipChangeResult(typing.NamedTuple):
+    checked: int
+    changed: int
+    elapsed: float
+
+
+def _fix_entry(path: str, stat: os.stat_result, uid: int, gid: int) -> bool:
+    if stat.st_uid == uid and stat.st_gid == gid:
+        return False
+    os.lchown(path, uid, gid)
+    return True
+
+
+def _fix_directory(directory: str, uid: int, gid: int) -> typing.Tuple[int, int, typing.List[str]]:
+    checked = changed = 0
+    subdirectories = []
+    try:
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                try:
+                    stat = entry.stat(follow_symlinks=False)
+                except FileNotFoundError:
+                    continue
+                checked += 1
+                if _fix_entry(entry.path, stat, uid, gid):
+                    changed += 1
+                if entry.is_dir(follow_symlinks=False):
+                    subdirectories.append(entry.path)
+    except FileNotFoundError:
+        pass
+    return checked, changed, subdirectories
+
+
+def change_tree_ownership(
+    paths: typing.Iterable[str],
+    user: str,
+    group: str,
+    workers: int = DEFAULT_WORKERS,
+) -> OwnershipChangeResult:
+    # Every directory is a separate task, so large subtrees are spread between workers.
+    # Symlinks are never followed, and entries with the right owner are not touched.
+    uid = pwd.getpwnam(user).pw_uid
+    gid = grp.getgrnam(group).gr_gid
+
+    started_at = time.monotonic()
+    checked = changed = 0
+    roots = []
+    for path in paths:
+        try:
+            stat = os.lstat(path)
+        except FileNotFoundError:
+            continue
+        checked += 1
+        if _fix_entry(path, stat, uid, gid):
+            changed += 1
+        if os.path.isdir(path) and not os.path.islink(path):
+            roots.append(path)
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = {executor.submit(_fix_directory, root, uid, gid) for root in roots}
+        while pending:
+            done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                directory_checked, directory_changed, subdirectories = future.result()
+                checked += directory_checked
+                changed += directory_changed
+                pending.update(executor.submit(_fix_directory, subdirectory, uid, gid) for subdirectory in subdirectories)
+
+    result = OwnershipChangeResult(checked=checked, changed=changed, elapsed=time.monotonic() - started_at)
+    log.info(f"Ownership {user}:{group} is set for {result.changed} of {result.checked} files in {result.elapsed:.1f} seconds")
+    return result
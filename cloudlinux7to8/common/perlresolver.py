@@ -0,0 +1,189 @@
+# Copyright 1999 - 2026. WebPros International GmbH. All rights reserved.
+# Resolves Perl modules to CloudLinux 8 packages providing them using file lists from
+# the repository metadata. The index is kept on disk and rebuilt only when the
+# metadata changes.
+import glob
+import gzip
+import json
+import os
+import re
+import shutil
+import time
+import typing
+import urllib.request
+import xml.etree.ElementTree as ElementTree
+
+from pleskdistup.common import dist, log
+
+LEAPP_USERSPACE_DNF_CACHE = "/var/lib/leapp/el8userspace/var/cache/dnf"
+DNF_CACHE = "/var/cache/dnf"
+
+# Before the conversion there is no metadata of CloudLinux 8 repositories on the server,
+# so file lists are downloaded from them directly
+TARGET_REPOSITORIES = {
+    "cl8-baseos": "https://repo.cloudlinux.com/cloudlinux/8/BaseOS/x86_64/os/",
+    "cl8-appstream": "https://repo.cloudlinux.com/cloudlinux/8/AppStream/x86_64/os/",
+    "cl8-powertools": "https://repo.cloudlinux.com/cloudlinux/8/PowerTools/x86_64/os/",
+}
+DOWNLOAD_TIMEOUT = 60
+# File lists of the target repositories are large, so the downloaded ones are reused by
+# following check runs for a while without even looking at the repository metadata
+DOWNLOADED_METADATA_MAX_AGE = 24 * 60 * 60
+
+REPOMD_NAMESPACE = "{http://linux.duke.edu/metadata/repo}"
+FILELISTS_NAMESPACE = "{http://linux.duke.edu/metadata/filelists}"
+PERL_MODULE_PATH_RE = re.compile(r"^/usr/(?:share|lib64|lib)/perl5/(?:vendor_perl/|site_perl/)?(?P<module>.+\.pm)$")
+# Packages of the interpreter itself provide almost every core module. A core module installed
+# by CPAN is a newer version of it, and the interpreter package can't replace it, so such
+# modules are left unresolved.
+INTERPRETER_PACKAGES = {"perl", "perl-interpreter", "perl-libs"}
+
+
+def get_metadata_directories(downloaded_metadata_directory: str) -> typing.List[str]:
+    # Metadata in the system cache belongs to the target repositories only after the conversion
+    if dist.get_distro() == dist.CloudLinux("8"):
+        return [LEAPP_USERSPACE_DNF_CACHE, DNF_CACHE]
+    return [LEAPP_USERSPACE_DNF_CACHE, downloaded_metadata_directory]
+
+
+def _get_filelists_location(repomd: bytes) -> typing.Optional[str]:
+    for data in ElementTree.fromstring(repomd).iter(REPOMD_NAMESPACE + "data"):
+        if data.get("type") == "filelists":
+            location = data.find(REPOMD_NAMESPACE + "location")
+            if location is not None:
+                return location.get("href")
+    return None
+
+
+def download_filelists(repositories: typing.Dict[str, str], directory: str) -> None:
+    # The layout is the same as in the dnf cache: <repository>/repodata/<checksum>-filelists.xml.gz.
+    # The file name contains the checksum, so the file is downloaded again only when it changes.
+    for repository, url in repositories.items():
+        repodata_directory = os.path.join(directory, repository, "repodata")
+        # Modification time of file lists is a part of the index sources, so it's not touched
+        checked_stamp_path = os.path.join(directory, repository, ".checked")
+        if os.path.exists(checked_stamp_path) and time.time() - os.path.getmtime(checked_stamp_path) < DOWNLOADED_METADATA_MAX_AGE:
+            continue
+        try:
+            with urllib.request.urlopen(url + "repodata/repomd.xml", timeout=DOWNLOAD_TIMEOUT) as response:
+                location = _get_filelists_location(response.read())
+            if location is None:
+                log.warn(f"There are no file lists in the metadata of repository {url!r}")
+                continue
+
+            path = os.path.join(repodata_directory, os.path.basename(location))
+            if not os.path.exists(path):
+                if os.path.exists(repodata_directory):
+                    shutil.rmtree(repodata_directory)
+                os.makedirs(repodata_directory)
+                log.debug(f"Downloading file lists of repository {url!r}")
+                with urllib.request.urlopen(url + location, timeout=DOWNLOAD_TIMEOUT) as response, open(path + ".part", "wb") as f:
+                    shutil.copyfileobj(response, f)
+                os.replace(path + ".part", path)
+
+            with open(checked_stamp_path, "w"):
+                pass
+        except (OSError, ValueError, ElementTree.ParseError) as ex:
+            log.warn(f"Unable to download file lists of repository {url!r}: {ex}")
+
+
+def find_filelists(directories: typing.Iterable[str]) -> typing.List[str]:
+    filelists = []
+    for directory in directories:
+        filelists += glob.glob(os.path.join(directory, "*", "repodata", "*filelists.xml.gz"))
+    return sorted(filelists)
+
+
+def _describe_sources(filelists: typing.List[str]) -> typing.Dict[str, typing.List[int]]:
+    sources = {}
+    for path in filelists:
+        stat = os.stat(path)
+        sources[path] = [stat.st_size, stat.st_mtime_ns]
+    return sources
+
+
+def parse_filelists(path: str, modules: typing.Dict[str, str]) -> None:
+    with gzip.open(path) as f:
+        for _, element in ElementTree.iterparse(f):
+            if element.tag != FILELISTS_NAMESPACE + "package":
+                continue
+
+            package = element.get("name")
+            if package is not None:
+                for file_element in element.iter(FILELISTS_NAMESPACE + "file"):
+                    match = PERL_MODULE_PATH_RE.match(file_element.text or "")
+                    if not match:
+                        continue
+                    module = match.group("module")
+                    if module not in modules or modules[module] in INTERPRETER_PACKAGES:
+                        modules[module] = package
+            # Filelists of the base repositories are hundreds of megabytes, so keep memory usage low
+            element.clear()
+
+
+class PerlModulesResolver:
+    index_path: str
+    metadata_directory: str
+    directories: typing.Optional[typing.List[str]]
+    _modules: typing.Optional[typing.Dict[str, str]]
+
+    def __init__(self, state_dir: str, directories: typing.Optional[typing.List[str]] = None) -> None:
+        self.index_path = os.path.join(state_dir, "cloudlinux7to8_perl_modules_index.json")
+        self.metadata_directory = os.path.join(state_dir, "cloudlinux7to8_perl_modules_metadata")
+        self.directories = directories
+        self._modules = None
+
+    def _load_index(self, sources: typing.Dict[str, typing.List[int]]) -> typing.Optional[typing.Dict[str, str]]:
+        if not os.path.exists(self.index_path):
+            return None
+        try:
+            with open(self.index_path) as f:
+                index = json.load(f)
+        except (OSError, ValueError) as ex:
+            log.warn(f"Unable to read perl modules index {self.index_path!r}: {ex}. The index will be rebuilt.")
+            return None
+        if index.get("sources") != sources:
+            return None
+        return index["modules"]
+
+    def _build_index(self, filelists: typing.List[str], sources: typing.Dict[str, typing.List[int]]) -> typing.Dict[str, str]:
+        modules: typing.Dict[str, str] = {}
+        for path in filelists:
+            try:
+                parse_filelists(path, modules)
+            except (OSError, EOFError, ElementTree.ParseError) as ex:
+                log.warn(f"Unable to read repository file lists {path!r}: {ex}")
+                sources.pop(path, None)
+
+        os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
+        tmp_path = self.index_path + ".next"
+        with open(tmp_path, "w") as f:
+            json.dump({"sources": sources, "modules": modules}, f)
+        os.replace(tmp_path, self.index_path)
+        log.debug(f"Perl modules index is built from {len(sources)} file lists, {len(modules)} modules are known")
+        return modules
+
+    @property
+    def modules(self) -> typing.Dict[str, str]:
+        if self._modules is None:
+            directories = self.directories
+            if directories is None:
+                directories = get_metadata_directories(self.metadata_directory)
+                if self.metadata_directory in directories:
+                    download_filelists(TARGET_REPOSITORIES, self.metadata_directory)
+            filelists = find_filelists(directories)
+            sources = _describe_sources(filelists)
+            modules = self._load_index(sources)
+            if modules is None:
+                modules = self._build_index(filelists, sources)
+            self._modules = modules
+        return self._modules
+
+    def resolve(self, module: str) -> typing.Optional[str]:
+        package = self.modules.get(module)
+        if package in INTERPRETER_PACKAGES:
+            return None
+        return package
+
+    def reset(self) -> None:
+        self._modules = None
@@ -0,0 +1,98 @@
+# Copyright 1999 - 2026. WebPros International GmbH. All rights reserved.
+# Read-only access to the pg_database catalog of a PostgreSQL data directory. Used to get
+# database locales when the server can't be queried without changing its configuration.
+import os
+import struct
+import typing
+
+PG_DATABASE_RELATION_OID = 1262
+PG_FILENODE_MAP_MAGIC = 0x592717
+PG_PAGE_HEADER_SIZE = 24
+PG_ITEM_ID_SIZE = 4
+PG_TUPLE_HEADER_SIZE = 23
+PG_NAMEDATALEN = 64
+PG_LP_NORMAL = 1
+PG_HEAP_XMIN_INVALID = 0x0200
+PG_HEAP_XMAX_COMMITTED = 0x0400
+
+
+def get_pg_database_filenode(data_path: str) -> int:
+    # pg_database is a mapped catalog, so its file could be changed by VACUUM FULL.
+    # The actual file node is stored in global/pg_filenode.map
+    map_path = os.path.join(data_path, "global", "pg_filenode.map")
+    if not os.path.exists(map_path):
+        return PG_DATABASE_RELATION_OID
+
+    with open(map_path, "rb") as f:
+        data = f.read()
+    try:
+        magic, num_mappings = struct.unpack_from("<ii", data, 0)
+        if magic != PG_FILENODE_MAP_MAGIC:
+            return PG_DATABASE_RELATION_OID
+
+        for index in range(num_mappings):
+            relation_oid, filenode = struct.unpack_from("<II", data, 8 + index * 8)
+            if relation_oid == PG_DATABASE_RELATION_OID:
+                return filenode
+    except struct.error:
+        pass
+    return PG_DATABASE_RELATION_OID
+
+
+def get_data_major_version(data_path: str) -> int:
+    with open(os.path.join(data_path, "PG_VERSION")) as version_file:
+        return int(version_file.read().strip().split(".")[0])
+
+
+def _read_name(tuple_data: bytes, offset: int) -> str:
+    return tuple_data[offset:offset + PG_NAMEDATALEN].split(b"\0", 1)[0].decode("ascii", errors="replace")
+
+
+def parse_database_locales(catalog: bytes, major_version: int, database: str) -> typing.Set[str]:
+    # Raises ValueError if the catalog layout is not supported or the data is damaged
+    if major_version >= 15:
+        raise ValueError(f"datcollate and datctype are variable length fields since PostgreSQL 15, the version is {major_version}")
+    # Since PostgreSQL 12 oid is a regular column placed before datname
+    name_offset = 4 if major_version >= 12 else 0
+    collate_offset = name_offset + PG_NAMEDATALEN + 8
+    ctype_offset = collate_offset + PG_NAMEDATALEN
+
+    locales = set()
+    page_offset = 0
+    try:
+        while page_offset + PG_PAGE_HEADER_SIZE <= len(catalog):
+            pd_lower, _, _, pagesize_version = struct.unpack_from("<HHHH", catalog, page_offset + 12)
+            page_size = pagesize_version & 0xFF00
+            if page_size == 0:
+                break
+
+            for item_offset in range(page_offset + PG_PAGE_HEADER_SIZE, page_offset + pd_lower, PG_ITEM_ID_SIZE):
+                item, = struct.unpack_from("<I", catalog, item_offset)
+                lp_off, lp_flags, lp_len = item & 0x7FFF, (item >> 15) & 0x3, item >> 17
+                if lp_flags != PG_LP_NORMAL or lp_len < PG_TUPLE_HEADER_SIZE:
+                    continue
+
+                tuple_start = page_offset + lp_off
+                if tuple_start + lp_len > len(catalog):
+                    raise ValueError(f"tuple at offset {tuple_start} is out of the catalog of {len(catalog)} bytes")
+                infomask, hoff = struct.unpack_from("<HB", catalog, tuple_start + 20)
+                if infomask & (PG_HEAP_XMIN_INVALID | PG_HEAP_XMAX_COMMITTED):
+                    continue
+
+                tuple_data = catalog[tuple_start + hoff:tuple_start + lp_len]
+                if _read_name(tuple_data, name_offset) == database:
+                    locales.add(_read_name(tuple_data, collate_offset))
+                    locales.add(_read_name(tuple_data, ctype_offset))
+
+            page_offset += page_size
+    except struct.error as ex:
+        raise ValueError(f"the catalog is truncated: {ex}")
+    return locales
+
+
+def read_database_locales(data_path: str, database: str) -> typing.Set[str]:
+    # Raises OSError if the catalog can't be read and ValueError if it can't be parsed
+    major_version = get_data_major_version(data_path)
+    catalog_path = os.path.join(data_path, "global", str(get_pg_database_filenode(data_path)))
+    with open(catalog_path, "rb") as catalog_file:
+        return parse_database_locales(catalog_file.read(), major_version, database)
@@ -0,0 +1,109 @@
+# Copyright 1999 - 2026. WebPros International GmbH. All rights reserved.
+# Helpers to get system state from procfs, sysfs and systemd without forking a
+# helper utility for every single value.
+import os
+import subprocess
+import typing
+
+PROC_MODULES_PATH = "/proc/modules"
+SYS_NET_PATH = "/sys/class/net"
+
+
+def get_loaded_kernel_modules() -> typing.Set[str]:
+    with open(PROC_MODULES_PATH) as f:
+        return {line.split(" ", 1)[0] for line in f if line.strip()}
+
+
+def get_running_kernel_release() -> str:
+    return os.uname().release
+
+
+def get_network_interfaces() -> typing.Optional[typing.List[str]]:
+    if not os.path.exists(SYS_NET_PATH):
+        return None
+    return os.listdir(SYS_NET_PATH)
+
+
+def parse_systemctl_show(output: str, services: typing.List[str]) -> typing.Dict[str, typing.Dict[str, str]]:
+    # systemctl show prints properties of each unit as a separate block, in the order units were given
+    blocks = output.strip("\n").split("\n\n")
+    result = {}
+    for service, block in zip(services, blocks):
+        result[service] = dict(line.split("=", 1) for line in block.splitlines() if "=" in line)
+    return result
+
+
+def get_services_properties(services: typing.Iterable[str], properties: typing.List[str]) -> typing.Dict[str, typing.Dict[str, str]]:
+    services = list(services)
+    if not services:
+        return {}
+
+    output = subprocess.check_output(
+        ["/usr/bin/systemctl", "show", "--property=" + ",".join(properties), "--"] + services,
+        universal_newlines=True,
+    )
+    return parse_systemctl_show(output, services)
+
+
+def get_services_states(services: typing.Iterable[str]) -> typing.Dict[str, str]:
+    return {
+        service: properties.get("ActiveState", "unknown")
+        for service, properties in get_services_properties(services, ["ActiveState"]).items()
+    }
+
+
+def is_service_active(service: str) -> bool:
+    return get_services_states([service])[service] == "active"
+
+
+def get_active_services() -> typing.Set[str]:
+    output = subprocess.check_output(
+        ["/usr/bin/systemctl", "list-units", "--type=service", "--state=active", "--no-legend", "--no-pager", "--plain"],
+        universal_newlines=True,
+    )
+    return {line.split()[0] for line in output.splitlines() if line.strip()}
+
+
+# Deleted mappings that are not libraries replaced by package updates
+IGNORED_DELETED_MAPPING_PREFIXES = ("/memfd:", "/dev/shm/", "/SYSV", "/tmp/", "/var/tmp/", "/run/")
+
+
+def get_processes_with_deleted_libraries() -> typing.Dict[int, typing.Set[str]]:
+    processes: typing.Dict[int, typing.Set[str]] = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        pid = int(entry)
+        try:
+            with open(f"/proc/{pid}/maps", errors="replace") as f:
+                for line in f:
+                    if not line.endswith(" (deleted)\n"):
+                        continue
+                    # Format: address perms offset dev inode pathname
+                    fields = line.split(None, 5)
+                    if len(fields) < 6:
+                        continue
+                    path = fields[5][:-len(" (deleted)\n")]
+                    if path.startswith(IGNORED_DELETED_MAPPING_PREFIXES) or ".so" not in os.path.basename(path):
+                        continue
+                    processes.setdefault(pid, set()).add(path)
+        except (FileNotFoundError, ProcessLookupError, PermissionError):
+            # The process has finished while we were looking into it
+            continue
+    return processes
+
+
+def get_process_unit(pid: typing.Union[int, str]) -> typing.Optional[str]:
+    try:
+        with open(f"/proc/{pid}/cgroup") as f:
+            lines = f.read().splitlines()
+    except (FileNotFoundError, ProcessLookupError):
+        return None
+
+    for line in lines:
+        # cgroup v1 has a named systemd hierarchy, cgroup v2 has only the unified one with id 0
+        hierarchy_id, controllers, path = line.split(":", 2)
+        if controllers == "name=systemd" or (hierarchy_id == "0" and controllers == ""):
+            unit = path.rstrip("/").rsplit("/", 1)[-1]
+            return unit or None
+    return None
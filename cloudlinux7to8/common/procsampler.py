@@ -0,0 +1,148 @@
+# Copyright 1999 - 2026. WebPros International GmbH. All rights reserved.
+# Resources used by each action: CPU time, disk read/write bytes and peak RSS of the process tree.
+# CPU time and IO counters of reaped children are accumulated by the kernel in the counters
+# of the parent, so they are taken as the difference of our own counters. Peak RSS is sampled
+# from the tree of running children. Results are kept in the state store, so the data of the
+# preparation survives the leapp reboot and is completed by the finish phase.
+import os
+import threading
+import time
+import typing
+
+from pleskdistup.common import log
+
+from cloudlinux7to8.common import events, statestore
+
+SAMPLE_INTERVAL = 1.0
+
+
+def _read_cpu_time(pid: typing.Union[int, str] = "self") -> float:
+    with open(f"/proc/{pid}/stat") as f:
+        # The command name could contain spaces, so fields are counted from its end
+        fields = f.read().rsplit(")", 1)[1].split()
+    # utime, stime, cutime, cstime
+    return sum(int(value) for value in fields[11:15]) / os.sysconf("SC_CLK_TCK")
+
+
+def _read_io(pid: typing.Union[int, str] = "self") -> typing.Dict[str, int]:
+    counters = {}
+    try:
+        with open(f"/proc/{pid}/io") as f:
+            for line in f:
+                name, value = line.split(":", 1)
+                counters[name] = int(value)
+    except OSError:
+        # There is no IO accounting in the kernel
+        pass
+    return counters
+
+
+def _read_rss(pid: typing.Union[int, str]) -> int:
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return 0
+
+
+def _get_descendants(pid: int) -> typing.List[int]:
+    children: typing.Dict[int, typing.List[int]] = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, ValueError, IndexError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+
+    descendants = []
+    queue = [pid]
+    while queue:
+        current = queue.pop()
+        for child in children.get(current, []):
+            descendants.append(child)
+            queue.append(child)
+    return descendants
+
+
+def get_tree_rss(pid: int) -> int:
+    return sum(_read_rss(process) for process in [pid] + _get_descendants(pid))
+
+
+class ResourceSampler:
+    state: statestore.ActionState
+    interval: float
+
+    def __init__(self, state_dir: str, interval: float = SAMPLE_INTERVAL) -> None:
+        self.state = statestore.ActionState(state_dir, "resource_usage")
+        self.interval = interval
+        self._pid = os.getpid()
+        self._started: typing.Optional[typing.Dict[str, typing.Any]] = None
+        self._peak_rss = 0
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread: typing.Optional[threading.Thread] = None
+
+    def _sample(self) -> None:
+        while True:
+            self._wakeup.wait()
+            with self._lock:
+                if self._started is None:
+                    self._wakeup.clear()
+                    continue
+                try:
+                    self._peak_rss = max(self._peak_rss, get_tree_rss(self._pid))
+                except OSError as ex:
+                    log.debug(f"Unable to sample memory usage: {ex}")
+            time.sleep(self.interval)
+
+    def handle_event(self, event: events.Event) -> None:
+        if event["type"] == "action_start":
+            self.start()
+        elif event["type"] == "action_end":
+            self.stop(f"{event['phase']}/{event['stage']}/{event['action']}/{event['step']}")
+
+    def start(self) -> None:
+        with self._lock:
+            self._started = {
+                "time": time.monotonic(),
+                "cpu": _read_cpu_time(),
+                "io": _read_io(),
+            }
+            self._peak_rss = _read_rss(self._pid)
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._sample, name="resource-sampler", daemon=True)
+            self._thread.start()
+        self._wakeup.set()
+
+    def stop(self, key: str) -> None:
+        with self._lock:
+            started, self._started = self._started, None
+            if started is None:
+                return
+            io = _read_io()
+            usage = {
+                "wall_time": round(time.monotonic() - started["time"], 3),
+                "cpu_time": round(_read_cpu_time() - started["cpu"], 3),
+                "read_bytes": io.get("read_bytes", 0) - started["io"].get("read_bytes", 0),
+                "write_bytes": io.get("write_bytes", 0) - started["io"].get("write_bytes", 0),
+                "peak_rss": max(self._peak_rss, _read_rss(self._pid)),
+            }
+        self.state.set(key, usage)
+        log.debug(f"Resources used by {key}: {usage}")
+
+
+_samplers: typing.Dict[str, ResourceSampler] = {}
+
+
+def install(state_dir: str) -> ResourceSampler:
+    if state_dir not in _samplers:
+        sampler = ResourceSampler(state_dir)
+        events.publisher.subscribe(sampler.handle_event)
+        _samplers[state_dir] = sampler
+    return _samplers[state_dir]
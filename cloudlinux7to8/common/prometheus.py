@@ -0,0 +1,162 @@
+# Copyright 1999 - 2026. WebPros International GmbH. All rights reserved.
+# Conversion metrics in the format of node_exporter textfile collector. The file is built
+# from conversion events, replaced atomically and rewritten not more often than once
+# in the given interval.
+import atexit
+import collections
+import os
+import threading
+import time
+import typing
+
+from pleskdistup.common import log
+
+from cloudlinux7to8.common import events, subprocesstrace
+
+TEXTFILE_NAME = "cloudlinux7to8.prom"
+WRITE_INTERVAL = 10.0
+
+Labels = typing.Tuple[typing.Tuple[str, str], ...]
+
+
+def _escape(value: typing.Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels) + "}"
+
+
+class TextfileWriter:
+    path: str
+    interval: float
+
+    METRICS_HELP = {
+        "cloudlinux7to8_started_timestamp_seconds": ("gauge", "Time the current conversion phase was started"),
+        "cloudlinux7to8_current_action": ("gauge", "The action being executed at the moment"),
+        "cloudlinux7to8_action_elapsed_seconds": ("gauge", "Time spent by the action"),
+        "cloudlinux7to8_action_estimated_seconds": ("gauge", "Time the action was estimated to take"),
+        "cloudlinux7to8_action_failures_total": ("counter", "Number of failed actions"),
+        "cloudlinux7to8_checks_total": ("counter", "Number of evaluated checks by the result"),
+        "cloudlinux7to8_subprocess_seconds_total": ("counter", "Time spent by child processes by the command"),
+        "cloudlinux7to8_subprocesses_total": ("counter", "Number of child processes by the command"),
+        "cloudlinux7to8_last_success_timestamp_seconds": ("gauge", "Time the last action was finished successfully"),
+    }
+
+    def __init__(self, directory: str, interval: float = WRITE_INTERVAL) -> None:
+        self.path = os.path.join(directory, TEXTFILE_NAME)
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._started = time.time()
+        self._current: typing.Optional[typing.Dict[str, typing.Any]] = None
+        self._elapsed: typing.Dict[Labels, float] = {}
+        self._estimated: typing.Dict[Labels, float] = {}
+        self._counters: typing.Dict[str, typing.Dict[Labels, float]] = collections.defaultdict(lambda: collections.defaultdict(float))
+        self._last_success: typing.Optional[float] = None
+        self._dirty = False
+        self._last_write = 0.0
+        self._timer: typing.Optional[threading.Timer] = None
+
+    def handle_event(self, event: events.Event) -> None:
+        with self._lock:
+            self._update(event)
+            self._dirty = True
+            self._schedule_write()
+
+    def _update(self, event: events.Event) -> None:
+        event_type = event["type"]
+        labels: Labels
+        if event_type == "action_start":
+            labels = (("phase", event["phase"]), ("stage", event["stage"]), ("action", event["action"]), ("step", event["step"]))
+            self._current = {"labels": labels, "started": event["time"]}
+            if event.get("estimate") is not None:
+                self._estimated[labels] = event["estimate"]
+        elif event_type == "action_end":
+            labels = (("phase", event["phase"]), ("stage", event["stage"]), ("action", event["action"]), ("step", event["step"]))
+            self._current = None
+            self._elapsed[labels] = event["duration"]
+            if event["success"]:
+                self._last_success = event["time"]
+            else:
+                self._counters["cloudlinux7to8_action_failures_total"][()] += 1
+        elif event_type == "check":
+            result = "passed" if event["success"] else "failed"
+            self._counters["cloudlinux7to8_checks_total"][(("result", result),)] += 1
+        elif event_type == "subprocess_end":
+            labels = (("command", subprocesstrace.get_command_name(event["args"])),)
+            self._counters["cloudlinux7to8_subprocess_seconds_total"][labels] += event["duration"]
+            self._counters["cloudlinux7to8_subprocesses_total"][labels] += 1
+
+    def _schedule_write(self) -> None:
+        if self._timer is not None:
+            return
+        delay = self._last_write + self.interval - time.monotonic()
+        if delay <= 0:
+            self._write()
+            return
+        self._timer = threading.Timer(delay, self._write_scheduled)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _write_scheduled(self) -> None:
+        with self._lock:
+            self._timer = None
+            self._write()
+
+    def _collect(self) -> typing.Dict[str, typing.Dict[Labels, float]]:
+        metrics: typing.Dict[str, typing.Dict[Labels, float]] = {
+            "cloudlinux7to8_started_timestamp_seconds": {(): self._started},
+            "cloudlinux7to8_action_elapsed_seconds": dict(self._elapsed),
+            "cloudlinux7to8_action_estimated_seconds": dict(self._estimated),
+        }
+        if self._current is not None:
+            metrics["cloudlinux7to8_current_action"] = {self._current["labels"]: 1}
+            metrics["cloudlinux7to8_action_elapsed_seconds"][self._current["labels"]] = time.time() - self._current["started"]
+        if self._last_success is not None:
+            metrics["cloudlinux7to8_last_success_timestamp_seconds"] = {(): self._last_success}
+        metrics.update(self._counters)
+        return metrics
+
+    def _write(self) -> None:
+        if not self._dirty:
+            return
+        lines = []
+        for name, samples in self._collect().items():
+            if not samples:
+                continue
+            metric_type, description = self.METRICS_HELP[name]
+            lines.append(f"# HELP {name} {description}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            for labels, value in samples.items():
+                lines.append(f"{name}{_format_labels(labels)} {value}")
+
+        tmp_path = self.path + ".next"
+        try:
+            with open(tmp_path, "w") as f:
+                f.write("\n".join(lines) + "\n")
+            os.replace(tmp_path, self.path)
+        except OSError as ex:
+            log.debug(f"Unable to write prometheus metrics into {self.path!r}: {ex}")
+        self._dirty = False
+        self._last_write = time.monotonic()
+
+    def flush(self) -> None:
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            self._write()
+
+
+_writers: typing.Dict[str, TextfileWriter] = {}
+
+
+def install(directory: str) -> TextfileWriter:
+    if directory not in _writers:
+        writer = TextfileWriter(directory)
+        events.publisher.subscribe(writer.handle_event)
+        atexit.register(writer.flush)
+        _writers[directory] = writer
+    return _writers[directory]
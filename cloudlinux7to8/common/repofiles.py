@@ -0,0 +1,152 @@
+# Copyright 1999 - 2026. WebPros International GmbH. All rights reserved.
+# Actions register changes of repository files, and then every file is parsed, changed
+# and written back only once. So actions could not overwrite each other's changes.
+import os
+import shutil
+import typing
+
+from pleskdistup.common import leapp_configs, log
+
+STAGED_SUFFIX = ".cloudlinux7to8-staged"
+# Not the common backup suffix, so backups made by other actions for their revert are never overwritten
+BACKUP_SUFFIX = ".cloudlinux7to8-backup"
+URL_KEYS = ("baseurl", "mirrorlist", "metalink")
+
+
+class Repository(typing.NamedTuple):
+    id: str
+    name: typing.Optional[str]
+    url: typing.Optional[str]
+
+
+RepositoryPredicate = typing.Callable[[Repository], bool]
+RepositoryFilePredicate = typing.Callable[[typing.List[Repository]], bool]
+
+
+class _RepositorySection:
+    # Raw lines are kept, so comments and formatting of untouched repositories are preserved
+    repository: Repository
+    lines: typing.List[str]
+
+    def __init__(self, repo_id: str, lines: typing.List[str]) -> None:
+        self.lines = lines
+        values: typing.Dict[str, str] = {}
+        for line in lines[1:]:
+            if "=" in line and not line.lstrip().startswith(("#", ";")):
+                key, value = line.split("=", 1)
+                values.setdefault(key.strip().lower(), value.strip())
+
+        url = next((values[key] for key in URL_KEYS if values.get(key)), None)
+        if url is not None:
+            # baseurl could contain several urls, but the first one is enough for matching
+            url = url.split()[0]
+        self.repository = Repository(id=repo_id, name=values.get("name"), url=url)
+
+
+def _parse(content: str) -> typing.Tuple[typing.List[str], typing.List[_RepositorySection]]:
+    preamble: typing.List[str] = []
+    sections: typing.List[_RepositorySection] = []
+    current: typing.Optional[typing.Tuple[str, typing.List[str]]] = None
+
+    for line in content.splitlines(keepends=True):
+        stripped = line.strip()
+        if stripped.startswith("[") and stripped.endswith("]"):
+            if current is not None:
+                sections.append(_RepositorySection(*current))
+            current = (stripped[1:-1].strip(), [line])
+        elif current is None:
+            preamble.append(line)
+        else:
+            current[1].append(line)
+
+    if current is not None:
+        sections.append(_RepositorySection(*current))
+    return preamble, sections
+
+
+class _FileChanges:
+    remove_file_conditions: typing.List[RepositoryFilePredicate]
+    remove_repository_conditions: typing.List[RepositoryPredicate]
+    adopt: bool
+
+    def __init__(self) -> None:
+        self.remove_file_conditions = []
+        self.remove_repository_conditions = []
+        self.adopt = False
+
+
+class RepositoryFilesPipeline:
+    _changes: typing.Dict[str, _FileChanges]
+
+    def __init__(self) -> None:
+        self._changes = {}
+
+    def _get_changes(self, path: str) -> _FileChanges:
+        return self._changes.setdefault(path, _FileChanges())
+
+    def remove_file_if(self, path: str, condition: RepositoryFilePredicate) -> None:
+        self._get_changes(path).remove_file_conditions.append(condition)
+
+    def remove_repositories(self, path: str, conditions: typing.List[RepositoryPredicate]) -> None:
+        self._get_changes(path).remove_repository_conditions.extend(conditions)
+
+    def adopt_repositories(self, path: str) -> None:
+        self._get_changes(path).adopt = True
+
+    def _apply(self, path: str, changes: _FileChanges, backups: typing.Dict[str, str]) -> None:
+        with open(path) as f:
+            original_content = f.read()
+        preamble, sections = _parse(original_content)
+        repositories = [section.repository for section in sections]
+
+        backup_path = path + BACKUP_SUFFIX
+        if any(condition(repositories) for condition in changes.remove_file_conditions):
+            os.rename(path, backup_path)
+            backups[path] = backup_path
+            log.info(f"Repository file {path!r} is removed")
+            return
+
+        kept_sections = []
+        for section in sections:
+            if any(condition(section.repository) for condition in changes.remove_repository_conditions):
+                log.info(f"Repository {section.repository.id!r} is removed from {path!r}")
+            else:
+                kept_sections.append(section)
+
+        staged_path = path + STAGED_SUFFIX
+        try:
+            with open(staged_path, "w") as f:
+                f.write("".join(preamble + [line for section in kept_sections for line in section.lines]))
+            if changes.adopt:
+                leapp_configs.adopt_repositories(staged_path)
+
+            with open(staged_path) as f:
+                if f.read() == original_content:
+                    os.unlink(staged_path)
+                    return
+        except BaseException:
+            if os.path.exists(staged_path):
+                os.unlink(staged_path)
+            raise
+
+        shutil.copy2(path, backup_path)
+        backups[path] = backup_path
+        os.replace(staged_path, path)
+        log.debug(f"Repository file {path!r} is rewritten")
+
+    def commit(self) -> None:
+        # Either all registered changes are written or none of them, backups are kept only
+        # until every file is handled
+        changes, self._changes = self._changes, {}
+        backups: typing.Dict[str, str] = {}
+        try:
+            for path, file_changes in changes.items():
+                if os.path.exists(path):
+                    self._apply(path, file_changes, backups)
+        except BaseException:
+            for path, backup_path in backups.items():
+                os.replace(backup_path, path)
+            raise
+
+        for backup_path in backups.values():
+            os.unlink(backup_path)
@@ -0,0 +1,121 @@
+# Copyright 1999 - 2026. WebPros International GmbH. All rights reserved.
+import subprocess
+import time
+import typing
+
+from pleskdistup.common import log, util
+
+from cloudlinux7to8.common import probe
+
+SYSTEMCTL_PATH = "/usr/bin/systemctl"
+TRANSITIONAL_STATES = {"activating", "deactivating", "reloading"}
+SETTLE_PROPERTIES = ["ActiveState", "Job", "Type", "Result"]
+
+
+def _is_settled(unit: typing.Dict[str, str]) -> bool:
+    # A unit with a queued job still reads inactive, so the job has to be gone as well.
+    # systemctl show omits the Job property when there is no job.
+    return not unit.get("Job") and unit.get("ActiveState") not in TRANSITIONAL_STATES
+
+
+def _is_started(unit: typing.Dict[str, str]) -> bool:
+    if unit.get("ActiveState") == "active":
+        return True
+    # A oneshot unit without RemainAfterExit is inactive again once it has done its work
+    return unit.get("Type") == "oneshot" and unit.get("ActiveState") == "inactive" and unit.get("Result") == "success"
+
+
+class ServiceOperationsFailed(Exception):
+    failures: typing.Dict[str, str]
+
+    def __init__(self, failures: typing.Dict[str, str]):
+        super().__init__("Some systemd service operations failed.")
+        self.failures = failures
+
+    def __str__(self):
+        failures_str = "\n".join(f"\t- {service}: {reason}" for service, reason in sorted(self.failures.items()))
+        return f"{super().__str__()} Failed services:\n{failures_str}"
+
+
+class ServicesBatch:
+    # Operations are applied verb by verb in this order, so it's safe to mix
+    # stopping and disabling, or enabling and starting of the same units
+    VERBS_ORDER = ["stop", "disable", "enable", "start", "restart"]
+
+    start_timeout: int
+    _operations: typing.Dict[str, typing.List[str]]
+
+    def __init__(self, start_timeout: int = 5 * 60) -> None:
+        self.start_timeout = start_timeout
+        self._operations = {}
+
+    def _add(self, verb: str, services: typing.Iterable[str]) -> "ServicesBatch":
+        units = self._operations.setdefault(verb, [])
+        units.extend(service for service in services if service not in units)
+        return self
+
+    def stop(self, services: typing.Iterable[str]) -> "ServicesBatch":
+        return self._add("stop", services)
+
+    def disable(self, services: typing.Iterable[str]) -> "ServicesBatch":
+        return self._add("disable", services)
+
+    def enable(self, services: typing.Iterable[str]) -> "ServicesBatch":
+        return self._add("enable", services)
+
+    def start(self, services: typing.Iterable[str]) -> "ServicesBatch":
+        return self._add("start", services)
+
+    def restart(self, services: typing.Iterable[str]) -> "ServicesBatch":
+        return self._add("restart", services)
+
+    def _call(self, verb: str, services: typing.List[str], flags: typing.Optional[typing.List[str]] = None) -> typing.Dict[str, str]:
+        command = [SYSTEMCTL_PATH, verb] + (flags or [])
+        try:
+            util.logged_check_call(command + services)
+            return {}
+        except subprocess.CalledProcessError:
+            if len(services) == 1:
+                return {services[0]: f"systemctl {verb} failed"}
+
+        # The batched call doesn't tell which unit is broken, so find out one by one
+        log.warn(f"Batched 'systemctl {verb}' failed, retrying services one by one to find the failed ones")
+        failures = {}
+        for service in services:
+            try:
+                util.logged_check_call(command + [service])
+            except subprocess.CalledProcessError:
+                failures[service] = f"systemctl {verb} failed"
+        return failures
+
+    def _start_in_parallel(self, verb: str, services: typing.List[str]) -> typing.Dict[str, str]:
+        # Jobs are only enqueued here, so independent units are started by systemd simultaneously
+        failures = self._call(verb, services, flags=["--no-block"])
+        pending = [service for service in services if service not in failures]
+
+        deadline = time.monotonic() + self.start_timeout
+        properties = probe.get_services_properties(pending, SETTLE_PROPERTIES)
+        while not all(_is_settled(unit) for unit in properties.values()) and time.monotonic() < deadline:
+            time.sleep(0.5)
+            properties = probe.get_services_properties(pending, SETTLE_PROPERTIES)
+
+        for service, unit in properties.items():
+            if not _is_started(unit):
+                failures[service] = f"service is {unit.get('ActiveState', 'unknown')} after systemctl {verb}"
+        return failures
+
+    def execute(self) -> None:
+        failures: typing.Dict[str, str] = {}
+        for verb in self.VERBS_ORDER:
+            services = self._operations.get(verb)
+            if not services:
+                continue
+
+            if verb in ("start", "restart"):
+                failures.update(self._start_in_parallel(verb, services))
+            else:
+                failures.update(self._call(verb, services))
+
+        self._operations = {}
+        if failures:
+            raise ServiceOperationsFailed(failures)
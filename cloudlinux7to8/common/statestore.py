@@ -0,0 +1,142 @@
+# Copyright 1999 - 2026. WebPros International GmbH. All rights reserved.
+# Conversion state shared between phases. Every action keeps its values in a separate
+# namespace of one sqlite database in the state directory.
+import argparse
+import json
+import os
+import sqlite3
+import time
+import typing
+
+STATE_DATABASE_NAME = "cloudlinux7to8_state.sqlite3"
+
+_stores: typing.Dict[str, "StateStore"] = {}
+
+
+class StateStore:
+    path: str
+    _connection: typing.Optional[sqlite3.Connection]
+    _values: typing.Optional[typing.Dict[typing.Tuple[str, str], typing.Any]]
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._connection = None
+        self._values = None
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        if self._connection is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._connection = sqlite3.connect(self.path, timeout=30)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            # Every commit reaches the disk, so the state survives a power loss right after the action
+            self._connection.execute("PRAGMA synchronous=FULL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS state ("
+                "namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, updated REAL NOT NULL, "
+                "PRIMARY KEY (namespace, key))"
+            )
+            self._connection.commit()
+        return self._connection
+
+    @property
+    def values(self) -> typing.Dict[typing.Tuple[str, str], typing.Any]:
+        # All values are read at once, the state is small and it saves a query per value
+        if self._values is None:
+            rows = self.connection.execute("SELECT namespace, key, value FROM state")
+            self._values = {(namespace, key): json.loads(value) for namespace, key, value in rows}
+        return self._values
+
+    def get(self, namespace: str, key: str, default: typing.Any = None) -> typing.Any:
+        return self.values.get((namespace, key), default)
+
+    def set(self, namespace: str, key: str, value: typing.Any) -> None:
+        with self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO state (namespace, key, value, updated) VALUES (?, ?, ?, ?)",
+                (namespace, key, json.dumps(value), time.time()),
+            )
+        self.values[(namespace, key)] = value
+
+    def delete(self, namespace: str, key: typing.Optional[str] = None) -> None:
+        with self.connection:
+            if key is None:
+                self.connection.execute("DELETE FROM state WHERE namespace = ?", (namespace,))
+            else:
+                self.connection.execute("DELETE FROM state WHERE namespace = ? AND key = ?", (namespace, key))
+        for stored_key in list(self.values):
+            if stored_key[0] == namespace and (key is None or stored_key[1] == key):
+                del self.values[stored_key]
+
+    def dump(self) -> typing.List[typing.Tuple[str, str, typing.Any, float]]:
+        rows = self.connection.execute("SELECT namespace, key, value, updated FROM state ORDER BY namespace, key")
+        return [(namespace, key, json.loads(value), updated) for namespace, key, value, updated in rows]
+
+
+def get_store(state_dir: str) -> StateStore:
+    path = os.path.join(state_dir, STATE_DATABASE_NAME)
+    if path not in _stores:
+        _stores[path] = StateStore(path)
+    return _stores[path]
+
+
+class ActionState:
+    store: StateStore
+    namespace: str
+    _imported_legacy_files: typing.Set[str]
+
+    def __init__(self, state_dir: str, namespace: str) -> None:
+        self.store = get_store(state_dir)
+        self.namespace = namespace
+        self._imported_legacy_files = set()
+
+    def get(self, key: str, default: typing.Any = None) -> typing.Any:
+        return self.store.get(self.namespace, key, default)
+
+    def set(self, key: str, value: typing.Any) -> None:
+        self.store.set(self.namespace, key, value)
+
+    def has(self, key: str) -> bool:
+        return (self.namespace, key) in self.store.values
+
+    def get_list(self, key: str) -> typing.List[typing.Any]:
+        return list(self.get(key, []))
+
+    def extend_list(self, key: str, values: typing.Iterable[typing.Any]) -> None:
+        current = self.get_list(key)
+        current.extend(value for value in values if value not in current)
+        self.set(key, current)
+
+    def remove(self, key: str) -> None:
+        self.store.delete(self.namespace, key)
+
+    def clear(self) -> None:
+        self.store.delete(self.namespace)
+
+    def import_legacy_list_file(self, key: str, path: str) -> None:
+        # Conversions started by previous versions of the tool keep lists in text files
+        if path in self._imported_legacy_files:
+            return
+        self._imported_legacy_files.add(path)
+        if not os.path.exists(path):
+            return
+        with open(path) as f:
+            self.extend_list(key, [line for line in f.read().splitlines() if line])
+        os.unlink(path)
+
+
+def show_state(args: typing.Sequence[str]) -> int:
+    # A standalone command, it works before, during and after the conversion on any distribution
+    parser = argparse.ArgumentParser(prog="cloudlinux7to8 --show-state", description="Show state saved by the conversion")
+    parser.add_argument("state_dir", help="State directory used by the conversion")
+    options = parser.parse_args(args)
+
+    path = os.path.join(options.state_dir, STATE_DATABASE_NAME)
+    if not os.path.exists(path):
+        print(f"There is no saved state in {options.state_dir!r}")
+        return 1
+
+    for namespace, key, value, updated in StateStore(path).dump():
+        updated_str = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(updated))
+        print(f"{namespace}.{key} [{updated_str}]: {json.dumps(value, sort_keys=True)}")
+    return 0
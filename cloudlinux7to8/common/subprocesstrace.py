@@ -0,0 +1,138 @@
+# Copyright 1999 - 2026. WebPros International GmbH. All rights reserved.
+# Almost all the conversion time is spent in child processes, so every finished child is recorded
+# with the action it was started by. Records are kept in the state directory for the whole
+# conversion, and the report shows which commands take the time and which are repeated.
+import atexit
+import collections
+import json
+import os
+import typing
+
+from pleskdistup.common import log
+
+from cloudlinux7to8.common import events
+
+TRACE_FILE_NAME = "cloudlinux7to8_subprocesses.jsonl"
+REPORT_FILE_NAME = "cloudlinux7to8_subprocesses_report.txt"
+
+RECORD_FIELDS = ["phase", "stage", "action", "args", "started", "duration", "returncode", "output_size"]
+
+
+class SubprocessTracer:
+    trace_path: str
+    report_path: str
+    recorded: int
+
+    def __init__(self, state_dir: str) -> None:
+        self.trace_path = os.path.join(state_dir, TRACE_FILE_NAME)
+        self.report_path = os.path.join(state_dir, REPORT_FILE_NAME)
+        self.recorded = 0
+
+    def record(self, event: events.Event) -> None:
+        if event["type"] != "subprocess_end":
+            return
+        record = {field: event.get(field) for field in RECORD_FIELDS}
+        os.makedirs(os.path.dirname(self.trace_path), exist_ok=True)
+        with open(self.trace_path, "a") as f:
+            f.write(json.dumps(record) + "\n")
+        self.recorded += 1
+
+    def load(self) -> typing.List[typing.Dict[str, typing.Any]]:
+        if not os.path.exists(self.trace_path):
+            return []
+        records = []
+        with open(self.trace_path) as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    # The last line could be incomplete if the process was killed
+                    continue
+        return records
+
+    def report(self, top: int = 15) -> typing.List[str]:
+        records = self.load()
+        if not records:
+            return []
+
+        by_command: typing.Dict[str, typing.List[typing.Dict[str, typing.Any]]] = collections.defaultdict(list)
+        by_args: typing.Dict[str, typing.List[typing.Dict[str, typing.Any]]] = collections.defaultdict(list)
+        for record in records:
+            by_command[get_command_name(record["args"])].append(record)
+            by_args[" ".join(record["args"])].append(record)
+
+        total = sum(record["duration"] for record in records)
+        lines = [f"{len(records)} child processes took {total:.1f} seconds in total", "", "Top commands by total time:"]
+        commands = sorted(by_command.items(), key=lambda item: -_total_duration(item[1]))
+        for command, command_records in commands[:top]:
+            lines.append(f"  {_total_duration(command_records):9.1f}s {len(command_records):5} runs  "
+                         f"max {max(record['duration'] for record in command_records):7.1f}s  {command}")
+
+        lines += ["", "Slowest runs:"]
+        for record in sorted(records, key=lambda record: -record["duration"])[:top]:
+            lines.append(f"  {record['duration']:9.1f}s  exit {record['returncode']:<4} "
+                         f"{_format_size(record['output_size'])} output  [{record['action']}] {' '.join(record['args'])}")
+
+        repeated = [(args, args_records) for args, args_records in by_args.items()
+                    if len({record["action"] for record in args_records}) > 1]
+        if repeated:
+            lines += ["", "Same command run by different actions:"]
+            repeated.sort(key=lambda item: -_total_duration(item[1]))
+            for args, args_records in repeated[:top]:
+                actions = sorted({str(record["action"]) for record in args_records})
+                lines.append(f"  {_total_duration(args_records):9.1f}s {len(args_records):5} runs  {args}")
+                lines.append(f"      by: {', '.join(actions)}")
+        return lines
+
+    def write_report(self) -> None:
+        # Nothing was run by this process, so the report of the previous run is still actual
+        if self.recorded == 0:
+            return
+        lines = self.report()
+        with open(self.report_path, "w") as f:
+            f.write("\n".join(lines) + "\n")
+        log.debug("Child processes time report:\n" + "\n".join(lines))
+
+
+def get_command_name(args: typing.List[str]) -> str:
+    # Utilities like systemctl or plesk are distinguished by the subcommand, while options and
+    # package names would split the same command into many
+    if not args:
+        return ""
+    # Throttled commands are started by systemd-run or nice and ionice, but the command itself is interesting
+    if os.path.basename(args[0]) == "systemd-run" and "--" in args:
+        args = args[args.index("--") + 1:] or args
+    while len(args) > 1 and os.path.basename(args[0]) in ("nice", "ionice"):
+        args = args[1:]
+        while len(args) > 1 and (args[0].startswith("-") or args[0].isdigit()):
+            args = args[1:]
+    name = os.path.basename(args[0])
+    if len(args) > 1 and args[1].isalpha():
+        name += " " + args[1]
+    return name
+
+
+def _total_duration(records: typing.List[typing.Dict[str, typing.Any]]) -> float:
+    return sum(record["duration"] for record in records)
+
+
+def _format_size(size: typing.Optional[int]) -> str:
+    size = size or 0
+    for unit in ("B", "KB", "MB"):
+        if size < 1024:
+            return f"{size:5}{unit}"
+        size //= 1024
+    return f"{size:5}GB"
+
+
+_tracers: typing.Dict[str, SubprocessTracer] = {}
+
+
+def install(state_dir: str) -> SubprocessTracer:
+    if state_dir not in _tracers:
+        tracer = SubprocessTracer(state_dir)
+        events.trace_subprocesses()
+        events.publisher.subscribe(tracer.record)
+        atexit.register(tracer.write_report)
+        _tracers[state_dir] = tracer
+    return _tracers[state_dir]
@@ -0,0 +1,87 @@
+# Copyright 1999 - 2026. WebPros International GmbH. All rights reserved.
+# Background work of the conversion could be asked not to compete with hosted sites, which are
+# already online at the end of the finishing. Throttled commands are started in a transient systemd
+# scope in a dedicated slice with reduced CPU and IO weights and optionally limited memory.
+# Without systemd we fall back to nice and ionice. Package transactions are never throttled,
+# a memory limit could kill rpm in the middle of a transaction.
+import os
+import shutil
+import subprocess
+import typing
+
+from pleskdistup.common import log
+
+SLICE_NAME = "cloudlinux7to8-background.slice"
+SYSTEMD_RUN_PATH = "/usr/bin/systemd-run"
+# CPUWeight, IOWeight and MemoryMax are supported since systemd 232,
+# older versions have CPUShares, BlockIOWeight and MemoryLimit instead
+FIRST_SYSTEMD_VERSION_WITH_WEIGHTS = 232
+
+DEFAULT_CPU_WEIGHT = 20
+DEFAULT_IO_WEIGHT = 20
+
+
+class ThrottleLimits(typing.NamedTuple):
+    # Weights are relative to the default weight 100 of other units
+    cpu_weight: int = DEFAULT_CPU_WEIGHT
+    io_weight: int = DEFAULT_IO_WEIGHT
+    # In the systemd format, like "512M" or "20%"
+    memory_max: typing.Optional[str] = None
+
+
+_systemd_version: typing.Optional[int] = None
+
+
+def _get_systemd_version() -> int:
+    global _systemd_version
+    if _systemd_version is None:
+        try:
+            output = subprocess.check_output([SYSTEMD_RUN_PATH, "--version"], universal_newlines=True, stderr=subprocess.DEVNULL)
+            # The first line looks like "systemd 239 (239-78.el8)"
+            _systemd_version = int(output.split()[1])
+        except (OSError, subprocess.CalledProcessError, ValueError, IndexError) as ex:
+            log.debug(f"Unable to get systemd version: {ex}")
+            _systemd_version = 0
+    return _systemd_version
+
+
+def is_systemd_run_usable() -> bool:
+    # systemd-run needs a running systemd, so it is not available in containers without it
+    return os.path.exists(SYSTEMD_RUN_PATH) and os.path.isdir("/run/systemd/system") and _get_systemd_version() > 0
+
+
+def get_unit_properties(limits: ThrottleLimits) -> typing.List[str]:
+    if _get_systemd_version() >= FIRST_SYSTEMD_VERSION_WITH_WEIGHTS:
+        properties = [f"CPUWeight={limits.cpu_weight}", f"IOWeight={limits.io_weight}"]
+        if limits.memory_max:
+            properties.append(f"MemoryMax={limits.memory_max}")
+    else:
+        # CPUShares default is 1024 and BlockIOWeight default is 500, while the weights default is 100
+        properties = [f"CPUShares={limits.cpu_weight * 1024 // 100}", f"BlockIOWeight={max(10, limits.io_weight * 5)}"]
+        if limits.memory_max:
+            properties.append(f"MemoryLimit={limits.memory_max}")
+    return properties
+
+
+def _get_fallback_command() -> typing.List[str]:
+    command = []
+    if shutil.which("nice"):
+        command += ["nice", "-n", "10"]
+    if shutil.which("ionice"):
+        command += ["ionice", "-c", "2", "-n", "7"]
+    return command
+
+
+def wrap_command(args: typing.List[str], limits: typing.Optional[ThrottleLimits]) -> typing.List[str]:
+    if limits is None:
+        return args
+
+    if is_systemd_run_usable():
+        command = [SYSTEMD_RUN_PATH, "--scope", f"--slice={SLICE_NAME}"]
+        if _get_systemd_version() >= FIRST_SYSTEMD_VERSION_WITH_WEIGHTS:
+            command.append("--quiet")
+        for unit_property in get_unit_properties(limits):
+            command += ["-p", unit_property]
+        return command + ["--"] + args
+
+    return _get_fallback_command() + args
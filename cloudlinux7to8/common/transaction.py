@@ -0,0 +1,44 @@
+# Copyright 1999 - 2026. WebPros International GmbH. All rights reserved.
+import typing
+
+from pleskdistup.common import log, rpm
+
+
+class PackagesRemovalTransaction:
+    # Collects packages removed by several actions to remove them with one rpm transaction.
+    # Actions still keep their own lists of removed packages for the revert.
+    _packages: typing.Dict[str, typing.List[str]]
+
+    def __init__(self) -> None:
+        self._packages = {}
+
+    def add(self, packages: typing.Iterable[str], owner: str) -> None:
+        owner_packages = self._packages.setdefault(owner, [])
+        owner_packages.extend(package for package in packages if package not in owner_packages)
+
+    @property
+    def packages(self) -> typing.List[str]:
+        return list(dict.fromkeys(package for owner_packages in self._packages.values() for package in owner_packages))
+
+    def commit(self) -> None:
+        packages = self.packages
+        if packages:
+            for owner, owner_packages in self._packages.items():
+                if owner_packages:
+                    log.debug(f"Packages removed for {owner!r}: {', '.join(owner_packages)}")
+            # Packages could be removed by someone else since they were added
+            packages = rpm.filter_installed_packages(packages)
+            if packages:
+                rpm.remove_packages(packages)
+        self._packages = {}
+
+
+def remove_packages(
+    packages: typing.List[str],
+    transaction: typing.Optional[PackagesRemovalTransaction],
+    owner: str,
+) -> None:
+    if transaction is None:
+        rpm.remove_packages(packages)
+    else:
+        transaction.add(packages, owner)
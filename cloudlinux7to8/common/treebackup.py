@@ -0,0 +1,134 @@
+# Copyright 1999 - 2026. WebPros International GmbH. All rights reserved.
+# Moving of directory trees aside for backup purposes. The cheapest possible way is used:
+# rename on the same filesystem and streaming tar when the tree is on another filesystem
+# or is a mount point. The strategy is returned to be saved, so the restore could be done the same way.
+import errno
+import os
+import shutil
+import subprocess
+import time
+import typing
+
+from pleskdistup.common import log
+
+STRATEGY_RENAME = "rename"
+STRATEGY_TAR = "tar"
+
+TAR_CHUNK_SIZE = 1024 * 1024
+PROGRESS_REPORT_INTERVAL = 10
+
+
+def _get_tree_size(path: str) -> int:
+    size = 0
+    stack = [path]
+    while stack:
+        with os.scandir(stack.pop()) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.is_file(follow_symlinks=False):
+                    size += entry.stat(follow_symlinks=False).st_size
+    return size
+
+
+def _clear_directory(path: str) -> None:
+    with os.scandir(path) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                shutil.rmtree(entry.path)
+            else:
+                os.unlink(entry.path)
+
+
+def _rename(source: str, destination: str) -> bool:
+    if os.path.ismount(source):
+        return False
+    try:
+        os.rename(source, destination)
+    except OSError as ex:
+        if ex.errno in (errno.EXDEV, errno.EBUSY):
+            return False
+        raise
+    return True
+
+
+def _tar_copy(source: str, destination: str) -> None:
+    total_size = _get_tree_size(source)
+    os.makedirs(destination, exist_ok=True)
+
+    reader = subprocess.Popen(["/usr/bin/tar", "-C", source, "-cf", "-", "."], stdout=subprocess.PIPE)
+    writer = subprocess.Popen(["/usr/bin/tar", "-C", destination, "-xpf", "-"], stdin=subprocess.PIPE)
+    assert reader.stdout is not None and writer.stdin is not None
+
+    copied = 0
+    completed = False
+    started_at = last_report_at = time.monotonic()
+    try:
+        while True:
+            chunk = reader.stdout.read(TAR_CHUNK_SIZE)
+            if not chunk:
+                completed = True
+                break
+            try:
+                writer.stdin.write(chunk)
+            except BrokenPipeError:
+                # The extracting tar has exited, its exit code tells the reason
+                break
+            copied += len(chunk)
+
+            now = time.monotonic()
+            if now - last_report_at >= PROGRESS_REPORT_INTERVAL:
+                last_report_at = now
+                throughput = copied / (now - started_at) / 1024 / 1024
+                # tar stream has headers, so the progress could slightly exceed the size of files
+                progress = min(100, copied * 100 // total_size) if total_size else 100
+                log.info(f"Copying {source!r} to {destination!r}: {progress}% done, {throughput:.1f} MiB/s")
+    finally:
+        try:
+            writer.stdin.close()
+        except BrokenPipeError:
+            pass
+        # Nobody drains the archive after an interruption, so the reader would block forever
+        reader.stdout.close()
+        if not completed:
+            reader.kill()
+        reader_code = reader.wait()
+        writer_code = writer.wait()
+
+    if reader_code != 0 or writer_code != 0:
+        raise RuntimeError(f"Unable to copy {source!r} to {destination!r} with tar, "
+                           f"exit codes are {reader_code} and {writer_code}")
+
+    elapsed = time.monotonic() - started_at
+    log.info(f"Copied {copied} bytes from {source!r} to {destination!r} in {elapsed:.1f} seconds")
+
+
+def _move_tree(source: str, destination: str) -> str:
+    if _rename(source, destination):
+        return STRATEGY_RENAME
+
+    _tar_copy(source, destination)
+
+    # Mount points can't be removed, so we keep them empty instead
+    if os.path.ismount(source):
+        _clear_directory(source)
+    else:
+        shutil.rmtree(source)
+    return STRATEGY_TAR
+
+
+def backup_tree(source: str, destination: str) -> typing.Dict[str, str]:
+    strategy = _move_tree(source, destination)
+    log.info(f"Directory {source!r} is moved to {destination!r} using {strategy} strategy")
+    return {"source": source, "destination": destination, "strategy": strategy}
+
+
+def restore_tree(state: typing.Dict[str, str]) -> None:
+    source, destination = state["source"], state["destination"]
+    if os.path.exists(destination):
+        if os.path.exists(source) and not os.path.ismount(source):
+            # Something was created in place of the original tree, it's not something we want to keep
+            shutil.rmtree(source)
+        strategy = _move_tree(destination, source)
+        log.info(f"Directory {source!r} is restored from {destination!r} using {strategy} strategy, "
+                 f"backup was done with {state['strategy']} strategy")
@@ -7,7 +7,22 @@ import pleskdistup.main
 import pleskdistup.registry
 
 import cloudlinux7to8.upgrader
+from cloudlinux7to8.common import actionlogs, events, statestore
 
 if __name__ == "__main__":
+    # Inspection commands don't need an upgrader, so they work on the converted server as well
+    if len(sys.argv) > 1 and sys.argv[1] == "--show-state":
+        sys.exit(statestore.show_state(sys.argv[2:]))
+    if len(sys.argv) > 1 and sys.argv[1] == "--action-log":
+        sys.exit(actionlogs.show_action_log(sys.argv[2:]))
+
+    # --monitor is handled by pleskdistup before options of the upgrader are parsed, so
+    # the events stream is followed here when the conversion publishes it, the status
+    # file based monitor of pleskdistup is used otherwise
+    if len(sys.argv) > 1 and sys.argv[1] == "--monitor":
+        events_client = events.connect()
+        if events_client is not None:
+            sys.exit(events.monitor(events_client))
+
     pleskdistup.registry.register_upgrader(cloudlinux7to8.upgrader.CloudLinux7to8Factory())
     sys.exit(pleskdistup.main.main())
@@ -12,6 +12,10 @@ from pleskdistup.upgrader import DistUpgrader, DistUpgraderFactory, PathType
 
 import cloudlinux7to8.config
 from cloudlinux7to8 import actions as custom_actions
+from cloudlinux7to8.common import (
+    actionlogs, checkcache, cleanup, dnfsession, downtime, events, perlresolver, procsampler, prometheus, repofiles,
+    subprocesstrace, throttle, transaction,
+)
 
 
 class CloudLinux7to8Upgrader(DistUpgrader):
@@ -30,6 +34,15 @@ class CloudLinux7to8Upgrader(DistUpgrader):
         self.allow_raid_devices = False
         self.remove_leapp_logs = False
         self.allow_old_script_version = False
+        self.prune_leapp_configs = False
+        self.recheck_all = False
+        self.kexec_reboot = False
+        self.prometheus_textfile_dir: typing.Optional[str] = None
+        self.downtime_probe_targets: typing.List[downtime.ProbeTarget] = []
+        self.capture_baseline = False
+        self.baseline_regression_threshold = 20
+        self.background_limits: typing.Optional[throttle.ThrottleLimits] = None
+        self._cpan_modules_inventory: typing.Optional[custom_actions.CpanModulesInventory] = None
 
     def __repr__(self) -> str:
         attrs = ", ".join(f"{k}={getattr(self, k)!r}" for k in (
@@ -96,8 +109,23 @@ class CloudLinux7to8Upgrader(DistUpgrader):
         for repofile in files.find_files_case_insensitive("/etc/yum.repos.d", ["*.repo*"]):
             feed.attached_files.append(repofile)
 
+        # Full output of failed and last actions, the rest is in the conversion log
+        action_logs = actionlogs.ActionLogs()
+        if os.path.exists(action_logs.index_path):
+            feed.attached_files.append(action_logs.index_path)
+        feed.attached_files += action_logs.extract_relevant()
+
         return feed
 
+    def _get_cpan_modules_inventory(self, state_dir: str) -> custom_actions.CpanModulesInventory:
+        # Shared between the check and the action, so the modules directory is scanned only once
+        if self._cpan_modules_inventory is None:
+            self._cpan_modules_inventory = custom_actions.CpanModulesInventory(
+                state_dir,
+                resolver=perlresolver.PerlModulesResolver(state_dir),
+            )
+        return self._cpan_modules_inventory
+
     def construct_actions(
         self,
         upgrader_bin_path: PathType,
@@ -105,13 +133,44 @@ class CloudLinux7to8Upgrader(DistUpgrader):
         phase: Phase
     ) -> typing.Dict[str, typing.List[action.ActiveAction]]:
         new_os = str(self._distro_to)
+        # Finishing of "Do convert" stage goes before "Repositories handling", so all changes of
+        # repository files are registered before AdoptRepositories commits them
+        repository_files = repofiles.RepositoryFilesPipeline()
+        # Packages removed by different actions on preparation are removed in one transaction
+        # by CommitPackagesRemoval, each action keeps its own list for the revert
+        removal = transaction.PackagesRemovalTransaction()
+        # Repositories metadata is loaded once for all package operations on finishing
+        dnf_session = dnfsession.DnfSession()
 
         actions_map: typing.Dict[str, typing.List[action.ActiveAction]] = {
+            # Finishing stages go in the reverse order, so the final reboot decision is made
+            # after all other finishing actions
+            "Final reboot": [
+                custom_actions.RebootIfRequired(options.state_dir, use_kexec=self.kexec_reboot),
+            ],
+            "Background cleanup": [
+                custom_actions.StartBackgroundCleanup(options.state_dir, self.background_limits),
+            ],
             "Status informing": [
                 common_actions.HandleConversionStatus(options.status_flag_path, options.completion_flag_path),
                 common_actions.AddFinishSshLoginMessage(new_os),  # Executed at the finish phase only
                 common_actions.AddInProgressSshLoginMessage(new_os),
             ],
+            # Finishing goes in the reverse order, so the comparison is done once services are started and before the finish message is shown
+            "Performance comparison": [
+                custom_actions.CompareWithPerformanceBaseline(options.state_dir, self.baseline_regression_threshold / 100),
+            ],
+            # Recreation takes long on servers with many domains, so it's done once sites are online again
+            "Statistics configuration": [
+                custom_actions.RecreateAwstatsConfigurationFiles(self.background_limits),
+            ],
+            # Finishing goes in the reverse order, so the downtime is measured once all services are started
+            "Services availability": [
+                custom_actions.MarkServicesUp(options.state_dir, self.downtime_probe_targets),
+            ],
+            "Plesk services start": [
+                custom_actions.StartStoppedPleskServices(options.state_dir),
+            ],
             "Leapp installation": [
                 custom_actions.LeappInstallation(
                     custom_actions.LEAPP_CLOUDLINUX_RPM_URL,
@@ -123,7 +182,8 @@ class CloudLinux7to8Upgrader(DistUpgrader):
                         "leapp-upgrade-el7toel8-0.20.0-7.el7",
                         "leapp-upgrade-el7toel8-deps-0.20.0-7.el7",
                     ],
-                    remove_logs_on_finish=self.remove_leapp_logs
+                    remove_logs_on_finish=self.remove_leapp_logs,
+                    cleanup_queue=cleanup.CleanupQueue(options.state_dir),
                 ),
             ],
             "Prepare finihsing systemd service": [
@@ -146,32 +206,34 @@ class CloudLinux7to8Upgrader(DistUpgrader):
                 custom_actions.PatchDnfpluginErrorOutput(),
                 custom_actions.PatchLeappDebugNonAsciiPackager(),
                 common_actions.UpdatePlesk(),
-                custom_actions.PostgresReinstallModernPackage(),
-                custom_actions.FixNamedConfig(),
+                custom_actions.PostgresReinstallModernPackage(options.state_dir),
+                custom_actions.FixNamedConfig(options.state_dir),
                 common_actions.DisablePleskSshBanner(),
                 custom_actions.FixSyslogLogrotateConfig(options.state_dir),
                 common_actions.SetMinDovecotDhParamSize(dhparam_size=2048),
                 common_actions.RestoreDovecotConfiguration(options.state_dir),
                 common_actions.RestoreRoundcubeConfiguration(options.state_dir),
-                custom_actions.RecreateAwstatsConfigurationFiles(),
                 common_actions.UninstallTuxcareEls(),
                 common_actions.PreserveMariadbConfig(),
                 common_actions.SubstituteSshPermitRootLoginConfigured(),
                 custom_actions.UseSystemResolveForLeappContainer(),
             ],
             "Handle plesk related services": [
+                custom_actions.RememberActiveServices(options.state_dir),
                 common_actions.DisablePleskRelatedServicesDuringUpgrade(),
+                custom_actions.MarkServicesDown(options.state_dir, self.downtime_probe_targets),
                 common_actions.DisableServiceDuringUpgrade("mailman.service"),
                 common_actions.HandlePleskFirewallService(),
+                custom_actions.RememberStoppedServices(options.state_dir),
             ],
             "Handle packages and services": [
                 custom_actions.FixOsVendorPhpFpmConfiguration(),
                 common_actions.RebundleRubyApplications(),
-                custom_actions.ReinstallPhpmyadminPleskComponents(),
-                custom_actions.ReinstallRoundcubePleskComponents(),
-                custom_actions.ReinstallConflictPackages(options.state_dir),
-                custom_actions.ReinstallMariadbConflictPackages(options.state_dir),
-                custom_actions.ReinstallPerlCpanModules(options.state_dir),
+                custom_actions.ReinstallPhpmyadminPleskComponents(removal),
+                custom_actions.ReinstallRoundcubePleskComponents(removal),
+                custom_actions.ReinstallConflictPackages(options.state_dir, removal),
+                custom_actions.ReinstallMariadbConflictPackages(options.state_dir, removal),
+                custom_actions.ReinstallPerlCpanModules(options.state_dir, self._get_cpan_modules_inventory(options.state_dir)),
                 custom_actions.DisableSuspiciousKernelModules(),
                 common_actions.HandleUpdatedSpamassassinConfig(),
                 common_actions.DisableSelinuxDuringUpgrade(),
@@ -191,21 +253,24 @@ class CloudLinux7to8Upgrader(DistUpgrader):
                 common_actions.StartPleskBasicServices(),
             ],
             "Remove conflicting packages": [
-                custom_actions.RemovingPleskConflictPackages(),
-                custom_actions.RemovePleskOutdatedPackages(),
+                custom_actions.RemovingPleskConflictPackages(removal),
+                custom_actions.RemovePleskOutdatedPackages(removal),
             ],
             "Update databases": [
-                custom_actions.UpdateMariadbDatabase(),
-                custom_actions.UpdateModernMariadb(),
+                custom_actions.UpdateMariadbDatabase(removal, dnf_session),
+                custom_actions.UpdateModernMariadb(removal, dnf_session),
                 custom_actions.AddMysqlConnector(),
             ],
+            "Packages removal": [
+                custom_actions.CommitPackagesRemoval(removal),
+            ],
             "Repositories handling": [
-                custom_actions.AdoptRepositories(),
+                custom_actions.AdoptRepositories(repository_files),
                 custom_actions.SwitchClnChannel(),
             ],
             "Do convert": [
-                custom_actions.DisableBaseRepoUpdatesRepository(),
-                custom_actions.RemovePleskBaseRepository(),
+                custom_actions.DisableBaseRepoUpdatesRepository(repository_files),
+                custom_actions.RemovePleskBaseRepository(repository_files),
                 custom_actions.DoCloudLinux7to8Convert(),
             ],
             "Resume": [
@@ -216,7 +281,6 @@ class CloudLinux7to8Upgrader(DistUpgrader):
             "Reboot": [
                 common_actions.Reboot(
                     prepare_next_phase=Phase.FINISH,
-                    post_reboot=action.RebootType.AFTER_LAST_STAGE,
                     name="reboot and perform finishing actions",
                 )
             ]
@@ -232,6 +296,13 @@ class CloudLinux7to8Upgrader(DistUpgrader):
                 ]
             })
 
+        if self.kexec_reboot and not options.no_reboot:
+            actions_map = util.merge_dicts_of_lists(actions_map, {
+                "Pause before reboot": [
+                    custom_actions.PrepareKexecReboot(),
+                ]
+            })
+
         if self.upgrade_postgres_allowed:
             actions_map = util.merge_dicts_of_lists(actions_map, {
                 "Prepare configurations": [
@@ -239,7 +310,17 @@ class CloudLinux7to8Upgrader(DistUpgrader):
                 ]
             })
 
-        return actions_map
+        if self.prune_leapp_configs:
+            actions_map = util.merge_dicts_of_lists(actions_map, {
+                "Prepare configurations": [
+                    custom_actions.PruneLeappConfigurations(),
+                ]
+            })
+
+        subprocesstrace.install(options.state_dir)
+        procsampler.install(options.state_dir)
+        actionlogs.install()
+        return events.instrument_actions(actions_map, phase)
 
     def get_check_actions(
         self,
@@ -247,20 +328,23 @@ class CloudLinux7to8Upgrader(DistUpgrader):
         phase: Phase
     ) -> typing.List[action.CheckAction]:
         if phase is Phase.FINISH:
-            return [custom_actions.AssertDistroIsCloudLinux8()]
+            return events.instrument_checks([custom_actions.AssertDistroIsCloudLinux8()])
 
         FIRST_SUPPORTED_BY_ALMA_8_PHP_VERSION = "5.6"
         CLOUDLINUX8_AMAVIS_REQUIRED_RAM = int(1.5 * 1024 * 1024 * 1024)
+        # Results of checks are cached against their inputs, so when a preflight fails
+        # only checks affected by the changes made since the last run are evaluated again
+        cache = checkcache.CheckResultsCache(os.path.join(options.state_dir, "cloudlinux7to8_checks_cache.json"), recheck_all=self.recheck_all)
         checks = [
             common_actions.AssertPleskVersionIsAvailable(),
             common_actions.AssertPleskInstallerNotInProgress(),
             custom_actions.AssertAvailableSpaceForLocation("/var/lib", 5 * 1024 * 1024 * 1024),  # 5GB required minimum space to store packages
             custom_actions.AssertAvailableSpaceForLocation("/boot", 100 * 1024 * 1024),  # 100M required minimum space to store bootloader
-            common_actions.AssertMinPhpVersionInstalled(FIRST_SUPPORTED_BY_ALMA_8_PHP_VERSION),
+            checkcache.cached(common_actions.AssertMinPhpVersionInstalled(FIRST_SUPPORTED_BY_ALMA_8_PHP_VERSION), cache, [checkcache.rpmdb_input()]),
             common_actions.AssertMinPhpVersionUsedByWebsites(FIRST_SUPPORTED_BY_ALMA_8_PHP_VERSION),
             common_actions.AssertMinPhpVersionUsedByCron(FIRST_SUPPORTED_BY_ALMA_8_PHP_VERSION),
             common_actions.AssertOsVendorPhpUsedByWebsites(FIRST_SUPPORTED_BY_ALMA_8_PHP_VERSION),
-            common_actions.AssertGrubInstalled(),
+            checkcache.cached(common_actions.AssertGrubInstalled(), cache, [checkcache.rpmdb_input()]),
             custom_actions.AssertNoMoreThenOneKernelNamedNIC(),
             custom_actions.AssertRedHatKernelInstalled(),
             custom_actions.AssertLastInstalledKernelInUse(),
@@ -275,7 +359,7 @@ class CloudLinux7to8Upgrader(DistUpgrader):
             custom_actions.AssertMinGovernorMariadbVersion(custom_actions.FIRST_SUPPORTED_GOVERNOR_MARIADB_VERSION),
             custom_actions.AssertGovernorMysqlNotInstalled(custom_actions.FIRST_SUPPORTED_GOVERNOR_MARIADB_VERSION),
             custom_actions.CheckSourcePointsToArchiveURL(),
-            common_actions.AssertNoMoreThenOneKernelDevelInstalled(),
+            checkcache.cached(common_actions.AssertNoMoreThenOneKernelDevelInstalled(), cache, [checkcache.rpmdb_input()]),
             common_actions.AssertEnoughRamForAmavis(CLOUDLINUX8_AMAVIS_REQUIRED_RAM, self.amavis_upgrade_allowed),
             common_actions.AssertSshPermitRootLoginConfigured(skip_known_substitudes=True),
             common_actions.AssertFstabOrderingIsFine(),
@@ -295,13 +379,15 @@ class CloudLinux7to8Upgrader(DistUpgrader):
         else:
             checks.append(custom_actions.AssertPostgresLocaleMatchesSystemOne())
         if not self.remove_unknown_perl_modules:
-            checks.append(custom_actions.AssertThereIsNoUnknownPerlCpanModules())
+            checks.append(custom_actions.AssertThereIsNoUnknownPerlCpanModules(self._get_cpan_modules_inventory(options.state_dir)))
         if not self.disable_spamassasin_plugins:
             checks.append(common_actions.AssertSpamassassinAdditionalPluginsDisabled())
+        if self.capture_baseline:
+            checks.append(custom_actions.CapturePerformanceBaseline(options.state_dir))
         if not self.allow_old_script_version and cloudlinux7to8.config.version:
             checks.append(common_actions.AssertScriptVersionUpToDate("https://github.com/plesk/cloudlinux7to8", "cloudlinux7to8", version.DistupgradeToolVersion(cloudlinux7to8.config.version)))
 
-        return checks
+        return events.instrument_checks([checkcache.cached(check, cache) for check in checks])
 
     def parse_args(self, args: typing.Sequence[str]) -> None:
         DESC_MESSAGE = f"""Use this upgrader to convert {self._distro_from} server with Plesk to {self._distro_to}.
@@ -315,6 +401,9 @@ The process consists of the following general stages:
 -- Finalization (about 5 minutes) - The server is returned to normal operation.
 
 To see the detailed plan, run the utility with the --show-plan option.
+To see the state saved by the conversion, even after it is finished, run the utility
+with the --show-state <state directory> option. To see the log of a single action,
+run the utility with the --action-log <action name> option.
 
 For assistance, submit an issue here {self.issues_url}
 and attach the feedback archive generated with --prepare-feedback or at least
@@ -354,6 +443,38 @@ the log file.
                             help="Remove leapp logs after the conversion. By default, the logs are removed after the conversion.")
         parser.add_argument("--allow-old-script-version", action="store_true", dest="allow_old_script_version", default=False,
                             help="Allow to run the script with an old version. By default, the script checks for a new version on GitHub and does not allow to run with an old one.")
+        parser.add_argument("--prune-leapp-configs", action="store_true", dest="prune_leapp_configs", default=False,
+                            help="Remove events for packages that are not installed and mappings for disabled repositories from leapp configuration files "
+                                 "to speed up leapp. The original files are restored on revert.")
+        parser.add_argument("--recheck-all", action="store_true", dest="recheck_all", default=False,
+                            help="Evaluate all pre-checks even if their inputs were not changed since the previous run.")
+        parser.add_argument("--kexec-reboot", action="store_true", dest="kexec_reboot", default=False,
+                            help="Use kexec to boot the next kernel directly, skipping the firmware initialization on reboots. "
+                                 "The regular reboot is used when kexec is not safe to use on the server.")
+        parser.add_argument("--prometheus-textfile-dir", type=str, dest="prometheus_textfile_dir", default=None,
+                            help="Write conversion metrics into the cloudlinux7to8.prom file in the given directory. "
+                                 "Use the directory of node_exporter textfile collector to follow conversions in the monitoring.")
+        parser.add_argument("--probe-downtime", type=_parse_probe_targets, dest="downtime_probe_targets", default=[],
+                            help="Comma separated list of local services to measure the conversion downtime of, like "
+                                 "'http:example.com,smtp,imap:143'. Supported targets are http:<vhost>[:port], smtp[:port] and imap[:port]. "
+                                 "The downtime of Plesk services is measured in any case.")
+        parser.add_argument("--capture-baseline", action="store_true", dest="capture_baseline", default=False,
+                            help="Measure response time of a sample of hosted domains, database queries and PHP-FPM before the conversion, "
+                                 "repeat the measurements after it and report what became slower.")
+        parser.add_argument("--baseline-regression-threshold", type=int, dest="baseline_regression_threshold", default=20,
+                            help="Slowdown in percent to report a measurement of --capture-baseline as a regression. Default is 20.")
+        parser.add_argument("--throttle-background-work", action="store_true", dest="throttle_background_work", default=False,
+                            help="Reduce CPU and IO priority of heavy work done after services are started on finishing, "
+                                 "like AWStats configuration recreation and removal of leftovers. Not throttled by default.")
+        parser.add_argument("--background-cpu-weight", type=int, dest="background_cpu_weight", default=None,
+                            help=f"CPU weight of throttled background work, implies --throttle-background-work. "
+                                 f"Other services have the weight 100. Default is {throttle.DEFAULT_CPU_WEIGHT}.")
+        parser.add_argument("--background-io-weight", type=int, dest="background_io_weight", default=None,
+                            help=f"IO weight of throttled background work, implies --throttle-background-work. "
+                                 f"Other services have the weight 100. Default is {throttle.DEFAULT_IO_WEIGHT}.")
+        parser.add_argument("--background-memory-max", type=str, dest="background_memory_max", default=None,
+                            help="Memory limit of throttled background work in the systemd format, like 1G or 20%%, "
+                                 "implies --throttle-background-work. Not limited by default.")
         options = parser.parse_args(args)
 
         self.upgrade_postgres_allowed = options.upgrade_postgres_allowed
@@ -363,6 +484,30 @@ the log file.
         self.allow_raid_devices = options.allow_raid_devices
         self.remove_leapp_logs = options.remove_leapp_logs
         self.allow_old_script_version = options.allow_old_script_version
+        self.prune_leapp_configs = options.prune_leapp_configs
+        self.recheck_all = options.recheck_all
+        self.kexec_reboot = options.kexec_reboot
+        self.prometheus_textfile_dir = options.prometheus_textfile_dir
+        self.downtime_probe_targets = options.downtime_probe_targets
+        self.capture_baseline = options.capture_baseline
+        self.baseline_regression_threshold = options.baseline_regression_threshold
+        if options.throttle_background_work or any(value is not None for value in (
+            options.background_cpu_weight, options.background_io_weight, options.background_memory_max,
+        )):
+            self.background_limits = throttle.ThrottleLimits(
+                options.background_cpu_weight if options.background_cpu_weight is not None else throttle.DEFAULT_CPU_WEIGHT,
+                options.background_io_weight if options.background_io_weight is not None else throttle.DEFAULT_IO_WEIGHT,
+                options.background_memory_max,
+            )
+        if self.prometheus_textfile_dir:
+            prometheus.install(self.prometheus_textfile_dir)
+
+
+def _parse_probe_targets(value: str) -> typing.List[downtime.ProbeTarget]:
+    try:
+        return downtime.parse_targets(value)
+    except ValueError as ex:
+        raise argparse.ArgumentTypeError(str(ex))
 
 
 class CloudLinux7to8Factory(DistUpgraderFactory):
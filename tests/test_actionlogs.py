@@ -0,0 +1,73 @@
+# Copyright 1999 - 2026. WebPros International GmbH. All rights reserved.
+import gzip
+import io
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+from cloudlinux7to8.common import actionlogs
+
+
+class ActionLogsTests(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.log_path = os.path.join(self.directory, "cloudlinux7to8.log")
+        self.action_logs = actionlogs.ActionLogs(self.log_path)
+        self.write_log("Conversion is started\n")
+
+    def write_log(self, text: str) -> None:
+        with open(self.log_path, "a") as f:
+            f.write(text)
+
+    def run_action(self, name: str, output: str, success: bool = True) -> None:
+        fields = {"time": 0, "phase": "convert", "stage": "Stage", "action": name, "step": "prepare"}
+        self.action_logs.handle_event(dict(fields, type="action_start"))
+        self.write_log(output)
+        self.action_logs.handle_event(dict(fields, type="action_end", success=success))
+
+    def show(self, name: str) -> str:
+        stdout = io.TextIOWrapper(io.BytesIO(), encoding="utf-8")
+        with mock.patch.object(sys, "stdout", stdout):
+            code = actionlogs.show_action_log([name], self.log_path)
+            stdout.flush()
+        self.assertEqual(code, 0)
+        return stdout.buffer.getvalue().decode("utf-8")
+
+    def test_log_is_not_copied(self):
+        self.run_action("remove packages", "rpm -e foo\n")
+        self.assertEqual(os.listdir(self.directory), ["cloudlinux7to8.log", "cloudlinux7to8.log.actions.json"])
+        self.assertIn("rpm -e foo\n", self.show("remove"))
+
+    def test_replaced_log(self):
+        self.run_action("remove packages", "rpm -e foo\n")
+        os.unlink(self.log_path)
+        self.write_log("Another conversion is started, rpm -e foo\n")
+        self.assertIn("was replaced after the action", self.show("remove packages"))
+
+    def test_unknown_action(self):
+        self.run_action("remove packages", "rpm -e foo\n")
+        with mock.patch.object(sys, "stdout", io.StringIO()) as stdout:
+            self.assertEqual(actionlogs.show_action_log(["install packages"], self.log_path), 1)
+        self.assertIn("\tremove packages", stdout.getvalue())
+
+    def test_extract_relevant(self):
+        self.run_action("fix named configuration", "named is fixed\n", success=False)
+        for index in range(5):
+            self.run_action(f"action {index}", f"output {index}\n")
+
+        archives = self.action_logs.extract_relevant(last=2)
+        self.assertEqual([os.path.basename(path) for path in archives], [
+            "000-convert-prepare-fix-named-configuration.log.gz",
+            "004-convert-prepare-action-3.log.gz",
+            "005-convert-prepare-action-4.log.gz",
+        ])
+        with gzip.open(archives[0], "rt") as f:
+            self.assertEqual(f.read(), "named is fixed\n")
+
+        # Archives of the previous feedback are not kept
+        self.assertEqual(self.action_logs.extract_relevant(last=0), archives[:1])
+        self.assertEqual(os.listdir(self.action_logs.archive_directory), [os.path.basename(archives[0])])
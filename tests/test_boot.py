@@ -0,0 +1,163 @@
+# Copyright 1999 - 2026. WebPros International GmbH. All rights reserved.
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from cloudlinux7to8.common import boot
+
+GRUBBY_INFO_CL7 = """index=0
+kernel=/boot/vmlinuz-3.10.0-1160.119.1.el7.x86_64
+args="ro crashkernel=auto rd.lvm.lv=centos/root rhgb quiet LANG=en_US.UTF-8"
+root=/dev/mapper/centos-root
+initrd=/boot/initramfs-3.10.0-1160.119.1.el7.x86_64.img
+title=CloudLinux (3.10.0-1160.119.1.el7.x86_64) 7.9 (Boris Yegorov)
+"""
+
+GRUBBY_INFO_CL8_BLS = """index=0
+kernel="/boot/vmlinuz-4.18.0-553.el8_10.x86_64"
+args="ro crashkernel=auto resume=/dev/mapper/cl-swap rhgb quiet $tuned_params"
+root="/dev/mapper/cl-root"
+initrd="/boot/initramfs-4.18.0-553.el8_10.x86_64.img $tuned_initrd"
+title="CloudLinux (4.18.0-553.el8_10.x86_64) 8.10"
+id="0123456789abcdef-4.18.0-553.el8_10.x86_64"
+"""
+
+
+class ParseGrubbyInfoTests(unittest.TestCase):
+    def test_cl7_entry(self):
+        entry = boot.parse_grubby_info(GRUBBY_INFO_CL7)
+        self.assertEqual(entry.kernel, "/boot/vmlinuz-3.10.0-1160.119.1.el7.x86_64")
+        self.assertEqual(entry.initrd, "/boot/initramfs-3.10.0-1160.119.1.el7.x86_64.img")
+        self.assertEqual(entry.root, "/dev/mapper/centos-root")
+        self.assertEqual(entry.args, ["ro", "crashkernel=auto", "rd.lvm.lv=centos/root", "rhgb", "quiet", "LANG=en_US.UTF-8"])
+
+    def test_quoted_values_and_unresolved_variables(self):
+        entry = boot.parse_grubby_info(GRUBBY_INFO_CL8_BLS)
+        self.assertEqual(entry.kernel, "/boot/vmlinuz-4.18.0-553.el8_10.x86_64")
+        self.assertEqual(entry.initrd, "/boot/initramfs-4.18.0-553.el8_10.x86_64.img")
+        self.assertEqual(entry.root, "/dev/mapper/cl-root")
+        self.assertNotIn("$tuned_params", entry.args)
+        self.assertEqual(entry.args[-1], "quiet")
+
+    def test_only_first_entry_is_taken(self):
+        second = GRUBBY_INFO_CL7.replace("1160.119.1", "1160.118.1")
+        entry = boot.parse_grubby_info(GRUBBY_INFO_CL7 + second)
+        self.assertEqual(entry.kernel, "/boot/vmlinuz-3.10.0-1160.119.1.el7.x86_64")
+
+    def test_no_kernel(self):
+        with self.assertRaises(ValueError):
+            boot.parse_grubby_info("index=0\nargs=\"ro quiet\"\n")
+
+    def test_no_initrd_and_root(self):
+        entry = boot.parse_grubby_info("kernel=/boot/vmlinuz-x\nargs=\"ro root=/dev/sda1\"\n")
+        self.assertIsNone(entry.initrd)
+        self.assertIsNone(entry.root)
+        self.assertEqual(entry.args, ["ro", "root=/dev/sda1"])
+
+
+class KexecCommandTests(unittest.TestCase):
+    def test_kernel_release(self):
+        entry = boot.parse_grubby_info(GRUBBY_INFO_CL7)
+        self.assertEqual(boot.get_kernel_release(entry), "3.10.0-1160.119.1.el7.x86_64")
+        self.assertEqual(boot.get_kernel_release(entry._replace(kernel="/boot/custom-kernel")), "custom-kernel")
+
+    def test_root_is_added_to_command_line(self):
+        entry = boot.BootEntry(kernel="/boot/vmlinuz-x", initrd=None, args=["ro", "quiet"], root="/dev/sda1")
+        self.assertEqual(boot.build_kexec_command_line(entry), "root=/dev/sda1 ro quiet")
+
+    def test_root_from_args_is_not_duplicated(self):
+        entry = boot.BootEntry(kernel="/boot/vmlinuz-x", initrd=None, args=["root=UUID=1234", "ro"], root="/dev/sda1")
+        self.assertEqual(boot.build_kexec_command_line(entry), "root=UUID=1234 ro")
+
+    def test_load_command(self):
+        entry = boot.parse_grubby_info(GRUBBY_INFO_CL7)
+        self.assertEqual(boot.build_kexec_load_command(entry), [
+            boot.KEXEC_PATH, "--load", "/boot/vmlinuz-3.10.0-1160.119.1.el7.x86_64",
+            "--initrd=/boot/initramfs-3.10.0-1160.119.1.el7.x86_64.img",
+            "--command-line=root=/dev/mapper/centos-root ro crashkernel=auto rd.lvm.lv=centos/root rhgb quiet LANG=en_US.UTF-8",
+        ])
+
+    def test_load_command_without_initrd(self):
+        entry = boot.BootEntry(kernel="/boot/vmlinuz-x", initrd=None, args=["ro"], root="/dev/sda1")
+        self.assertEqual(boot.build_kexec_load_command(entry), [boot.KEXEC_PATH, "--load", "/boot/vmlinuz-x", "--command-line=root=/dev/sda1 ro"])
+
+
+class KexecUnsafeReasonsTests(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.kernel = self._touch("vmlinuz-4.18.0-upgrade.x86_64")
+        self.initrd = self._touch("initramfs-upgrade.img")
+        self.kexec = self._touch("kexec")
+        self.kexec_loaded = self._touch("kexec_loaded", "0\n")
+
+        self.patches = [
+            mock.patch.object(boot, "KEXEC_PATH", self.kexec),
+            mock.patch.object(boot, "KEXEC_LOADED_PATH", self.kexec_loaded),
+            mock.patch.object(boot, "XEN_PATH", os.path.join(self.root, "xen")),
+            mock.patch.object(boot, "SECURE_BOOT_EFIVAR_PATH", os.path.join(self.root, "SecureBoot")),
+            mock.patch.object(boot, "LOCKDOWN_PATH", os.path.join(self.root, "lockdown")),
+        ]
+        for patch in self.patches:
+            patch.start()
+
+    def tearDown(self):
+        for patch in self.patches:
+            patch.stop()
+        shutil.rmtree(self.root)
+
+    def _touch(self, name, content="", mode="w"):
+        path = os.path.join(self.root, name)
+        with open(path, mode) as f:
+            f.write(content)
+        return path
+
+    def _entry(self, **kwargs):
+        properties = {"kernel": self.kernel, "initrd": self.initrd, "args": ["ro"], "root": "/dev/sda1"}
+        properties.update(kwargs)
+        return boot.BootEntry(**properties)
+
+    def test_safe(self):
+        self.assertEqual(boot.get_kexec_unsafe_reasons(self._entry(), "upgrade"), [])
+
+    def test_no_kexec_utility(self):
+        os.unlink(self.kexec)
+        self.assertEqual(len(boot.get_kexec_unsafe_reasons(self._entry())), 1)
+
+    def test_kernel_without_kexec_support(self):
+        os.unlink(self.kexec_loaded)
+        self.assertEqual(len(boot.get_kexec_unsafe_reasons(self._entry())), 1)
+
+    def test_xen(self):
+        os.mkdir(os.path.join(self.root, "xen"))
+        self.assertEqual(len(boot.get_kexec_unsafe_reasons(self._entry())), 1)
+
+    def test_secure_boot(self):
+        self._touch("SecureBoot", b"\x06\x00\x00\x00\x01", mode="wb")
+        self.assertEqual(len(boot.get_kexec_unsafe_reasons(self._entry())), 1)
+
+    def test_secure_boot_disabled(self):
+        self._touch("SecureBoot", b"\x06\x00\x00\x00\x00", mode="wb")
+        self.assertEqual(boot.get_kexec_unsafe_reasons(self._entry()), [])
+
+    def test_lockdown(self):
+        self._touch("lockdown", "none [integrity] confidentiality\n")
+        self.assertEqual(len(boot.get_kexec_unsafe_reasons(self._entry())), 1)
+        self._touch("lockdown", "[none] integrity confidentiality\n")
+        self.assertEqual(boot.get_kexec_unsafe_reasons(self._entry()), [])
+
+    def test_missing_kernel_and_initrd(self):
+        reasons = boot.get_kexec_unsafe_reasons(self._entry(kernel=os.path.join(self.root, "absent"), initrd=os.path.join(self.root, "absent.img")))
+        self.assertEqual(len(reasons), 2)
+
+    def test_unknown_root(self):
+        self.assertEqual(len(boot.get_kexec_unsafe_reasons(self._entry(root=None))), 1)
+        self.assertEqual(boot.get_kexec_unsafe_reasons(self._entry(root=None, args=["root=/dev/sda1"])), [])
+
+    def test_unexpected_kernel(self):
+        self.assertEqual(len(boot.get_kexec_unsafe_reasons(self._entry(), "el8_10")), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
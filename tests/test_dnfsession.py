@@ -0,0 +1,78 @@
+# Copyright 1999 - 2026. WebPros International GmbH. All rights reserved.
+import sys
+import types
+import unittest
+from unittest import mock
+
+from cloudlinux7to8.common import dnfsession
+
+PKG_INSTALL = 1
+PKG_REMOVE = 2
+
+
+def make_dnf_modules() -> dict:
+    dnf = types.ModuleType("dnf")
+    dnf.exceptions = types.SimpleNamespace(Error=type("Error", (Exception,), {}))
+    dnf.transaction = types.SimpleNamespace(PKG_INSTALL=PKG_INSTALL, PKG_REMOVE=PKG_REMOVE)
+    hawkey = types.ModuleType("hawkey")
+    hawkey.FORM_NAME = 1
+    return {"dnf": dnf, "hawkey": hawkey}
+
+
+class FakeTransaction(list):
+    @property
+    def install_set(self) -> list:
+        return [item.pkg for item in self if item.action == PKG_INSTALL]
+
+
+def make_item(action: int, name: str) -> types.SimpleNamespace:
+    return types.SimpleNamespace(action=action, pkg=types.SimpleNamespace(name=name))
+
+
+class RunTests(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch.dict(sys.modules, make_dnf_modules())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.session = dnfsession.DnfSession()
+        self.session._api_available = True
+        self.session._sack_loaded = True
+        self.session._base = self.base = mock.MagicMock()
+        self.base.package_signature_check.return_value = (0, "")
+
+        for name in ("remove_packages", "install_packages"):
+            patcher = mock.patch.object(dnfsession.rpm, name)
+            setattr(self, name, patcher.start())
+            self.addCleanup(patcher.stop)
+
+    def test_single_transaction(self):
+        self.base.transaction = FakeTransaction([
+            make_item(PKG_INSTALL, "mariadb-server"),
+            make_item(PKG_REMOVE, "MariaDB-server"),
+        ])
+        self.session.run(["mariadb-server"], remove=["MariaDB-server"])
+
+        self.base.remove.assert_called_once_with("MariaDB-server")
+        self.base.do_transaction.assert_called_once_with()
+        self.remove_packages.assert_not_called()
+
+    def test_dependent_packages_are_kept(self):
+        # perl-DBD-MySQL depends on MariaDB-shared, the transaction would remove it as well
+        self.base.transaction = FakeTransaction([
+            make_item(PKG_INSTALL, "mariadb-server"),
+            make_item(PKG_REMOVE, "MariaDB-server"),
+            make_item(PKG_REMOVE, "MariaDB-shared"),
+            make_item(PKG_REMOVE, "perl-DBD-MySQL"),
+        ])
+        self.session.run(["mariadb-server"], remove=["MariaDB-server", "MariaDB-shared"])
+
+        self.base.do_transaction.assert_not_called()
+        self.remove_packages.assert_called_once_with(["MariaDB-server", "MariaDB-shared"])
+        self.install_packages.assert_called_once_with(["mariadb-server"], repository=None)
+
+    def test_unresolvable_transaction(self):
+        self.base.resolve.side_effect = sys.modules["dnf"].exceptions.Error("nothing provides libfoo")
+        with self.assertRaises(dnfsession.DnfTransactionError):
+            self.session.run(["mariadb-server"], remove=["MariaDB-server"])
+        self.remove_packages.assert_not_called()
@@ -0,0 +1,128 @@
+# Copyright 1999 - 2026. WebPros International GmbH. All rights reserved.
+import socket
+import threading
+import unittest
+
+from cloudlinux7to8.common import downtime
+
+
+class LocalListener:
+    # Answers every connection with the given greeting, like a service on the local host
+    def __init__(self, greeting: bytes, wait_request: bool = False, port: int = 0) -> None:
+        self.greeting = greeting
+        self.wait_request = wait_request
+        self.requests = []
+        self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server.bind((downtime.PROBE_HOST, port))
+        self.server.listen(5)
+        self.port = self.server.getsockname()[1]
+        self.thread = threading.Thread(target=self._serve, daemon=True)
+        self.thread.start()
+
+    def _serve(self) -> None:
+        while True:
+            try:
+                connection, _ = self.server.accept()
+            except OSError:
+                return
+            with connection:
+                if self.wait_request:
+                    self.requests.append(connection.recv(1024))
+                connection.sendall(self.greeting)
+
+    def close(self) -> None:
+        self.server.close()
+
+
+def get_free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind((downtime.PROBE_HOST, 0))
+        return s.getsockname()[1]
+
+
+class ParseTargetTests(unittest.TestCase):
+    def test_default_ports(self):
+        self.assertEqual(downtime.parse_target("smtp"), downtime.ProbeTarget("smtp", 25))
+        self.assertEqual(downtime.parse_target("IMAP"), downtime.ProbeTarget("imap", 143))
+        self.assertEqual(downtime.parse_target("http:example.com"), downtime.ProbeTarget("http", 80, "example.com"))
+
+    def test_explicit_ports(self):
+        self.assertEqual(downtime.parse_target("smtp:587"), downtime.ProbeTarget("smtp", 587))
+        self.assertEqual(downtime.parse_target(" http:example.com:8080 "), downtime.ProbeTarget("http", 8080, "example.com"))
+
+    def test_str_round_trip(self):
+        for target in ("smtp:25", "http:example.com:80"):
+            self.assertEqual(str(downtime.parse_target(target)), target)
+
+    def test_invalid_targets(self):
+        for target in ("ftp", "http", "http::80", "smtp:port", "smtp:25:26", "http:example.com:80:81"):
+            with self.subTest(target=target):
+                with self.assertRaises(ValueError):
+                    downtime.parse_target(target)
+
+    def test_parse_targets(self):
+        self.assertEqual(
+            downtime.parse_targets("smtp, http:example.com,,imap:993"),
+            [downtime.ProbeTarget("smtp", 25), downtime.ProbeTarget("http", 80, "example.com"), downtime.ProbeTarget("imap", 993)],
+        )
+
+
+class IsServingTests(unittest.TestCase):
+    def test_smtp_greeting(self):
+        listener = LocalListener(b"220 mail.example.com ESMTP Postfix\r\n")
+        self.addCleanup(listener.close)
+        self.assertTrue(downtime.is_serving(downtime.ProbeTarget("smtp", listener.port), timeout=2))
+
+    def test_imap_greeting(self):
+        listener = LocalListener(b"* OK [CAPABILITY IMAP4rev1] Dovecot ready.\r\n")
+        self.addCleanup(listener.close)
+        self.assertTrue(downtime.is_serving(downtime.ProbeTarget("imap", listener.port), timeout=2))
+
+    def test_http_response_with_vhost(self):
+        listener = LocalListener(b"HTTP/1.1 503 Service Unavailable\r\n\r\n", wait_request=True)
+        self.addCleanup(listener.close)
+        self.assertTrue(downtime.is_serving(downtime.ProbeTarget("http", listener.port, "example.com"), timeout=2))
+        self.assertIn(b"Host: example.com\r\n", listener.requests[0])
+
+    def test_unexpected_greeting(self):
+        listener = LocalListener(b"421 Service not available\r\n")
+        self.addCleanup(listener.close)
+        self.assertFalse(downtime.is_serving(downtime.ProbeTarget("smtp", listener.port), timeout=2))
+
+    def test_nothing_listens(self):
+        self.assertFalse(downtime.is_serving(downtime.ProbeTarget("smtp", get_free_port()), timeout=2))
+
+
+class WaitForStateTests(unittest.TestCase):
+    def test_serving_and_stopped_targets(self):
+        listener = LocalListener(b"220 ready\r\n")
+        self.addCleanup(listener.close)
+        serving = downtime.ProbeTarget("smtp", listener.port)
+        stopped = downtime.ProbeTarget("imap", get_free_port())
+
+        up = downtime.wait_for_state([serving, stopped], serving=True, timeout=0.2, interval=0.05)
+        self.assertIsNotNone(up[str(serving)])
+        self.assertIsNone(up[str(stopped)])
+
+        down = downtime.wait_for_state([serving, stopped], serving=False, timeout=0.2, interval=0.05)
+        self.assertIsNone(down[str(serving)])
+        self.assertIsNotNone(down[str(stopped)])
+
+    def test_target_starts_serving_later(self):
+        port = get_free_port()
+        target = downtime.ProbeTarget("smtp", port)
+        listeners = []
+
+        def start_listener() -> None:
+            listeners.append(LocalListener(b"220 ready\r\n", port=port))
+
+        timer = threading.Timer(0.3, start_listener)
+        timer.start()
+        self.addCleanup(lambda: [listener.close() for listener in listeners])
+
+        results = downtime.wait_for_state(iter([target]), serving=True, timeout=5, interval=0.05)
+        timer.join()
+        self.assertIsNotNone(results[str(target)])
+
+    def test_no_targets(self):
+        self.assertEqual(downtime.wait_for_state([], serving=True, timeout=1), {})
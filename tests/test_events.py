@@ -0,0 +1,135 @@
+# Copyright 1999 - 2026. WebPros International GmbH. All rights reserved.
+import contextlib
+import io
+import json
+import os
+import shutil
+import socket
+import stat
+import tempfile
+import unittest
+
+from cloudlinux7to8.common import events
+
+
+class RedactArgsTests(unittest.TestCase):
+    def test_mysql_password(self):
+        self.assertEqual(events.redact_args(["/usr/bin/mysql_upgrade", "-uadmin", "-psecret"]),
+                         ["/usr/bin/mysql_upgrade", "-uadmin", "-p***"])
+
+    def test_password_assignments(self):
+        self.assertEqual(events.redact_args(["/usr/bin/mysqldump", "--password=secret", "MYSQL_PWD=secret", "psa"]),
+                         ["/usr/bin/mysqldump", "--password=***", "MYSQL_PWD=***", "psa"])
+
+    def test_password_as_next_argument(self):
+        self.assertEqual(events.redact_args(["/usr/sbin/plesk", "bin", "customer", "-passwd", "secret", "-name", "John"]),
+                         ["/usr/sbin/plesk", "bin", "customer", "-passwd", "***", "-name", "John"])
+
+    def test_short_p_option_of_other_utilities_is_kept(self):
+        for args in (["/usr/bin/mkdir", "-p", "/var/lib"], ["/usr/bin/ps", "-p1234"], ["/usr/bin/tar", "-xpf", "-"]):
+            with self.subTest(args=args):
+                self.assertEqual(events.redact_args(args), args)
+
+    def test_shell_command_line(self):
+        self.assertEqual(events._redact_command("/usr/bin/mysql -uadmin -psecret psa"), ["/usr/bin/mysql -uadmin -p*** psa"])
+
+
+class EventPublisherTests(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.file_path = os.path.join(self.directory, "events.jsonl")
+        self.publisher = events.EventPublisher(self.file_path, os.path.join(self.directory, "events.sock"), max_file_size=1024)
+        self.addCleanup(self.publisher.close)
+
+    def read_events(self, path: str) -> list:
+        with open(path) as f:
+            return [json.loads(line) for line in f]
+
+    def test_emit(self):
+        received = []
+        self.publisher.subscribe(received.append)
+        self.publisher.emit("stage_start", phase="convert", stage="Install packages")
+
+        self.assertEqual(len(received), 1)
+        self.assertEqual(received[0]["stage"], "Install packages")
+        self.assertEqual(self.read_events(self.file_path), received)
+        self.assertEqual(stat.S_IMODE(os.stat(self.file_path).st_mode), 0o600)
+
+    def test_existing_file_mode_is_restricted(self):
+        with open(self.file_path, "w"):
+            pass
+        os.chmod(self.file_path, 0o644)
+        self.publisher.emit("check", check="disk space", success=True)
+        self.assertEqual(stat.S_IMODE(os.stat(self.file_path).st_mode), 0o600)
+
+    def test_file_is_rotated(self):
+        for index in range(30):
+            self.publisher.emit("check", check=f"check {index}", success=True)
+
+        self.assertLessEqual(os.path.getsize(self.file_path), 1024)
+        self.assertLessEqual(os.path.getsize(self.file_path + ".1"), 1024 + 200)
+        emitted = self.read_events(self.file_path + ".1") + self.read_events(self.file_path)
+        self.assertEqual(emitted[-1]["check"], "check 29")
+
+    def test_slow_client_is_dropped(self):
+        slow, slow_peer = socket.socketpair()
+        fast, fast_peer = socket.socketpair()
+        self.addCleanup(slow_peer.close)
+        self.addCleanup(fast_peer.close)
+        for client in (slow, fast):
+            client.setblocking(False)
+            self.publisher._clients.append(client)
+
+        # Nobody reads from the slow client, so its buffer gets full at some point
+        for index in range(1000):
+            self.publisher.emit("check", check="x" * 1024, success=True)
+            if slow not in self.publisher._clients:
+                break
+            fast_peer.recv(1024 * 1024)
+
+        self.assertEqual(self.publisher._clients, [fast])
+
+
+class MonitorTests(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.file_path = os.path.join(self.directory, "events.jsonl")
+
+    def monitor(self, history_lines: list, stream_lines: list) -> list:
+        with open(self.file_path, "w") as f:
+            f.writelines(line + "\n" for line in history_lines)
+        client, peer = socket.socketpair()
+        peer.sendall("".join(line + "\n" for line in stream_lines).encode("utf-8"))
+        peer.close()
+
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            events.monitor(client, self.file_path, history=2)
+        client.close()
+        return output.getvalue().splitlines()
+
+    def test_history_and_stream(self):
+        lines = self.monitor(
+            [
+                json.dumps({"time": 0, "type": "check", "check": "old", "success": True}),
+                json.dumps({"time": 0, "type": "stage_start", "phase": "convert", "stage": "Remove packages"}),
+                json.dumps({"time": 0, "type": "subprocess_start", "args": ["/usr/bin/rpm", "-e", "foo"]}),
+            ],
+            [json.dumps({"time": 0, "type": "action_end", "phase": "convert", "step": "prepare",
+                         "action": "Remove packages", "success": False, "duration": 1.5})],
+        )
+        self.assertEqual(len(lines), 4)
+        self.assertTrue(lines[0].endswith("stage 'Remove packages' started"))
+        self.assertTrue(lines[1].endswith("$ /usr/bin/rpm -e foo"))
+        self.assertTrue(lines[2].endswith("prepare 'Remove packages' FAILED in 1.5 seconds"))
+        self.assertEqual(lines[3], "The conversion process has closed the events stream")
+
+    def test_broken_lines_are_skipped(self):
+        lines = self.monitor(
+            ['{"time": 0, "type": "check", "check": "disk sp', json.dumps({"time": 0, "type": "check"})],
+            ["not a json", json.dumps({"time": 0, "type": "check", "check": "disk space", "success": True})],
+        )
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[0].endswith("check 'disk space' passed"))
@@ -0,0 +1,26 @@
+# Copyright 1999 - 2026. WebPros International GmbH. All rights reserved.
+import subprocess
+import unittest
+from unittest import mock
+
+from cloudlinux7to8.common import hosting
+
+
+class GetDomainsAddressesTests(unittest.TestCase):
+    def get_addresses(self, **check_output_kwargs) -> dict:
+        with mock.patch.object(hosting, "is_psa_database_available", return_value=True), \
+                mock.patch.object(hosting, "get_psa_password", return_value="secret"), \
+                mock.patch.object(hosting.subprocess, "check_output", **check_output_kwargs) as check_output:
+            addresses = hosting.get_domains_addresses()
+        if check_output.called:
+            self.assertEqual(check_output.call_args[1]["env"]["MYSQL_PWD"], "secret")
+        return addresses
+
+    def test_ipv4_address_is_preferred(self):
+        output = "example.com\t2001:db8::1\nexample.com\t203.0.113.10\nexample.org\t2001:db8::2\n"
+        self.assertEqual(self.get_addresses(return_value=output),
+                         {"example.com": "203.0.113.10", "example.org": "2001:db8::2"})
+
+    def test_database_is_not_available(self):
+        error = subprocess.CalledProcessError(1, ["/usr/bin/mysql"])
+        self.assertEqual(self.get_addresses(side_effect=error), {})
@@ -0,0 +1,82 @@
+# Copyright 1999 - 2026. WebPros International GmbH. All rights reserved.
+import gzip
+import io
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from cloudlinux7to8.common import perlresolver
+
+FILELISTS = """<?xml version="1.0" encoding="UTF-8"?>
+<filelists xmlns="http://linux.duke.edu/metadata/filelists" packages="3">
+<package pkgid="1" name="perl-libs" arch="x86_64">
+  <file>/usr/lib64/perl5/Data/Dumper.pm</file>
+  <file>/usr/share/perl5/strict.pm</file>
+</package>
+<package pkgid="2" name="perl-Data-Dumper" arch="x86_64">
+  <file>/usr/lib64/perl5/vendor_perl/Data/Dumper.pm</file>
+</package>
+<package pkgid="3" name="perl-JSON" arch="noarch">
+  <file>/usr/share/perl5/vendor_perl/JSON.pm</file>
+  <file>/usr/share/doc/perl-JSON/README</file>
+</package>
+</filelists>
+"""
+
+REPOMD = b"""<?xml version="1.0" encoding="UTF-8"?>
+<repomd xmlns="http://linux.duke.edu/metadata/repo">
+  <data type="filelists"><location href="repodata/0123-filelists.xml.gz"/></data>
+</repomd>
+"""
+
+
+class PerlModulesResolverTests(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        repodata = os.path.join(self.directory, "metadata", "cl8-baseos", "repodata")
+        os.makedirs(repodata)
+        with gzip.open(os.path.join(repodata, "0123-filelists.xml.gz"), "wt") as f:
+            f.write(FILELISTS)
+        self.resolver = perlresolver.PerlModulesResolver(os.path.join(self.directory, "state"), [os.path.join(self.directory, "metadata")])
+
+    def test_dedicated_package(self):
+        self.assertEqual(self.resolver.resolve("JSON.pm"), "perl-JSON")
+        # The dedicated package is preferred to the interpreter one
+        self.assertEqual(self.resolver.resolve("Data/Dumper.pm"), "perl-Data-Dumper")
+
+    def test_interpreter_modules_are_unresolved(self):
+        self.assertIsNone(self.resolver.resolve("strict.pm"))
+
+    def test_unknown_module(self):
+        self.assertIsNone(self.resolver.resolve("Unknown/Module.pm"))
+
+    def test_index_is_reused(self):
+        self.resolver.resolve("JSON.pm")
+        resolver = perlresolver.PerlModulesResolver(os.path.join(self.directory, "state"), [os.path.join(self.directory, "metadata")])
+        with mock.patch.object(perlresolver, "parse_filelists") as parse_filelists:
+            self.assertEqual(resolver.resolve("JSON.pm"), "perl-JSON")
+        parse_filelists.assert_not_called()
+
+
+class DownloadFilelistsTests(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def urlopen(self, url, timeout):
+        self.requested.append(url)
+        if url.endswith("repomd.xml"):
+            return io.BytesIO(REPOMD)
+        return io.BytesIO(gzip.compress(FILELISTS.encode()))
+
+    def test_recently_checked_repositories_are_skipped(self):
+        self.requested = []
+        repositories = {"cl8-baseos": "https://example.com/baseos/"}
+        with mock.patch.object(perlresolver.urllib.request, "urlopen", side_effect=self.urlopen):
+            perlresolver.download_filelists(repositories, self.directory)
+            perlresolver.download_filelists(repositories, self.directory)
+        self.assertEqual(self.requested, ["https://example.com/baseos/repodata/repomd.xml", "https://example.com/baseos/repodata/0123-filelists.xml.gz"])
+        self.assertEqual(perlresolver.find_filelists([self.directory]), [os.path.join(self.directory, "cl8-baseos", "repodata", "0123-filelists.xml.gz")])
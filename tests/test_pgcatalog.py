@@ -0,0 +1,101 @@
+# Copyright 1999 - 2026. WebPros International GmbH. All rights reserved.
+import os
+import shutil
+import struct
+import tempfile
+import unittest
+
+from cloudlinux7to8.common import pgcatalog
+
+PAGE_SIZE = 8192
+TUPLE_HEADER_SIZE = 24
+
+
+def make_name(value: str) -> bytes:
+    return value.encode("ascii").ljust(pgcatalog.PG_NAMEDATALEN, b"\0")
+
+
+def make_tuple(major_version: int, name: str, collate: str, ctype: str, infomask: int = 0) -> bytes:
+    header = bytearray(TUPLE_HEADER_SIZE)
+    struct.pack_into("<HB", header, 20, infomask, TUPLE_HEADER_SIZE)
+    data = b""
+    if major_version >= 12:
+        data += struct.pack("<I", 13000)
+    # datdba and encoding go between the name and the locales
+    data += make_name(name) + struct.pack("<Ii", 10, 6) + make_name(collate) + make_name(ctype)
+    return bytes(header) + data
+
+
+def make_page(tuples: list) -> bytes:
+    page = bytearray(PAGE_SIZE)
+    upper = PAGE_SIZE
+    for index, tuple_data in enumerate(tuples):
+        upper -= len(tuple_data)
+        page[upper:upper + len(tuple_data)] = tuple_data
+        item = upper | (pgcatalog.PG_LP_NORMAL << 15) | (len(tuple_data) << 17)
+        struct.pack_into("<I", page, pgcatalog.PG_PAGE_HEADER_SIZE + index * pgcatalog.PG_ITEM_ID_SIZE, item)
+    pd_lower = pgcatalog.PG_PAGE_HEADER_SIZE + len(tuples) * pgcatalog.PG_ITEM_ID_SIZE
+    struct.pack_into("<HHHH", page, 12, pd_lower, upper, PAGE_SIZE, PAGE_SIZE | 4)
+    return bytes(page)
+
+
+class ParseDatabaseLocalesTests(unittest.TestCase):
+    def test_postgres_10(self):
+        page = make_page([
+            make_tuple(10, "template1", "C", "C"),
+            make_tuple(10, "postgres", "en_US.UTF-8", "en_US.UTF-8"),
+        ])
+        self.assertEqual(pgcatalog.parse_database_locales(page, 10, "postgres"), {"en_US.UTF-8"})
+
+    def test_postgres_12_oid_column(self):
+        page = make_page([make_tuple(12, "postgres", "en_US.UTF-8", "C.UTF-8")])
+        self.assertEqual(pgcatalog.parse_database_locales(page, 12, "postgres"), {"en_US.UTF-8", "C.UTF-8"})
+
+    def test_deleted_tuple_versions_are_skipped(self):
+        page = make_page([
+            make_tuple(10, "postgres", "C", "C", infomask=pgcatalog.PG_HEAP_XMAX_COMMITTED),
+            make_tuple(10, "postgres", "en_US.UTF-8", "en_US.UTF-8"),
+        ])
+        self.assertEqual(pgcatalog.parse_database_locales(page, 10, "postgres"), {"en_US.UTF-8"})
+
+    def test_unknown_database(self):
+        page = make_page([make_tuple(10, "template1", "C", "C")])
+        self.assertEqual(pgcatalog.parse_database_locales(page, 10, "postgres"), set())
+
+    def test_truncated_page(self):
+        page = make_page([make_tuple(10, "postgres", "en_US.UTF-8", "en_US.UTF-8")])
+        for size in (30, PAGE_SIZE - 100):
+            with self.subTest(size=size):
+                with self.assertRaises(ValueError):
+                    pgcatalog.parse_database_locales(page[:size], 10, "postgres")
+
+    def test_postgres_15_is_not_supported(self):
+        with self.assertRaises(ValueError):
+            pgcatalog.parse_database_locales(make_page([]), 15, "postgres")
+
+
+class ReadDatabaseLocalesTests(unittest.TestCase):
+    def setUp(self):
+        self.data_path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.data_path)
+        os.mkdir(os.path.join(self.data_path, "global"))
+        with open(os.path.join(self.data_path, "PG_VERSION"), "w") as f:
+            f.write("13\n")
+
+    def write_catalog(self, filenode: int) -> None:
+        with open(os.path.join(self.data_path, "global", str(filenode)), "wb") as f:
+            f.write(make_page([make_tuple(13, "postgres", "en_US.UTF-8", "en_US.UTF-8")]))
+
+    def test_default_filenode(self):
+        self.write_catalog(pgcatalog.PG_DATABASE_RELATION_OID)
+        self.assertEqual(pgcatalog.read_database_locales(self.data_path, "postgres"), {"en_US.UTF-8"})
+
+    def test_mapped_filenode(self):
+        self.write_catalog(16384)
+        with open(os.path.join(self.data_path, "global", "pg_filenode.map"), "wb") as f:
+            f.write(struct.pack("<ii", pgcatalog.PG_FILENODE_MAP_MAGIC, 2) + struct.pack("<IIII", 1260, 1260, 1262, 16384))
+        self.assertEqual(pgcatalog.read_database_locales(self.data_path, "postgres"), {"en_US.UTF-8"})
+
+    def test_missing_catalog(self):
+        with self.assertRaises(OSError):
+            pgcatalog.read_database_locales(self.data_path, "postgres")
@@ -0,0 +1,102 @@
+# Copyright 1999 - 2026. WebPros International GmbH. All rights reserved.
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from cloudlinux7to8.common import repofiles
+
+BASE_REPO = """# Managed by Plesk
+[base]
+name=CloudLinux base
+baseurl=https://mirror.example.com/cloudlinux/7/os/ https://backup.example.com/os/
+enabled=1
+
+[updates]
+name = CloudLinux updates
+; mirrorlist=https://disabled.example.com/
+mirrorlist=https://mirror.pp.plesk.tech/cloudlinux/7/updates
+enabled=1
+"""
+
+
+def is_updates(repo: repofiles.Repository) -> bool:
+    return repo.url is not None and "cloudlinux/7/updates" in repo.url
+
+
+class ParseTests(unittest.TestCase):
+    def test_sections(self):
+        preamble, sections = repofiles._parse(BASE_REPO)
+        self.assertEqual(preamble, ["# Managed by Plesk\n"])
+        self.assertEqual([section.repository for section in sections], [
+            repofiles.Repository("base", "CloudLinux base", "https://mirror.example.com/cloudlinux/7/os/"),
+            repofiles.Repository("updates", "CloudLinux updates", "https://mirror.pp.plesk.tech/cloudlinux/7/updates"),
+        ])
+        # Raw lines are kept, so the file is reproduced exactly
+        self.assertEqual("".join(preamble + [line for section in sections for line in section.lines]), BASE_REPO)
+
+    def test_repository_without_url(self):
+        _, sections = repofiles._parse("[empty]\nenabled=0\n")
+        self.assertEqual(sections[0].repository, repofiles.Repository("empty", None, None))
+
+
+class RepositoryFilesPipelineTests(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.path = os.path.join(self.directory, "base.repo")
+        with open(self.path, "w") as f:
+            f.write(BASE_REPO)
+
+    def read(self, path: str) -> str:
+        with open(path) as f:
+            return f.read()
+
+    def adopt(self, path: str) -> None:
+        with open(path, "a") as f:
+            f.write("# adopted\n")
+
+    def test_changes_of_several_actions_are_written_once(self):
+        pipeline = repofiles.RepositoryFilesPipeline()
+        pipeline.remove_repositories(self.path, [is_updates])
+        pipeline.adopt_repositories(self.path)
+        with mock.patch.object(repofiles.leapp_configs, "adopt_repositories", side_effect=self.adopt) as adopt, \
+                mock.patch.object(repofiles.os, "replace", wraps=os.replace) as replace:
+            pipeline.commit()
+
+        adopt.assert_called_once_with(self.path + repofiles.STAGED_SUFFIX)
+        replace.assert_called_once_with(self.path + repofiles.STAGED_SUFFIX, self.path)
+        content = self.read(self.path)
+        self.assertNotIn("[updates]", content)
+        self.assertIn("[base]\n", content)
+        self.assertTrue(content.endswith("# adopted\n"))
+        self.assertEqual(os.listdir(self.directory), ["base.repo"])
+
+    def test_unchanged_file_is_kept(self):
+        pipeline = repofiles.RepositoryFilesPipeline()
+        pipeline.remove_repositories(self.path, [lambda repo: False])
+        pipeline.commit()
+        self.assertEqual(self.read(self.path), BASE_REPO)
+        self.assertEqual(os.listdir(self.directory), ["base.repo"])
+
+    def test_file_removal(self):
+        pipeline = repofiles.RepositoryFilesPipeline()
+        pipeline.remove_file_if(self.path, lambda repositories: any(is_updates(repo) for repo in repositories))
+        pipeline.commit()
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_failure_restores_changed_files(self):
+        other_path = os.path.join(self.directory, "other.repo")
+        with open(other_path, "w") as f:
+            f.write("[other]\nbaseurl=https://example.com/\n")
+
+        pipeline = repofiles.RepositoryFilesPipeline()
+        pipeline.remove_file_if(self.path, lambda repositories: True)
+        pipeline.adopt_repositories(other_path)
+        with mock.patch.object(repofiles.leapp_configs, "adopt_repositories", side_effect=RuntimeError("adoption failed")):
+            with self.assertRaises(RuntimeError):
+                pipeline.commit()
+
+        self.assertEqual(self.read(self.path), BASE_REPO)
+        self.assertEqual(sorted(os.listdir(self.directory)), ["base.repo", "other.repo"])
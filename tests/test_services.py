@@ -0,0 +1,57 @@
+# Copyright 1999 - 2026. WebPros International GmbH. All rights reserved.
+import unittest
+from unittest import mock
+
+from cloudlinux7to8.common import probe, services
+
+SYSTEMCTL_SHOW_OUTPUT = """ActiveState=inactive
+Job=1234
+Type=notify
+Result=success
+
+Type=oneshot
+Result=success
+ActiveState=inactive
+
+Type=simple
+Result=exit-code
+ActiveState=failed
+"""
+
+
+class ParseSystemctlShowTests(unittest.TestCase):
+    def test_blocks_follow_units_order(self):
+        properties = probe.parse_systemctl_show(SYSTEMCTL_SHOW_OUTPUT, ["httpd.service", "plesk-setup.service", "named.service"])
+        self.assertEqual(properties["httpd.service"], {"ActiveState": "inactive", "Job": "1234", "Type": "notify", "Result": "success"})
+        self.assertEqual(properties["plesk-setup.service"], {"Type": "oneshot", "Result": "success", "ActiveState": "inactive"})
+        self.assertEqual(properties["named.service"]["ActiveState"], "failed")
+
+
+class StartInParallelTests(unittest.TestCase):
+    def start(self, responses):
+        batch = services.ServicesBatch(start_timeout=10)
+        with mock.patch.object(services.util, "logged_check_call") as check_call, \
+                mock.patch.object(services.probe, "get_services_properties", side_effect=responses), \
+                mock.patch.object(services.time, "sleep"):
+            batch.start(list(responses[0])).execute()
+        return check_call
+
+    def test_waits_for_queued_jobs(self):
+        queued = {"ActiveState": "inactive", "Job": "12", "Type": "notify", "Result": "success"}
+        active = {"ActiveState": "active", "Type": "notify", "Result": "success"}
+        check_call = self.start([{"httpd.service": queued}, {"httpd.service": active}])
+        check_call.assert_called_once_with(["/usr/bin/systemctl", "start", "--no-block", "httpd.service"])
+
+    def test_finished_oneshot_unit_is_started(self):
+        finished = {"ActiveState": "inactive", "Type": "oneshot", "Result": "success"}
+        self.start([{"plesk-setup.service": finished}])
+
+    def test_failed_units(self):
+        properties = {
+            "named.service": {"ActiveState": "failed", "Type": "simple", "Result": "exit-code"},
+            "plesk-setup.service": {"ActiveState": "inactive", "Type": "oneshot", "Result": "exit-code"},
+            "httpd.service": {"ActiveState": "inactive", "Type": "notify", "Result": "success"},
+        }
+        with self.assertRaises(services.ServiceOperationsFailed) as context:
+            self.start([properties])
+        self.assertEqual(set(context.exception.failures), set(properties))
@@ -0,0 +1,43 @@
+# Copyright 1999 - 2026. WebPros International GmbH. All rights reserved.
+import contextlib
+import io
+import shutil
+import tempfile
+import unittest
+
+from cloudlinux7to8.common import statestore
+
+
+class ShowStateTests(unittest.TestCase):
+    def setUp(self):
+        self.state_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.state_dir)
+
+    def show_state(self, args):
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            code = statestore.show_state(args)
+        return code, output.getvalue()
+
+    def test_saved_values(self):
+        state = statestore.ActionState(self.state_dir, "downtime")
+        state.set("services_down", 1700000000.5)
+        statestore.ActionState(self.state_dir, "named").set("includes", ["/etc/named.d/a.conf"])
+
+        code, output = self.show_state([self.state_dir])
+        self.assertEqual(code, 0)
+        lines = output.splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[0].startswith("downtime.services_down ["))
+        self.assertTrue(lines[0].endswith("]: 1700000000.5"))
+        self.assertTrue(lines[1].endswith(']: ["/etc/named.d/a.conf"]'))
+
+    def test_no_state(self):
+        code, output = self.show_state([self.state_dir])
+        self.assertEqual(code, 1)
+        self.assertIn("There is no saved state", output)
+
+    def test_state_dir_is_required(self):
+        with contextlib.redirect_stderr(io.StringIO()):
+            with self.assertRaises(SystemExit):
+                statestore.show_state([])
@@ -0,0 +1,59 @@
+# Copyright 1999 - 2026. WebPros International GmbH. All rights reserved.
+import os
+import shutil
+import subprocess
+import tempfile
+import unittest
+from unittest import mock
+
+from cloudlinux7to8.common import treebackup
+
+
+class TarCopyTests(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.source = os.path.join(self.directory, "source")
+        os.makedirs(os.path.join(self.source, "nested"))
+        with open(os.path.join(self.source, "nested", "file"), "w") as f:
+            f.write("content")
+        self.destination = os.path.join(self.directory, "destination")
+
+    def test_copy(self):
+        treebackup._tar_copy(self.source, self.destination)
+        with open(os.path.join(self.destination, "nested", "file")) as f:
+            self.assertEqual(f.read(), "content")
+
+    def test_extracting_tar_exits(self):
+        # The archive should be larger than the pipe buffer, so writing into the exited tar fails
+        with open(os.path.join(self.source, "large"), "wb") as f:
+            f.write(os.urandom(4 * 1024 * 1024))
+
+        popen = subprocess.Popen
+
+        def exiting_writer(args, **kwargs):
+            if "-xpf" in args:
+                args = ["/bin/sh", "-c", "exit 2"]
+            return popen(args, **kwargs)
+
+        with mock.patch.object(treebackup.subprocess, "Popen", side_effect=exiting_writer):
+            with self.assertRaises(RuntimeError):
+                treebackup._tar_copy(self.source, self.destination)
+
+
+class BackupTreeTests(unittest.TestCase):
+    def test_backup_and_restore_by_rename(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        source = os.path.join(directory, "source")
+        os.mkdir(source)
+        with open(os.path.join(source, "file"), "w") as f:
+            f.write("content")
+
+        state = treebackup.backup_tree(source, os.path.join(directory, "backup"))
+        self.assertEqual(state["strategy"], treebackup.STRATEGY_RENAME)
+        self.assertFalse(os.path.exists(source))
+
+        treebackup.restore_tree(state)
+        with open(os.path.join(source, "file")) as f:
+            self.assertEqual(f.read(), "content")